@@ -1,17 +1,73 @@
+import os
+import re
+import math
+import zlib
 import statistics
 import logging
-from typing import Dict, Any
+from collections import Counter
+from functools import lru_cache
+from typing import Dict, Any, List
+
+from app.utils.text_processing import PhraseMatcher, load_phrase_list
 
 logger = logging.getLogger(__name__)
 
+# Words and sentence terminators, tokenized together in one pass
+_TOKEN_RE = re.compile(r"\w+(?:['’]\w+)*|[.!?]+")
+
+LEXICON_DIR = os.path.join(os.path.dirname(__file__), "lexicons")
+
+
+@lru_cache(maxsize=None)
+def get_marker_matcher() -> PhraseMatcher:
+    # Markers such as "fast-paced" and "ever-evolving" are hyphenated compounds
+    return PhraseMatcher(load_phrase_list(os.path.join(LEXICON_DIR, "ai_markers_en.txt")), hyphenated=True)
+
+
+def _clamp(value: float) -> float:
+    return max(0.0, min(1.0, value))
+
+
 class AITextDetector:
     """
     Analyzes text to determine if it was likely generated by an AI.
-    
-    Current Implementation: Heuristic (Statistical)
+
+    Current Implementation: Heuristic (Statistical), computed locally in milliseconds.
+    Signals: burstiness, compression ratio, word entropy, function-word rate,
+    repeated trigrams and stock LLM phrasing. No single signal decides the score.
     Future Implementation: HuggingFace Transformer (roberta-base-openai-detector)
     """
-    
+
+    FUNCTION_WORDS = {
+        'a', 'an', 'the', 'and', 'or', 'but', 'nor', 'so', 'if', 'of', 'in', 'on',
+        'at', 'to', 'for', 'from', 'by', 'with', 'about', 'as', 'into', 'than',
+        'that', 'this', 'these', 'those', 'it', 'its', 'is', 'are', 'was', 'were',
+        'be', 'been', 'being', 'have', 'has', 'had', 'do', 'does', 'did', 'i', 'we',
+        'you', 'he', 'she', 'they', 'me', 'us', 'him', 'her', 'them', 'my', 'our',
+        'your', 'his', 'their', 'not', 'no', 'can', 'could', 'would', 'should',
+        'will', 'may', 'might', 'must', 'there', 'here', 'what', 'which', 'who',
+        'when', 'where', 'how', 'why', 'all', 'some', 'any', 'just', 'very', 'too',
+    }
+
+    # Weights of each signal in the final score (sum to 1.0)
+    WEIGHTS = {
+        "burstiness": 0.35,
+        "stock_phrases": 0.25,
+        "function_words": 0.15,
+        "compression": 0.10,
+        "repetition": 0.10,
+        "entropy": 0.05,
+    }
+
+    REASONS = {
+        "burstiness": "Sentence lengths are unusually uniform.",
+        "stock_phrases": "Frequent stock phrasing typical of language models.",
+        "function_words": "Low rate of function words, typical of dense generated prose.",
+        "compression": "Text is highly predictable (compresses unusually well).",
+        "repetition": "Many repeated three-word sequences.",
+        "entropy": "Narrow spread of word usage.",
+    }
+
     def detect(self, text: str) -> Dict[str, Any]:
         """
         Returns a score (0-100) indicating probability of AI generation.
@@ -19,47 +75,108 @@ class AITextDetector:
         if not text:
             return {"score": 0, "label": "Unknown", "details": {}}
 
-        # Heuristic 1: Sentence Length Standard Deviation (Burstiness)
-        # AI models tend to be more uniform in sentence length than humans.
-        sentences = [s.strip() for s in text.split('.') if len(s.split()) > 3]
-        if len(sentences) < 3:
+        # One pass over the text: sentence lengths, word counts, function words, trigrams
+        sent_lengths: List[int] = []
+        word_counts: Counter = Counter()
+        trigram_counts: Counter = Counter()
+        function_count = 0
+        current_len = 0
+        prev1 = prev2 = None
+        for match in _TOKEN_RE.finditer(text):
+            token = match.group()
+            if token[0] in ".!?":
+                if current_len > 3:
+                    sent_lengths.append(current_len)
+                current_len = 0
+                prev1 = prev2 = None
+                continue
+            word = token.lower()
+            current_len += 1
+            word_counts[word] += 1
+            if word in self.FUNCTION_WORDS:
+                function_count += 1
+            if prev2 is not None:
+                trigram_counts[(prev2, prev1, word)] += 1
+            prev2, prev1 = prev1, word
+        if current_len > 3:
+            sent_lengths.append(current_len)
+
+        if len(sent_lengths) < 3:
             return {"score": 0, "label": "Insufficient Data", "details": {}}
-            
-        sent_lengths = [len(s.split()) for s in sentences]
+
+        total_words = sum(word_counts.values())
+
+        # Heuristic 1: Burstiness (coefficient of variation of sentence length)
+        # AI models tend to be more uniform in sentence length than humans.
         std_dev = statistics.stdev(sent_lengths)
         avg_len = statistics.mean(sent_lengths)
-        
-        # Heuristic 2: Vocabulary Complexity (Perplexity-lite)
-        # AI often uses common words. Humans use more "surprising" words.
-        # (Simplified: TTR logic reused but interpreted differently)
-        # Low TTR + Low StdDev = High AI Probability
-        
-        # Calculate AI Score
-        # Low burstiness (std_dev < 5) suggests AI
-        # High burstiness (std_dev > 10) suggests Human
-        
-        burstiness_score = 0
-        if std_dev < 5:
-            burstiness_score = 80 # Likely AI
-        elif std_dev < 8:
-            burstiness_score = 50 # Maybe
-        else:
-            burstiness_score = 10 # Likely Human
-            
-        final_score = burstiness_score
-        
+        burstiness = std_dev / avg_len if avg_len else 0.0
+
+        # Heuristic 2: Compression ratio (predictability proxy)
+        raw = text.encode("utf-8")
+        compression_ratio = len(zlib.compress(raw, 6)) / len(raw)
+
+        # Heuristic 3: Normalized unigram entropy (spread of word usage)
+        entropy = -sum((c / total_words) * math.log2(c / total_words) for c in word_counts.values())
+        entropy_norm = entropy / math.log2(total_words) if total_words > 1 else 0.0
+
+        # Heuristic 4: Function-word rate
+        function_rate = function_count / total_words
+
+        # Heuristic 5: Repeated trigrams
+        total_trigrams = sum(trigram_counts.values())
+        repeated = sum(c for c in trigram_counts.values() if c > 1)
+        repetition_rate = repeated / total_trigrams if total_trigrams else 0.0
+
+        # Heuristic 6: Stock LLM phrasing per 100 words
+        marker_count = get_marker_matcher().count(text)
+        marker_density = marker_count * 100.0 / total_words
+
+        # Map each signal to an AI-likelihood in [0, 1]
+        signals = {
+            # CV < 0.25 suggests AI, CV > 0.6 suggests Human
+            "burstiness": _clamp((0.6 - burstiness) / 0.35),
+            # 1+ stock phrase per 100 words is a strong tell
+            "stock_phrases": _clamp(marker_density),
+            # Human essays rarely drop below ~40% function words
+            "function_words": _clamp((0.42 - function_rate) / 0.12),
+            # Prose typically compresses to ~0.40-0.50; predictable text goes lower.
+            # Short texts compress poorly, so this only applies above ~2KB.
+            "compression": _clamp((0.45 - compression_ratio) / 0.1) if len(raw) > 2048 else 0.0,
+            "repetition": _clamp(repetition_rate / 0.15),
+            "entropy": _clamp((0.85 - entropy_norm) / 0.15),
+        }
+        final_score = sum(self.WEIGHTS[name] * value for name, value in signals.items()) * 100
+
         label = "Human-written"
         if final_score > 70:
             label = "Likely AI-generated"
         elif final_score > 40:
             label = "Mixed / Uncertain"
-            
+
+        strongest = sorted(
+            (name for name in signals if signals[name] >= 0.5),
+            key=lambda name: self.WEIGHTS[name] * signals[name],
+            reverse=True,
+        )[:2]
+        if strongest:
+            reasoning = " ".join(self.REASONS[name] for name in strongest)
+        else:
+            reasoning = "Sentence rhythm and word usage look typical of human writing."
+
         return {
             "score": round(final_score, 2),
             "label": label,
+            "reasoning": reasoning,
             "details": {
-                "burstiness": round(std_dev, 2),
-                "avg_sentence_length": round(avg_len, 2)
+                "burstiness": round(burstiness, 3),
+                "sentence_length_std_dev": round(std_dev, 2),
+                "avg_sentence_length": round(avg_len, 2),
+                "compression_ratio": round(compression_ratio, 3),
+                "word_entropy": round(entropy_norm, 3),
+                "function_word_rate": round(function_rate, 3),
+                "repeated_trigram_rate": round(repetition_rate, 3),
+                "stock_phrase_count": marker_count,
             }
         }
 
@@ -1,25 +1,61 @@
-import re
+import os
+import logging
 import statistics
-from typing import Dict, Any, List
+from functools import lru_cache
+from typing import Dict, Any, List, Optional
+
+from app.core.config import settings
+from app.utils.text_processing import PhraseMatcher, load_phrase_list, paragraph_texts
+
+logger = logging.getLogger(__name__)
+
+LEXICON_DIR = os.path.join(os.path.dirname(__file__), "lexicons")
+DEFAULT_LANGUAGE = "en"
+
+
+@lru_cache(maxsize=None)
+def get_transition_matcher(language: str = DEFAULT_LANGUAGE) -> PhraseMatcher:
+    """
+    Compiles the connective lexicon for a language once per process.
+    A file in TRANSITION_LEXICON_DIR overrides the bundled lexicon.
+    """
+    filename = f"transitions_{language}.txt"
+    candidates = [os.path.join(LEXICON_DIR, filename)]
+    if settings.TRANSITION_LEXICON_DIR:
+        candidates.insert(0, os.path.join(settings.TRANSITION_LEXICON_DIR, filename))
+
+    for path in candidates:
+        if os.path.exists(path):
+            matcher = PhraseMatcher(load_phrase_list(path))
+            logger.info(f"Loaded {matcher.size} transition phrases for '{language}' from {path}")
+            return matcher
+
+    if language != DEFAULT_LANGUAGE:
+        logger.warning(f"No transition lexicon for '{language}'. Falling back to '{DEFAULT_LANGUAGE}'.")
+        return get_transition_matcher(DEFAULT_LANGUAGE)
+    raise FileNotFoundError(f"Transition lexicon not found: {filename}")
+
 
 class CoherenceScorer:
     """
     Analyzes structure and flow of the document.
     """
-    
-    TRANSITION_WORDS = {
-        'however', 'therefore', 'furthermore', 'moreover', 'consequently', 
-        'nevertheless', 'nonetheless', 'meanwhile', 'subsequently', 'conversely', 
-        'similarly', 'additionally', 'finally', 'initially', 'specifically',
-        'for example', 'in conclusion', 'on the other hand', 'as a result'
-    }
 
-    def analyze(self, text: str) -> Dict[str, Any]:
+    def __init__(self, language: str = DEFAULT_LANGUAGE):
+        self.language = language
+
+    def analyze(
+        self, text: str, language: Optional[str] = None, structure: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, Any]:
+        """`structure` is the parser's map of text; its paragraph spans spare a re-split."""
         if not text:
             return {"score": 0, "analysis": {}}
 
         # Split into paragraphs
-        paragraphs = [p.strip() for p in text.split('\n\n') if p.strip()]
+        if structure:
+            paragraphs = paragraph_texts(text, structure)
+        else:
+            paragraphs = [p.strip() for p in text.split('\n\n') if p.strip()]
         
         # 1. Paragraph Count & Length Consistency
         para_count = len(paragraphs)
@@ -30,12 +66,10 @@ class CoherenceScorer:
         para_length_variance = statistics.stdev(para_lengths) if para_count > 1 else 0
         avg_para_length = statistics.mean(para_lengths)
         
-        # 2. Transition Word Usage
-        transition_count = 0
-        lower_text = text.lower()
-        for word in self.TRANSITION_WORDS:
-            transition_count += lower_text.count(word)
-            
+        # 2. Transition Word Usage (single word-boundary-aware pass)
+        transitions = get_transition_matcher(language or self.language).find_all(text)
+        transition_count = len(transitions)
+
         transitions_per_para = transition_count / para_count
         
         # 3. Calculate Score
@@ -63,6 +97,7 @@ class CoherenceScorer:
                 "paragraph_count": para_count,
                 "avg_paragraph_length_words": round(avg_para_length, 1),
                 "transition_word_count": transition_count,
+                "transitions": transitions,
                 "structure_rating": "Good" if score_structure > 80 else "Needs Improvement"
             }
         }
@@ -10,10 +10,14 @@ if rate-limited.
 """
 
 import json
+import time
 import logging
 from typing import Dict, Any, Optional
 
 from app.core.config import settings
+from app.core.metrics import LLM_REQUESTS
+from app.ai.llm_errors import LLMRateLimitError, LLMResponseError, LLMUnavailableError, classify_llm_error
+from app.ai.rate_limiter import get_rate_limiter, note_quota_exhausted, quota_available_at
 
 logger = logging.getLogger(__name__)
 
@@ -75,14 +79,19 @@ Evaluate the essay on each dimension below. For each, provide:
 
 4. **topic_relevance** — Evaluate how well the essay addresses the prompt/topic. Does it stay focused? Does it cover the key aspects the prompt asks for? A score of 70+ means the essay directly and thoroughly addresses the topic. If the essay is completely off-topic (e.g., writing about cooking when asked about technology), give a score below 10.
 
-5. **ai_detection** — Evaluate whether this text appears to be written by an AI (ChatGPT, Claude, etc). IMPORTANT: Do not assume well-structured, professional, or perfectly grammatical text is AI! Published books and advanced academic essays are highly structured by humans. Instead, look for classic AI "tells": uncanny semantic blandness, forced/repetitive sentence lengths, lack of concrete specific details, and the heavy overuse of generic transition words (e.g., 'Delve into', 'A testament to', 'In conclusion'). Return a score where 0 = definitely human, 100 = definitely AI-generated. Also include a `label` field with one of: "Likely Human", "Mixed / Uncertain", "Likely AI-generated".
-
+{ai_detection_section}
 ## Required JSON Output Format:
-Return a JSON object with exactly these keys: grammar, vocabulary, coherence, topic_relevance, ai_detection.
+Return a JSON object with exactly these keys: {output_keys}.
 Each key (except ai_detection) should have: score (int), reasoning (string), strengths (list of strings), improvements (list of strings).
 The `grammar` key MUST also have: `error_spans` (list of objects with original_text, message, suggestion).
-ai_detection should have: score (int), reasoning (string), label (string).
+{ai_detection_format}"""
+
+# Only sent when AI_DETECTION_ENGINE == "gemini"; the local detector replaces it otherwise
+AI_DETECTION_SECTION = """5. **ai_detection** — Evaluate whether this text appears to be written by an AI (ChatGPT, Claude, etc). IMPORTANT: Do not assume well-structured, professional, or perfectly grammatical text is AI! Published books and advanced academic essays are highly structured by humans. Instead, look for classic AI "tells": uncanny semantic blandness, forced/repetitive sentence lengths, lack of concrete specific details, and the heavy overuse of generic transition words (e.g., 'Delve into', 'A testament to', 'In conclusion'). Return a score where 0 = definitely human, 100 = definitely AI-generated. Also include a `label` field with one of: "Likely Human", "Mixed / Uncertain", "Likely AI-generated".
 """
+AI_DETECTION_FORMAT = "ai_detection should have: score (int), reasoning (string), label (string).\n"
+
+SCORED_DIMENSIONS = ["grammar", "vocabulary", "coherence", "topic_relevance"]
 
 
 class GeminiEvaluator:
@@ -90,20 +99,30 @@ class GeminiEvaluator:
     Uses Gemini to evaluate essay quality across ALL dimensions
     in a single API call with structured JSON output.
     
-    Gemini handles: grammar, vocabulary, coherence, topic_relevance, ai_detection.
+    Gemini handles: grammar, vocabulary, coherence, topic_relevance, and
+    ai_detection only when AI_DETECTION_ENGINE is "gemini".
     LanguageTool is still used separately for error span highlighting (UI only).
     
     Tries multiple models in sequence to handle per-model rate limits.
     """
 
     async def evaluate(
-        self, text: str, prompt: Optional[str] = None
+        self, text: str, prompt: Optional[str] = None, include_ai_detection: Optional[bool] = None
     ) -> Optional[Dict[str, Any]]:
         """
         Evaluate essay text across all dimensions using Gemini.
-        Tries each model in MODEL_CHAIN until one succeeds.
-        Returns structured results or None if all models fail.
+        Tries each model in MODEL_CHAIN until one succeeds, skipping models
+        whose quota is known to be exhausted. Returns structured results, or
+        None without an API key. Raises LLMRateLimitError when every model is
+        out of quota and LLMUnavailableError when they all fail and at least
+        one of them for a retryable reason, with `retry_after` set to the
+        earliest expected quota reset. Raises LLMResponseError when no model
+        failed for a retryable reason (bad request, invalid output).
         """
+        if include_ai_detection is None:
+            include_ai_detection = settings.AI_DETECTION_ENGINE == "gemini"
+        dimensions = SCORED_DIMENSIONS + (["ai_detection"] if include_ai_detection else [])
+
         if not settings.GEMINI_API_KEY:
             logger.warning("No GEMINI_API_KEY configured.")
             return None
@@ -123,16 +142,32 @@ class GeminiEvaluator:
             truncated += "\n[... essay truncated for analysis ...]"
 
         full_prompt = EVALUATION_PROMPT.format(
-            essay_text=truncated, prompt_section=prompt_section
+            essay_text=truncated,
+            prompt_section=prompt_section,
+            ai_detection_section=AI_DETECTION_SECTION if include_ai_detection else "",
+            output_keys=", ".join(dimensions),
+            ai_detection_format=AI_DETECTION_FORMAT if include_ai_detection else "",
         )
 
         # Try each model in the chain
         last_error = None
+        retryable = False  # Whether any model failed for a reason a later retry may fix
+        quota_resets = []  # Expected quota reset (epoch seconds) of each rate-limited model
         for model_name in MODEL_CHAIN:
+            available_at = await quota_available_at(model_name)
+            if available_at:
+                logger.info(f"Skipping {model_name}: quota expected back in {available_at - time.time():.0f}s")
+                LLM_REQUESTS.labels(model_name, "quota_skipped").inc()
+                quota_resets.append(available_at)
+                retryable = True
+                continue
+
             try:
                 logger.info(f"Trying Gemini model: {model_name}")
                 model = _get_model(model_name)
                 
+                await get_rate_limiter(model_name).acquire()
+
                 # Use synchronous generate_content in a thread to prevent grpc.aio event loop crashing
                 import asyncio
                 response = await asyncio.to_thread(model.generate_content, full_prompt)
@@ -143,13 +178,15 @@ class GeminiEvaluator:
                 result = json.loads(raw)
 
                 # Validate structure
-                required_keys = {"grammar", "vocabulary", "coherence", "topic_relevance", "ai_detection"}
+                required_keys = set(dimensions)
                 if not required_keys.issubset(result.keys()):
                     logger.error(f"Gemini response missing keys. Got: {result.keys()}")
+                    LLM_REQUESTS.labels(model_name, "missing_keys").inc()
+                    last_error = ValueError(f"missing keys {sorted(required_keys - result.keys())}")
                     continue  # Try next model
 
                 # Clamp scores to 0-100
-                for key in ["grammar", "vocabulary", "coherence", "topic_relevance", "ai_detection"]:
+                for key in dimensions:
                     if "score" in result[key]:
                         result[key]["score"] = max(0, min(100, int(result[key]["score"])))
 
@@ -157,25 +194,41 @@ class GeminiEvaluator:
                 result["_model"] = model_name
 
                 logger.info(f"Gemini evaluation completed with model: {model_name}")
+                LLM_REQUESTS.labels(model_name, "success").inc()
                 return result
 
             except json.JSONDecodeError as e:
                 logger.error(f"Model {model_name} returned invalid JSON: {e}")
+                LLM_REQUESTS.labels(model_name, "invalid_json").inc()
                 last_error = e
                 continue
             except Exception as e:
-                err_str = str(e)
-                if "429" in err_str or "quota" in err_str.lower():
+                error = classify_llm_error(e, model_name)
+                retryable = retryable or error is not None
+                if isinstance(error, LLMRateLimitError):
                     logger.warning(f"Model {model_name} is rate-limited. Trying next model...")
-                    last_error = e
-                    continue
+                    LLM_REQUESTS.labels(model_name, "rate_limited").inc()
+                    quota_resets.append(await note_quota_exhausted(model_name, error.retry_after))
+                elif isinstance(error, LLMUnavailableError):
+                    logger.warning(f"Model {model_name} is unavailable: {e}")
+                    LLM_REQUESTS.labels(model_name, "unavailable").inc()
                 else:
                     logger.error(f"Model {model_name} failed: {e}")
-                    last_error = e
-                    continue
+                    LLM_REQUESTS.labels(model_name, "error").inc()
+                last_error = e
+                continue
 
         logger.error(f"All Gemini models exhausted. Last error: {last_error}")
-        return None
+        if not retryable:
+            raise LLMResponseError(f"Gemini evaluation failed on all models. Last error: {last_error}")
+        retry_after = max(0.0, min(quota_resets) - time.time()) if quota_resets else None
+        if len(quota_resets) == len(MODEL_CHAIN):
+            raise LLMRateLimitError(
+                f"Gemini quota exhausted on all models. Last error: {last_error}", retry_after=retry_after
+            )
+        raise LLMUnavailableError(
+            f"Gemini AI is currently unavailable. Last error: {last_error}", retry_after=retry_after
+        )
 
 
 gemini_evaluator = GeminiEvaluator()
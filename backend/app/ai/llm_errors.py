@@ -0,0 +1,78 @@
+"""
+Structured LLM failures.
+
+Provider exceptions are classified once, here, into rate-limit and
+unavailability errors carrying the server's retry hint, so callers schedule
+retries from the error type instead of matching on message text.
+"""
+
+import re
+from typing import Optional
+
+
+class LLMError(Exception):
+    """Base class for LLM failures worth retrying later."""
+
+    def __init__(self, message: str, retry_after: Optional[float] = None, model: Optional[str] = None):
+        super().__init__(message)
+        # Seconds until the provider expects capacity again, when it said so
+        self.retry_after = retry_after
+        self.model = model
+
+
+class LLMRateLimitError(LLMError):
+    """Quota exhausted (HTTP 429 / RESOURCE_EXHAUSTED)."""
+
+
+class LLMUnavailableError(LLMError):
+    """Provider down, overloaded or timing out on every model."""
+
+
+class LLMResponseError(Exception):
+    """
+    Every model failed without a rate limit or outage: bad key or request,
+    invalid JSON or missing keys. Not an LLMError: the task retries it only a
+    couple of times (a resampled answer may parse) instead of waiting on quota.
+    """
+
+
+# "Please retry in 41.53s." and the RetryInfo detail "retry_delay { seconds: 41 }"
+_RETRY_IN = re.compile(r"retry in\s+([\d.]+)\s*(ms|s)\b", re.IGNORECASE)
+_RETRY_DELAY = re.compile(r"retry_delay\s*\{\s*seconds:\s*(\d+)", re.IGNORECASE)
+
+_RATE_LIMIT_MARKERS = ("429", "quota", "resource exhausted", "resource_exhausted", "rate limit")
+_UNAVAILABLE_MARKERS = ("unavailable", "overloaded", "deadline exceeded", "timed out", "timeout")
+
+
+def parse_retry_after(message: str) -> Optional[float]:
+    """Retry hint in seconds from a provider error message, if present."""
+    match = _RETRY_IN.search(message)
+    if match:
+        value = float(match.group(1))
+        return value / 1000 if match.group(2).lower() == "ms" else value
+    match = _RETRY_DELAY.search(message)
+    if match:
+        return float(match.group(1))
+    return None
+
+
+def classify_llm_error(exc: Exception, model: Optional[str] = None) -> Optional[LLMError]:
+    """
+    Maps a provider exception to LLMRateLimitError or LLMUnavailableError.
+    Returns None for errors that retrying will not fix (bad key, bad request, ...).
+    """
+    if isinstance(exc, LLMError):
+        return exc
+
+    message = str(exc)
+    lowered = message.lower()
+    # google.api_core exceptions carry the HTTP status as `code`
+    code = getattr(exc, "code", None)
+    code = code if isinstance(code, int) else None
+
+    if code == 429 or any(m in lowered for m in _RATE_LIMIT_MARKERS):
+        return LLMRateLimitError(message, retry_after=parse_retry_after(message), model=model)
+    if (code is not None and code >= 500) or isinstance(exc, TimeoutError) \
+            or any(m in lowered for m in _UNAVAILABLE_MARKERS):
+        return LLMUnavailableError(message, retry_after=parse_retry_after(message), model=model)
+    return None
@@ -1,8 +1,9 @@
 import logging
 import re
 import pickle
-from datetime import datetime
-from typing import Dict, Any, List, Set
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, Any, List, Optional, Set
 from datasketch import MinHash, MinHashLSH
 from app.core.config import settings
 from motor.motor_asyncio import AsyncIOMotorDatabase
@@ -13,7 +14,13 @@ class PlagiarismDetector:
     """
     Detects plagiarism using MinHash LSH (Locality Sensitive Hashing).
     Persists signatures to MongoDB to maintain corpus across restarts.
+
+    Loads and additions run on the worker's event loop while checks run in
+    executor threads, so the index and signatures are only touched under a lock.
     """
+
+    # Re-read window behind the watermark, for writes committed after a later timestamp
+    WATERMARK_OVERLAP_SECONDS = 60
     
     def __init__(self, threshold: float = 0.5, num_perm: int = 128):
         self.threshold = threshold
@@ -21,31 +28,53 @@ class PlagiarismDetector:
         self.lsh = MinHashLSH(threshold=threshold, num_perm=num_perm)
         self.corpus_signatures: Dict[str, MinHash] = {}
         self._is_initialized = False
+        # updated_at of each loaded signature, and the newest one seen
+        self._loaded_versions: Dict[str, datetime] = {}
+        self._watermark: Optional[datetime] = None
+        self._lock = threading.Lock()
 
     async def initialize(self, db: AsyncIOMotorDatabase):
         """
         Loads hashes from MongoDB into memory.
-        Incrementally loads only NEW documents not already in mem.
-        Called before each plagiarism check to ensure cross-worker consistency.
+        The first call loads everything; later calls only fetch signatures
+        written since the newest one seen (minus a clock-skew overlap), and
+        replace ones that were re-added. Called before each plagiarism check
+        to ensure cross-worker consistency.
         """
-        count = 0
-        cursor = db["plagiarism_hashes"].find({})
+        loaded = []
+        query = {}
+        if self._watermark is not None:
+            query = {"updated_at": {"$gte": self._watermark - timedelta(seconds=self.WATERMARK_OVERLAP_SECONDS)}}
+        cursor = db["plagiarism_hashes"].find(query)
         async for doc in cursor:
             try:
                 doc_id = doc["document_id"]
-                # Skip if already loaded in this process
-                if doc_id in self.corpus_signatures:
+                updated_at = doc.get("updated_at")
+                if updated_at and (self._watermark is None or updated_at > self._watermark):
+                    self._watermark = updated_at
+                # Skip if this version is already loaded in this process
+                if doc_id in self.corpus_signatures and self._loaded_versions.get(doc_id) == updated_at:
                     continue
-                    
-                minhash = pickle.loads(doc["signature"])
-                self.corpus_signatures[doc_id] = minhash
-                self.lsh.insert(doc_id, minhash)
-                count += 1
+                loaded.append((doc_id, pickle.loads(doc["signature"]), updated_at))
             except Exception as e:
                 logger.error(f"Failed to load hash for {doc.get('document_id')}: {e}")
-        
-        if count > 0:
-            logger.info(f"Loaded {count} new documents into Plagiarism LSH index (total: {len(self.corpus_signatures)}).")
+
+        # Applied at once, so checks never wait on the cursor
+        with self._lock:
+            for doc_id, minhash, updated_at in loaded:
+                self._index(doc_id, minhash, updated_at)
+        self._is_initialized = True
+
+        if loaded:
+            logger.info(f"Loaded {len(loaded)} new documents into Plagiarism LSH index (total: {len(self.corpus_signatures)}).")
+
+    def _index(self, doc_id: str, minhash: MinHash, updated_at: Optional[datetime]):
+        """Adds or replaces one signature in memory. Caller holds the lock."""
+        if doc_id in self.lsh:
+            self.lsh.remove(doc_id)
+        self.lsh.insert(doc_id, minhash)
+        self.corpus_signatures[doc_id] = minhash
+        self._loaded_versions[doc_id] = updated_at
 
     def _tokenize(self, text: str) -> Set[str]:
         if not text:
@@ -76,10 +105,11 @@ class PlagiarismDetector:
         m = self._generate_minhash(text)
         
         # 1. Update In-Memory
-        if doc_id in self.lsh:
-            self.lsh.remove(doc_id)
-        self.lsh.insert(doc_id, m)
-        self.corpus_signatures[doc_id] = m
+        # Mongo stores milliseconds; keep the same precision so the next load sees it as current
+        now = datetime.utcnow()
+        updated_at = now.replace(microsecond=now.microsecond // 1000 * 1000)
+        with self._lock:
+            self._index(doc_id, m, updated_at)
         
         # 2. Persist to MongoDB
         signature_blob = pickle.dumps(m)
@@ -88,7 +118,7 @@ class PlagiarismDetector:
             {"$set": {
                 "document_id": doc_id, 
                 "signature": signature_blob,
-                "updated_at": datetime.utcnow()
+                "updated_at": updated_at
             }},
             upsert=True
         )
@@ -104,15 +134,16 @@ class PlagiarismDetector:
 
         query_minhash = self._generate_minhash(text)
         
-        candidates = self.lsh.query(query_minhash)
+        with self._lock:
+            candidates = [
+                (doc_id, self.corpus_signatures.get(doc_id))
+                for doc_id in self.lsh.query(query_minhash)
+                if doc_id != exclude_doc_id
+            ]
         matches = []
         total_similarity = 0.0
         
-        for doc_id in candidates:
-            if doc_id == exclude_doc_id:
-                continue
-                
-            target_minhash = self.corpus_signatures.get(doc_id)
+        for doc_id, target_minhash in candidates:
             if target_minhash:
                 similarity = query_minhash.jaccard(target_minhash)
                 
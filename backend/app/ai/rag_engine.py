@@ -2,9 +2,13 @@ import logging
 from typing import Dict, Any
 
 from app.core.config import settings
+from app.ai.llm_errors import LLMRateLimitError, classify_llm_error
+from app.ai.rate_limiter import get_rate_limiter, note_quota_exhausted
 
 logger = logging.getLogger(__name__)
 
+FEEDBACK_MODEL = "gemini-2.5-flash"
+
 # Lazy-loaded Gemini client
 _gemini_model = None
 
@@ -16,7 +20,7 @@ def _get_gemini_model():
         try:
             import google.generativeai as genai
             genai.configure(api_key=settings.GEMINI_API_KEY)
-            _gemini_model = genai.GenerativeModel("gemini-2.5-flash")
+            _gemini_model = genai.GenerativeModel(FEEDBACK_MODEL)
             logger.info("Gemini 2.5 Flash model initialized successfully.")
         except Exception as e:
             logger.error(f"Failed to initialize Gemini model: {e}")
@@ -53,6 +57,9 @@ class RAGEngine:
                     return feedback
             except Exception as e:
                 logger.warning(f"Gemini feedback generation failed, using fallback: {e}")
+                error = classify_llm_error(e, FEEDBACK_MODEL)
+                if isinstance(error, LLMRateLimitError):
+                    await note_quota_exhausted(FEEDBACK_MODEL, error.retry_after)
 
         # Fallback to templates
         return self._generate_template_feedback(
@@ -96,6 +103,7 @@ Analyze the following essay and its evaluation scores, then provide a **concise
 5. Do NOT mention the numerical scores — focus on qualitative assessment
 6. Write as a single cohesive paragraph, not a bulleted list"""
 
+        await get_rate_limiter(FEEDBACK_MODEL).acquire()
         response = await model.generate_content_async(prompt)
         feedback = response.text.strip()
 
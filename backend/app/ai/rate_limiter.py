@@ -0,0 +1,94 @@
+import time
+import asyncio
+import logging
+import threading
+from typing import Dict
+
+from app.core.config import settings
+from app.db.redis_client import get_async_redis
+
+logger = logging.getLogger(__name__)
+
+# Assumed quota cooldown when a 429 carries no retry hint (Gemini quotas are per minute)
+DEFAULT_QUOTA_COOLDOWN_SECONDS = 60
+
+
+class AsyncTokenBucket:
+    """
+    Token-bucket limiter for coroutines.
+
+    acquire() reserves a token and sleeps until it is due, so concurrent callers
+    queue up in arrival order without holding any lock across an await. Not
+    bound to an event loop, so one instance can serve every loop in the process.
+    """
+
+    def __init__(self, rate_per_minute: float, burst: int = 1):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = max(1, burst)
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _reserve(self) -> float:
+        """Takes a token (possibly going into debt); returns seconds to wait for it."""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            return -self._tokens / self.rate if self._tokens < 0 else 0.0
+
+    async def acquire(self) -> None:
+        if self.rate <= 0:
+            return
+        delay = self._reserve()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+_limiters: Dict[str, AsyncTokenBucket] = {}
+_limiters_lock = threading.Lock()
+
+
+def get_rate_limiter(model_name: str) -> AsyncTokenBucket:
+    """Per-model limiter (each Gemini model has its own quota), shared by the process."""
+    with _limiters_lock:
+        limiter = _limiters.get(model_name)
+        if limiter is None:
+            limiter = AsyncTokenBucket(settings.GEMINI_REQUESTS_PER_MINUTE, settings.GEMINI_BURST)
+            _limiters[model_name] = limiter
+        return limiter
+
+
+# Quota resets observed by any process: model -> epoch seconds when capacity returns.
+# Shared through Redis so one 429 stops every worker from hitting the same wall;
+# the local copy covers Redis outages.
+_quota_resets: Dict[str, float] = {}
+
+
+def _quota_key(model_name: str) -> str:
+    return f"llm_quota_reset:{model_name}"
+
+
+async def note_quota_exhausted(model_name: str, retry_after: float = None) -> float:
+    """Records that model_name is out of quota; returns when it is expected back (epoch seconds)."""
+    cooldown = retry_after if retry_after and retry_after > 0 else DEFAULT_QUOTA_COOLDOWN_SECONDS
+    reset_at = time.time() + cooldown
+    _quota_resets[model_name] = max(_quota_resets.get(model_name, 0.0), reset_at)
+    try:
+        await get_async_redis().set(_quota_key(model_name), reset_at, ex=int(cooldown) + 1)
+    except Exception as e:
+        logger.warning(f"Could not share quota reset for {model_name}: {e}")
+    return reset_at
+
+
+async def quota_available_at(model_name: str) -> float:
+    """Epoch seconds when model_name is expected to have quota again (0 if it has now)."""
+    reset_at = _quota_resets.get(model_name, 0.0)
+    try:
+        shared = await get_async_redis().get(_quota_key(model_name))
+        if shared:
+            reset_at = max(reset_at, float(shared))
+    except Exception as e:
+        logger.warning(f"Could not read quota reset for {model_name}: {e}")
+    return reset_at if reset_at > time.time() else 0.0
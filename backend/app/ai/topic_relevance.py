@@ -1,14 +1,109 @@
 import re
 import math
-from collections import Counter
-from typing import Dict, Any
+import time
+import hashlib
+import logging
+import threading
+from collections import Counter, OrderedDict
+from typing import Dict, Any, List, Tuple
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import DESCENDING, UpdateOne
+from app.core.config import settings
+from app.core.metrics import record_cache_lookup
+
+logger = logging.getLogger(__name__)
+
+# Sparse vector: term -> weight
+SparseVector = Dict[str, float]
+
+# Pseudo-term holding the corpus size (cannot collide with a \w+ token)
+_DOC_COUNT_KEY = "#documents"
+
 
 class TopicRelevanceAnalyzer:
     """
-    Analyzes topic relevance using pure-Python Cosine Similarity (TF logic).
+    Analyzes topic relevance using TF-IDF Cosine Similarity.
     Compares the student's essay against a prompt/rubric.
+
+    IDF statistics are maintained incrementally over the submission corpus and
+    persisted to MongoDB. Each worker process holds at most TOPIC_STATS_MAX_TERMS
+    of them in memory, the most frequent terms; a term left out is rarer than
+    all of those and gets the maximum IDF, as a term never seen does.
+
+    Prompt vectors are computed once per prompt and cached, since a whole class
+    usually shares the same prompt. Essays are scored one at a time, as each
+    is evaluated by its own task; scoring one against a cached prompt vector
+    only touches the prompt's non-zero terms.
+
+    Statistics are updated on the worker's event loop while analyze() runs in
+    executor threads; the prompt cache and statistic updates take a lock.
     """
-    
+
+    PROMPT_CACHE_SIZE = 256
+    # Rebuild a cached prompt vector once the corpus has grown by this fraction
+    IDF_REFRESH_RATIO = 0.05
+    # Reload corpus statistics from MongoDB at most this often (per process)
+    STATS_REFRESH_SECONDS = 3600
+
+    def __init__(self):
+        self.doc_count = 0
+        self.doc_freq: Counter = Counter()
+        self._prompt_cache: "OrderedDict[str, Tuple[int, SparseVector, float]]" = OrderedDict()
+        self._loaded_at = 0.0
+        self._lock = threading.Lock()
+
+    async def initialize(self, db: AsyncIOMotorDatabase, force: bool = False):
+        """
+        Loads corpus term statistics from MongoDB.
+        Cheap to call per evaluation: only reloads when the in-memory copy is stale.
+        """
+        if not force and self._loaded_at and (time.time() - self._loaded_at) < self.STATS_REFRESH_SECONDS:
+            return
+
+        collection = db["topic_term_stats"]
+        counter = await collection.find_one({"_id": _DOC_COUNT_KEY})
+        doc_count = (counter or {}).get("df", 0)
+
+        doc_freq = Counter()
+        cursor = collection.find({"_id": {"$ne": _DOC_COUNT_KEY}}, {"df": 1}).sort("df", DESCENDING)
+        if settings.TOPIC_STATS_MAX_TERMS > 0:
+            cursor = cursor.limit(settings.TOPIC_STATS_MAX_TERMS)
+        async for doc in cursor:
+            doc_freq[doc["_id"]] = doc.get("df", 0)
+
+        with self._lock:
+            self.doc_freq = doc_freq
+            self.doc_count = doc_count
+            self._loaded_at = time.time()
+        logger.info(f"Loaded topic relevance IDF statistics ({doc_count} documents, {len(doc_freq)} terms).")
+
+    async def add_document(self, db: AsyncIOMotorDatabase, doc_id: str, text: str):
+        """
+        Adds a submission's terms to the corpus statistics and persists them.
+        Each document is counted once, even if it is evaluated again.
+        """
+        if not text:
+            return
+
+        marker = await db["topic_indexed_documents"].update_one(
+            {"_id": doc_id}, {"$setOnInsert": {"_id": doc_id}}, upsert=True
+        )
+        if marker.upserted_id is None:
+            return
+
+        terms = set(self._tokenize(text))
+        self.observe(terms)
+
+        operations = [UpdateOne({"_id": t}, {"$inc": {"df": 1}}, upsert=True) for t in terms]
+        operations.append(UpdateOne({"_id": _DOC_COUNT_KEY}, {"$inc": {"df": 1}}, upsert=True))
+        await db["topic_term_stats"].bulk_write(operations, ordered=False)
+
+    def observe(self, terms) -> None:
+        """Updates the in-memory statistics with one document's distinct terms."""
+        with self._lock:
+            self.doc_count += 1
+            self.doc_freq.update(terms)
+
     def analyze(self, essay_text: str, prompt_text: str) -> Dict[str, Any]:
         """
         Calculates similarity between essay and prompt.
@@ -16,39 +111,64 @@ class TopicRelevanceAnalyzer:
         if not essay_text or not prompt_text:
             return {"score": 0, "similarity": 0}
 
-        # Tokenize
-        essay_vec = self._text_to_vector(essay_text)
-        prompt_vec = self._text_to_vector(prompt_text)
-        
-        # Calculate Cosine Similarity
-        similarity = self._get_cosine(essay_vec, prompt_vec)
-        
+        prompt_vec, prompt_norm = self._get_prompt_vector(prompt_text)
+        similarity = self._similarity(essay_text, prompt_vec, prompt_norm)
+        return self._result(similarity)
+
+    def _result(self, similarity: float) -> Dict[str, Any]:
         # Scoring Logic
         # If similarity > 0.3, it's usually relevant enough for a broad topic
         # Normalize: 0.0 -> 0, 0.5 -> 100 (optimistic scaling)
         score = min(similarity * 2.5, 1.0) * 100
-        
+
         return {
             "score": round(score, 2),
             "similarity": round(similarity, 4),
             "is_relevant": score > 40
         }
 
-    def _text_to_vector(self, text: str) -> Counter:
-        words = re.findall(r'\w+', text.lower())
-        return Counter(words)
+    def _tokenize(self, text: str) -> List[str]:
+        return re.findall(r'\w+', text.lower())
 
-    def _get_cosine(self, vec1: Counter, vec2: Counter) -> float:
-        intersection = set(vec1.keys()) & set(vec2.keys())
-        numerator = sum([vec1[x] * vec2[x] for x in intersection])
+    def _idf(self, term: str) -> float:
+        # Smoothed IDF: terms never seen in the corpus get the maximum weight
+        return math.log((1 + self.doc_count) / (1 + self.doc_freq.get(term, 0))) + 1.0
 
-        sum1 = sum([vec1[x]**2 for x in vec1.keys()])
-        sum2 = sum([vec2[x]**2 for x in vec2.keys()])
-        denominator = math.sqrt(sum1) * math.sqrt(sum2)
+    def _weighted_vector(self, text: str) -> Tuple[SparseVector, float]:
+        tf = Counter(self._tokenize(text))
+        vec = {term: count * self._idf(term) for term, count in tf.items()}
+        norm = math.sqrt(sum(w * w for w in vec.values()))
+        return vec, norm
 
+    def _get_prompt_vector(self, prompt_text: str) -> Tuple[SparseVector, float]:
+        key = hashlib.sha256(prompt_text.encode("utf-8")).hexdigest()
+        with self._lock:
+            cached = self._prompt_cache.get(key)
+            if cached:
+                built_at, vec, norm = cached
+                if abs(self.doc_count - built_at) <= self.IDF_REFRESH_RATIO * max(built_at, 1):
+                    self._prompt_cache.move_to_end(key)
+                    record_cache_lookup("topic_prompt_vector", hit=True)
+                    return vec, norm
+
+        record_cache_lookup("topic_prompt_vector", hit=False)
+        # Built outside the lock; two threads missing together both build it
+        built_at = self.doc_count
+        vec, norm = self._weighted_vector(prompt_text)
+        with self._lock:
+            self._prompt_cache[key] = (built_at, vec, norm)
+            self._prompt_cache.move_to_end(key)
+            if len(self._prompt_cache) > self.PROMPT_CACHE_SIZE:
+                self._prompt_cache.popitem(last=False)
+        return vec, norm
+
+    def _similarity(self, essay_text: str, prompt_vec: SparseVector, prompt_norm: float) -> float:
+        essay_vec, essay_norm = self._weighted_vector(essay_text)
+        denominator = essay_norm * prompt_norm
         if not denominator:
             return 0.0
-        else:
-            return float(numerator) / denominator
+
+        numerator = sum(w * essay_vec.get(term, 0.0) for term, w in prompt_vec.items())
+        return float(numerator) / denominator
 
 topic_relevance_analyzer = TopicRelevanceAnalyzer()
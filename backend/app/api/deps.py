@@ -3,6 +3,7 @@ from fastapi import Depends, HTTPException, status
 from app.db.mongodb import get_database
 from motor.motor_asyncio import AsyncIOMotorDatabase
 from app.core.security import get_current_user_dependency as get_firebase_user
+from app.core.security import get_current_user_from_header_or_query
 from app.models.user import User
 import os
 from datetime import datetime
@@ -11,6 +12,18 @@ async def get_current_user(
     token_data: dict = Depends(get_firebase_user),
     db: AsyncIOMotorDatabase = Depends(get_database)
 ) -> dict:
+    return await _load_user(token_data, db)
+
+
+async def get_current_user_stream(
+    token_data: dict = Depends(get_current_user_from_header_or_query),
+    db: AsyncIOMotorDatabase = Depends(get_database)
+) -> dict:
+    """Like get_current_user, but also accepts ?token= (for EventSource/SSE clients)."""
+    return await _load_user(token_data, db)
+
+
+async def _load_user(token_data: dict, db: AsyncIOMotorDatabase) -> dict:
     """
     Dependency that retrieves the user from MongoDB based on the Firebase token.
     If the user does not exist in MongoDB (e.g., first login before registration),
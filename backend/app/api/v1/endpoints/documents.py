@@ -1,15 +1,22 @@
-from typing import Any, List, Optional
+from typing import Any, List, Optional, Tuple
 from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form, status
+from fastapi.concurrency import run_in_threadpool
 from motor.motor_asyncio import AsyncIOMotorDatabase
 import os
+import zipfile
 from bson import ObjectId
 
 from app.db.mongodb import get_database
+from app.models.batch import Batch
 from app.models.document import Document
 from app.schemas.document import DocumentResponse, DocumentDetailResponse
 from app.services.storage_service import storage_service
 from app.api.deps import get_current_user
-from app.workers.tasks.document_tasks import process_uploaded_document
+from app.workers.tasks.document_tasks import submit_batch_pipeline, submit_document_pipeline
+from app.workers.celery_app import PRIORITIES
+from app.services.progress import apply_live_status
+from app.services.admission import DEFERRED_STATUS, Admission, check_admission
+from app.core.config import settings
 
 router = APIRouter()
 
@@ -20,6 +27,14 @@ ALLOWED_MIME_TYPES = {
     "text/plain": "txt"
 }
 MAX_FILE_SIZE = 25 * 1024 * 1024  # 25MB
+# Content type of files inside ZIP archives (or sent as octet-stream) by extension
+EXTENSION_MIME_TYPES = {
+    ".pdf": "application/pdf",
+    ".docx": "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+    ".txt": "text/plain",
+}
+ZIP_MIME_TYPES = {"application/zip", "application/x-zip-compressed"}
+MAX_BATCH_FILES = 500
 
 @router.get("/", response_model=List[DocumentResponse])
 async def list_documents(
@@ -31,7 +46,10 @@ async def list_documents(
     """
     Get all documents for the current user.
     """
-    cursor = db["documents"].find({"uploaded_by": str(current_user["_id"])})
+    # The text and its structure are only returned by the detail endpoint
+    cursor = db["documents"].find(
+        {"uploaded_by": str(current_user["_id"])}, {"extracted_text": 0, "structure": 0}
+    )
     cursor.sort("created_at", -1) # Default sort by newest
     docs = await cursor.skip(skip).to_list(length=limit)
     return docs
@@ -51,8 +69,24 @@ async def get_document(
     
     if doc["uploaded_by"] != str(current_user["_id"]) and current_user.get("role") != "admin":
         raise HTTPException(status_code=403, detail="Not authorized to access this document")
-        
-    return doc
+
+    # Intermediate stages are only published to Redis; show the live one
+    return await apply_live_status(doc)
+
+async def _admission_or_429(db: AsyncIOMotorDatabase, current_user: dict) -> Admission:
+    """
+    Admission for an upload by current_user. With the pipeline full, raises 429
+    with Retry-After in "reject" mode; in "defer" mode the caller stores the
+    upload as deferred instead of enqueueing it.
+    """
+    admission = await check_admission(db, str(current_user["_id"]), current_user.get("institution_id"))
+    if not admission.admits() and settings.ADMISSION_OVERFLOW_MODE == "reject":
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail=f"Evaluation pipeline is at capacity ({admission.limit} limit). Please retry later.",
+            headers={"Retry-After": str(admission.retry_after)},
+        )
+    return admission
 
 @router.post("/upload", response_model=DocumentResponse, status_code=status.HTTP_201_CREATED)
 async def upload_document(
@@ -60,12 +94,25 @@ async def upload_document(
     prompt: Optional[str] = Form(None),
     rubric_id: Optional[str] = Form(None),
     grading_mode: str = Form("suggested"),
+    priority: str = Form("normal"),
     db: AsyncIOMotorDatabase = Depends(get_database),
     current_user: dict = Depends(get_current_user)
 ) -> Any:
     """
     Upload a new document.
+    priority: "interactive", "normal" or "bulk" (queue priority of its processing).
+    When the pipeline is saturated the upload is rejected with 429 or stored
+    with status "deferred", depending on ADMISSION_OVERFLOW_MODE.
     """
+    if priority not in PRIORITIES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Invalid priority. Use one of: {', '.join(PRIORITIES)}."
+        )
+
+    # Admission control before anything is stored
+    deferred = not (await _admission_or_429(db, current_user)).admits()
+
     # 1. Validate File Type
     if file.content_type not in ALLOWED_MIME_TYPES:
         raise HTTPException(
@@ -86,7 +133,7 @@ async def upload_document(
     await file.seek(0)
 
     try:
-        storage_path = await storage_service.save_file(file)
+        storage_path, content_hash = await storage_service.save_file(file)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Could not save file: {str(e)}")
 
@@ -102,10 +149,12 @@ async def upload_document(
         file_type=file_type,
         file_size_bytes=file_size,
         storage_path=storage_path,
-        status="pending",
+        content_hash=content_hash,
+        status=DEFERRED_STATUS if deferred else "pending",
         prompt=prompt,
         rubric_id=rubric_id,
-        grading_mode=grading_mode
+        grading_mode=grading_mode,
+        priority=priority,
     )
 
     # Insert into MongoDB
@@ -114,14 +163,190 @@ async def upload_document(
         doc_in.model_dump(by_alias=True, exclude={"id"})
     )
     
-    # Trigger Background Processing
-    process_uploaded_document.delay(str(new_doc.inserted_id))
+    # Trigger Background Processing (parse on the cpu queue, then evaluate on the llm queue).
+    # Deferred uploads are enqueued by the release_deferred_documents beat task.
+    if not deferred:
+        submit_document_pipeline(str(new_doc.inserted_id), priority=priority)
     
     # Retrieve the created document to return it
     created_doc = await db["documents"].find_one({"_id": new_doc.inserted_id})
     
     return created_doc
 
+def _store_batch_files(files: List[UploadFile]) -> Tuple[List[dict], List[dict]]:
+    """
+    Copies every accepted file of a batch upload to storage, entry by entry:
+    ZIP archives are read from the spooled upload and never held in memory.
+    Returns (stored files, skipped files with a reason). Blocking; run in a thread.
+    """
+    stored, skipped = [], []
+
+    def store(stream, filename: str, content_type: str):
+        if len(stored) >= MAX_BATCH_FILES:
+            skipped.append({"filename": filename, "reason": f"Batch limit of {MAX_BATCH_FILES} files reached"})
+            return
+        try:
+            path, size, content_hash = storage_service.save_stream(stream, filename, max_bytes=MAX_FILE_SIZE)
+        except ValueError:
+            skipped.append({"filename": filename, "reason": "File size exceeds maximum limit of 25MB"})
+            return
+        stored.append({
+            "filename": filename, "content_type": content_type, "path": path, "size": size,
+            "content_hash": content_hash,
+        })
+
+    try:
+        for upload in files:
+            extension = os.path.splitext(upload.filename or "")[1].lower()
+            if upload.content_type in ZIP_MIME_TYPES or extension == ".zip":
+                try:
+                    with zipfile.ZipFile(upload.file) as archive:
+                        for info in archive.infolist():
+                            name = os.path.basename(info.filename)
+                            # Folders, macOS resource forks and hidden files are not submissions
+                            if info.is_dir() or not name or name.startswith(".") or "__MACOSX/" in info.filename:
+                                continue
+                            content_type = EXTENSION_MIME_TYPES.get(os.path.splitext(name)[1].lower())
+                            if content_type is None:
+                                skipped.append({"filename": info.filename, "reason": "Unsupported file type"})
+                                continue
+                            try:
+                                with archive.open(info) as entry:
+                                    store(entry, name, content_type)
+                            except (RuntimeError, zipfile.BadZipFile, NotImplementedError) as e:
+                                # Encrypted or corrupt entry, or an unsupported compression method
+                                skipped.append({"filename": info.filename, "reason": f"Unreadable archive entry: {e}"})
+                except zipfile.BadZipFile:
+                    skipped.append({"filename": upload.filename, "reason": "Invalid ZIP archive"})
+                continue
+
+            content_type = upload.content_type if upload.content_type in ALLOWED_MIME_TYPES \
+                else EXTENSION_MIME_TYPES.get(extension)
+            if content_type is None:
+                skipped.append({"filename": upload.filename, "reason": "Unsupported file type"})
+                continue
+            upload.file.seek(0)
+            store(upload.file, upload.filename, content_type)
+    except BaseException:
+        _delete_stored_files(stored)
+        raise
+
+    return stored, skipped
+
+
+def _delete_stored_files(stored: List[dict]) -> None:
+    """Removes the files of a batch upload that could not be recorded. Blocking."""
+    for item in stored:
+        storage_service.delete_file(item["path"])
+
+@router.post("/batch-upload", status_code=status.HTTP_201_CREATED)
+async def batch_upload_documents(
+    files: List[UploadFile] = File(...),
+    batch_name: Optional[str] = Form(None),
+    prompt: Optional[str] = Form(None),
+    rubric_id: Optional[str] = Form(None),
+    grading_mode: str = Form("suggested"),
+    priority: str = Form("bulk"),
+    db: AsyncIOMotorDatabase = Depends(get_database),
+    current_user: dict = Depends(get_current_user)
+) -> Any:
+    """
+    Upload a class submission: ZIP archives and/or several PDF, DOCX or TXT files.
+    All documents share the batch's prompt, rubric and grading mode, and are
+    processed at bulk priority by default. Unsupported or oversized files are
+    skipped and listed in the response. Documents beyond the pipeline's
+    current capacity are stored as "deferred" and enqueued as room frees up
+    (with no room at all and ADMISSION_OVERFLOW_MODE "reject", the request gets 429).
+    """
+    if priority not in PRIORITIES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Invalid priority. Use one of: {', '.join(PRIORITIES)}."
+        )
+
+    admission = await _admission_or_429(db, current_user)
+
+    try:
+        stored, skipped = await run_in_threadpool(_store_batch_files, files)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Could not save files: {str(e)}")
+
+    if not stored:
+        raise HTTPException(
+            status_code=400,
+            detail={"message": "No supported files (PDF, DOCX, TXT) in the upload.", "skipped": skipped}
+        )
+
+    user_id = str(current_user["_id"])
+    batch = Batch(
+        name=batch_name,
+        created_by=user_id,
+        institution_id=current_user.get("institution_id"),
+        total_documents=len(stored),
+        skipped=skipped,
+    )
+    try:
+        new_batch = await db["batches"].insert_one(batch.model_dump(by_alias=True, exclude={"id"}))
+    except Exception:
+        await run_in_threadpool(_delete_stored_files, stored)
+        raise
+    batch_id = str(new_batch.inserted_id)
+
+    docs = [
+        Document(
+            uploaded_by=user_id,
+            institution_id=current_user.get("institution_id"),
+            batch_id=batch_id,
+            filename=item["filename"],
+            original_filename=item["filename"],
+            content_type=item["content_type"],
+            file_type=ALLOWED_MIME_TYPES[item["content_type"]],
+            file_size_bytes=item["size"],
+            storage_path=item["path"],
+            content_hash=item["content_hash"],
+            status="pending" if admission.capacity is None or index < admission.capacity else DEFERRED_STATUS,
+            prompt=prompt,
+            rubric_id=rubric_id,
+            grading_mode=grading_mode,
+            priority=priority,
+        ).model_dump(by_alias=True, exclude={"id"})
+        for index, item in enumerate(stored)
+    ]
+    try:
+        result = await db["documents"].insert_many(docs)
+    except Exception:
+        # Nothing may point at the deleted files: drop the batch and any documents inserted before the failure
+        await db["documents"].delete_many({"batch_id": batch_id})
+        await db["batches"].delete_one({"_id": new_batch.inserted_id})
+        await run_in_threadpool(_delete_stored_files, stored)
+        raise
+    document_ids = [str(inserted_id) for inserted_id in result.inserted_ids]
+    admitted = document_ids if admission.capacity is None else document_ids[:admission.capacity]
+
+    # One grouped fan-out instead of a publish per request
+    update = {"document_ids": document_ids}
+    if admitted:
+        update["group_id"] = submit_batch_pipeline(admitted, priority=priority).id
+    await db["batches"].update_one({"_id": new_batch.inserted_id}, {"$set": update})
+
+    if len(admitted) == len(document_ids):
+        batch_status = "queued"
+    elif admitted:
+        batch_status = "partially_deferred"
+    else:
+        batch_status = "deferred"
+
+    return {
+        "batch_id": batch_id,
+        "batch_name": batch_name,
+        "total_documents": len(document_ids),
+        "document_ids": document_ids,
+        "deferred_count": len(document_ids) - len(admitted),
+        "skipped": skipped,
+        "status": batch_status,
+        "created_at": batch.created_at,
+    }
+
 @router.delete("/{document_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_document(
     document_id: str,
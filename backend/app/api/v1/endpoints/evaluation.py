@@ -1,13 +1,27 @@
+import json
 from typing import Any
-from fastapi import APIRouter, Depends, HTTPException, status
+from uuid import uuid4
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 from motor.motor_asyncio import AsyncIOMotorDatabase
 from bson import ObjectId
 from pydantic import BaseModel
-from datetime import datetime
+from datetime import datetime, timedelta
 
 from app.db.mongodb import get_database
-from app.api.deps import get_current_user
+from app.api.deps import get_current_user, get_current_user_stream
 from app.workers.tasks.evaluation_tasks import evaluate_document_task
+from app.workers.celery_app import PRIORITIES, task_priority
+from app.services.evaluation_dedup import claim_enqueue_async, clear_enqueue_async
+from app.services.progress import (
+    apply_live_status,
+    get_last_event,
+    iter_progress,
+    make_event,
+    publish_progress_async,
+)
+from app.services.queue_monitor import estimate_document_eta
 
 # We might need a schema for the response
 # For now, we'll return a generic dict or define a schema
@@ -18,12 +32,20 @@ router = APIRouter()
 @router.post("/evaluate/{document_id}", status_code=status.HTTP_202_ACCEPTED)
 async def trigger_evaluation(
     document_id: str,
+    priority: str = "interactive",
+    force: bool = False,
     db: AsyncIOMotorDatabase = Depends(get_database),
     current_user: dict = Depends(get_current_user)
 ) -> Any:
     """
     Trigger evaluation for a specific document.
+    Runs at interactive priority by default, ahead of queued bulk work.
+    Coalesces into an evaluation already queued for the document. An unchanged
+    document and rubric reuse the stored result unless `force` is set.
     """
+    if priority not in PRIORITIES:
+        raise HTTPException(status_code=400, detail=f"Invalid priority. Use one of: {', '.join(PRIORITIES)}.")
+
     # 1. Verify Document Ownership
     doc = await db["documents"].find_one({"_id": ObjectId(document_id)})
     if not doc:
@@ -33,13 +55,176 @@ async def trigger_evaluation(
         raise HTTPException(status_code=403, detail="Not authorized to evaluate this document")
         
     # 2. Check Status
-    if doc.get("status") in ("pending", "processing"):
+    if doc.get("status") in ("pending", "processing", "deferred"):
          raise HTTPException(status_code=400, detail="Document is still being processed. Please wait.")
     
-    # 3. Trigger Task
-    evaluate_document_task.delay(document_id)
+    # 3. Trigger Task (unless one is already queued or running)
+    task_id = str(uuid4())
+    queued_task_id = await claim_enqueue_async(document_id, task_id)
+    if queued_task_id:
+        return {"message": "Evaluation already queued", "document_id": document_id, "task_id": queued_task_id}
+
+    # "queued" supersedes the previous terminal status and event, so progress
+    # streams stay open and the live status overlay shows the new run
+    await db["documents"].update_one(
+        {"_id": ObjectId(document_id)},
+        {"$set": {"status": "queued", "updated_at": datetime.utcnow()}},
+    )
+    await publish_progress_async(document_id, "queued")
+    try:
+        evaluate_document_task.apply_async(
+            args=[document_id],
+            kwargs={"force": force},
+            task_id=task_id,
+            priority=task_priority(priority),
+        )
+    except Exception:
+        await clear_enqueue_async(document_id)
+        await db["documents"].update_one(
+            {"_id": ObjectId(document_id)},
+            {"$set": {"status": doc.get("status"), "updated_at": datetime.utcnow()}},
+        )
+        await publish_progress_async(document_id, doc.get("status"))
+        raise
     
-    return {"message": "Evaluation started", "document_id": document_id}
+    return {"message": "Evaluation started", "document_id": document_id, "task_id": task_id}
+
+@router.get("/progress/{document_id}/stream")
+async def stream_progress(
+    document_id: str,
+    request: Request,
+    db: AsyncIOMotorDatabase = Depends(get_database),
+    current_user: dict = Depends(get_current_user_stream)
+) -> Any:
+    """
+    Server-Sent Events stream of processing/evaluation progress for a document.
+    Ends after a terminal status (evaluated, graded, failed, failed_evaluation).
+    Accepts the auth token as ?token= since EventSource cannot send headers.
+    """
+    if not ObjectId.is_valid(document_id):
+        raise HTTPException(status_code=400, detail="Invalid ID format")
+
+    doc = await db["documents"].find_one(
+        {"_id": ObjectId(document_id)}, {"uploaded_by": 1, "status": 1}
+    )
+    if not doc:
+        raise HTTPException(status_code=404, detail="Document not found")
+
+    if doc["uploaded_by"] != str(current_user["_id"]) and current_user.get("role") != "admin":
+        raise HTTPException(status_code=403, detail="Not authorized to view this document")
+
+    async def events():
+        # Without any published event (e.g. expired), start from the stored status
+        if await get_last_event(document_id) is None:
+            current = make_event(document_id, doc.get("status"))
+            yield f"data: {json.dumps(current)}\n\n"
+            if current["terminal"]:
+                return
+        async for event in iter_progress(document_id):
+            if await request.is_disconnected():
+                break
+            if event is None:
+                yield ": keep-alive\n\n"
+                continue
+            yield f"data: {json.dumps(event)}\n\n"
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.get("/eta/{document_id}")
+async def get_evaluation_eta(
+    document_id: str,
+    db: AsyncIOMotorDatabase = Depends(get_database),
+    current_user: dict = Depends(get_current_user)
+) -> Any:
+    """
+    Estimated time until a document's evaluation is ready, from the queue
+    ahead of it and recent throughput. `eta_seconds` is null when there is
+    no recent throughput to estimate from.
+    """
+    if not ObjectId.is_valid(document_id):
+        raise HTTPException(status_code=400, detail="Invalid ID format")
+
+    doc = await db["documents"].find_one(
+        {"_id": ObjectId(document_id)},
+        {"uploaded_by": 1, "status": 1, "priority": 1, "updated_at": 1},
+    )
+    if not doc:
+        raise HTTPException(status_code=404, detail="Document not found")
+
+    if doc["uploaded_by"] != str(current_user["_id"]) and current_user.get("role") != "admin":
+        raise HTTPException(status_code=403, detail="Not authorized to view this document")
+
+    doc = await apply_live_status(doc)
+    eta = await run_in_threadpool(estimate_document_eta, doc.get("status"), doc.get("priority", "normal"))
+
+    return {
+        "document_id": document_id,
+        "status": doc.get("status"),
+        "eta_seconds": eta,
+        "estimated_completion_at": datetime.utcnow() + timedelta(seconds=eta) if eta is not None else None,
+    }
+
+
+@router.get("/batch/{batch_id}/status")
+async def get_batch_status(
+    batch_id: str,
+    db: AsyncIOMotorDatabase = Depends(get_database),
+    current_user: dict = Depends(get_current_user)
+) -> Any:
+    """
+    Aggregate progress of a batch upload, counted from its documents' statuses.
+    """
+    if not ObjectId.is_valid(batch_id):
+        raise HTTPException(status_code=400, detail="Invalid ID format")
+
+    batch = await db["batches"].find_one({"_id": ObjectId(batch_id)}, {"document_ids": 0})
+    if not batch:
+        raise HTTPException(status_code=404, detail="Batch not found")
+
+    if batch["created_by"] != str(current_user["_id"]) and current_user.get("role") != "admin":
+        raise HTTPException(status_code=403, detail="Not authorized to view this batch")
+
+    status_counts = {}
+    async for row in db["documents"].aggregate([
+        {"$match": {"batch_id": batch_id}},
+        {"$group": {"_id": "$status", "count": {"$sum": 1}}},
+    ]):
+        status_counts[row["_id"]] = row["count"]
+
+    # Documents deleted since the upload no longer count
+    total = sum(status_counts.values())
+    succeeded = status_counts.get("evaluated", 0) + status_counts.get("graded", 0)
+    failed = status_counts.get("failed", 0) + status_counts.get("failed_evaluation", 0)
+    processed = succeeded + failed
+
+    # Deferred documents wait for admission like pending ones wait for a worker
+    waiting = status_counts.get("pending", 0) + status_counts.get("deferred", 0)
+    if processed >= total:
+        batch_status = "completed"
+    elif processed + waiting == total:
+        batch_status = "queued"
+    else:
+        batch_status = "processing"
+
+    return {
+        "batch_id": batch_id,
+        "batch_name": batch.get("name"),
+        "status": batch_status,
+        "total_documents": total,
+        "processed_count": processed,
+        "succeeded_count": succeeded,
+        "failed_count": failed,
+        "progress_percentage": round(processed / total * 100) if total else 100,
+        "status_counts": status_counts,
+        "skipped": batch.get("skipped", []),
+        "created_at": batch.get("created_at"),
+    }
+
 
 @router.get("/results/{document_id}")
 async def get_evaluation_results(
@@ -136,8 +321,11 @@ async def finalize_evaluation(
         {"$set": {
             "status": "graded",
             "final_score": data.final_score,
+            "updated_at": datetime.utcnow(),
         }}
     )
+    # Supersedes the worker's last "evaluated" event for live status and progress streams
+    await publish_progress_async(document_id, "graded", final_score=data.final_score, grade=grade)
     
     return {"message": "Grade finalized successfully", "final_score": data.final_score, "grade": grade}
 
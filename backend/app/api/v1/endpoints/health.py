@@ -76,8 +76,8 @@ async def get_system_health():
         except Exception as e:
             logger.warning(f"Gemini health check failed: {e}")
             # Check if it's a rate limit error — API key is valid, just throttled
-            err_str = str(e)
-            if "429" in err_str or "quota" in err_str.lower():
+            from app.ai.llm_errors import LLMRateLimitError, classify_llm_error
+            if isinstance(classify_llm_error(e), LLMRateLimitError):
                 _gemini_cache["status"] = "rate_limited"
                 _gemini_cache["checked_at"] = now
                 services.append({"name": "Gemini AI", "status": "rate_limited"})
@@ -112,3 +112,21 @@ async def get_system_health():
         overall = "unhealthy"
 
     return {"services": services, "overall": overall}
+
+
+@router.get("/queues")
+async def get_queue_status():
+    """
+    Queue depth per Celery queue and priority, tasks in flight, recent
+    throughput per stage and drain time estimates. No auth required, like
+    /metrics: meant for operators and worker autoscalers.
+    """
+    from fastapi import HTTPException
+    from fastapi.concurrency import run_in_threadpool
+    from app.services.queue_monitor import queue_snapshot
+
+    try:
+        return await run_in_threadpool(queue_snapshot)
+    except Exception as e:
+        logger.warning(f"Queue status unavailable: {e}")
+        raise HTTPException(status_code=503, detail="Queue status unavailable")
@@ -7,6 +7,9 @@ from bson import ObjectId
 from app.db.mongodb import get_database
 from app.api.deps import get_current_user
 from app.models.rubric import Rubric
+from app.services.rubric_plans import rubric_plan_cache
+from app.workers.tasks.batch_tasks import rescore_rubric_evaluations
+from app.workers.celery_app import task_priority
 
 router = APIRouter()
 
@@ -95,9 +98,31 @@ async def update_rubric(
         {"_id": ObjectId(rubric_id)}, {"$set": update_data}
     )
     updated = await db["rubrics"].find_one({"_id": ObjectId(rubric_id)})
+    rubric_plan_cache.invalidate(rubric_id)
+
+    # Existing grades follow the new weights; recomputed from stored component scores
+    rescore_rubric_evaluations.apply_async(args=[rubric_id], priority=task_priority("bulk"))
     return updated
 
 
+@router.post("/{rubric_id}/rescore", status_code=status.HTTP_202_ACCEPTED)
+async def rescore_rubric(
+    rubric_id: str,
+    db: AsyncIOMotorDatabase = Depends(get_database),
+    current_user: dict = Depends(get_current_user),
+) -> Any:
+    """Recompute scores of all evaluations graded with this rubric (no AI calls)."""
+    if not ObjectId.is_valid(rubric_id):
+        raise HTTPException(status_code=400, detail="Invalid ID format")
+
+    rubric = await db["rubrics"].find_one({"_id": ObjectId(rubric_id)})
+    if not rubric:
+        raise HTTPException(status_code=404, detail="Rubric not found")
+
+    task = rescore_rubric_evaluations.apply_async(args=[rubric_id], priority=task_priority("bulk"))
+    return {"message": "Rescoring started", "rubric_id": rubric_id, "task_id": task.id}
+
+
 @router.delete("/{rubric_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_rubric(
     rubric_id: str,
@@ -118,6 +143,7 @@ async def delete_rubric(
         )
 
     await db["rubrics"].delete_one({"_id": ObjectId(rubric_id)})
+    rubric_plan_cache.invalidate(rubric_id)
     return None
 
 
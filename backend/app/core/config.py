@@ -30,9 +30,61 @@ class Settings(BaseSettings):
 
     REDIS_URL: str = "redis://localhost:6379/0"
 
+    # Port for the Celery worker's Prometheus metrics server (0 disables it)
+    WORKER_METRICS_PORT: int = 0
+
     # AI Services
     LANGUAGETOOL_URL: str = "http://localhost:8010"
     GEMINI_API_KEY: str = ""
+    # "local" runs AITextDetector in-process; "gemini" asks the LLM (costs output tokens)
+    AI_DETECTION_ENGINE: str = "local"
+    # Optional directory with transitions_<lang>.txt lexicons overriding the bundled ones
+    TRANSITION_LEXICON_DIR: str = ""
+    # Per-process request budget for each Gemini model (0 disables the limiter)
+    GEMINI_REQUESTS_PER_MINUTE: int = 60
+    GEMINI_BURST: int = 5
+    # Backoff for evaluations retried after LLM rate limits/outages: full jitter over
+    # base * 2^retry seconds (capped), added to the provider's retry hint
+    LLM_RETRY_BASE_SECONDS: int = 15
+    LLM_RETRY_MAX_SECONDS: int = 600
+
+    # Evaluations in flight per worker process (coroutines on the worker event loop)
+    MAX_INFLIGHT_EVALUATIONS: int = 32
+    # Evaluations one institution (or user without one) may run at once, across all workers (0 disables)
+    TENANT_MAX_INFLIGHT_EVALUATIONS: int = 8
+
+    # Upload admission control (0 disables a limit): queued pipeline messages, and
+    # unfinished documents per uploader and per institution
+    ADMISSION_MAX_QUEUE_DEPTH: int = 5000
+    ADMISSION_MAX_INFLIGHT_PER_USER: int = 300
+    ADMISSION_MAX_INFLIGHT_PER_TENANT: int = 2000
+    # Over a limit: "reject" answers 429 with Retry-After, "defer" stores the upload
+    # as deferred until the release_deferred_documents beat task admits it
+    ADMISSION_OVERFLOW_MODE: str = "defer"
+
+    # PDF extraction: PDFs with at least PDF_PARALLEL_MIN_PAGES pages are split into
+    # chunks of PDF_PAGES_PER_CHUNK pages extracted in parallel. Every cpu worker
+    # process keeps a pool of PDF_EXTRACT_WORKERS processes for this (0 extracts
+    # serially); size it with the worker's --concurrency in mind
+    PDF_PARALLEL_MIN_PAGES: int = 40
+    PDF_PAGES_PER_CHUNK: int = 20
+    PDF_EXTRACT_WORKERS: int = 2
+    # Soft time limit of the parse task. Pool results are awaited until shortly
+    # before it: a chunk still missing then fails the parse and recycles the pool
+    PARSE_SOFT_TIME_LIMIT_SECONDS: int = 300
+    # Extraction caps (0 disables): pages read and characters of cleaned text kept
+    PDF_MAX_PAGES: int = 1000
+    MAX_EXTRACTED_CHARS: int = 2_000_000
+    # DOCX headers and footers (running titles, page numbers) are left out of the
+    # graded text, which feeds plagiarism, AI detection, coherence and the LLM
+    DOCX_GRADE_HEADERS_FOOTERS: bool = False
+    # Copy the evaluation of an earlier upload of the same file (same uploader, prompt
+    # and rubric version) instead of evaluating it again. Off by default: a duplicate
+    # then skips the plagiarism corpus and the LLM entirely
+    REUSE_DUPLICATE_EVALUATIONS: bool = False
+    # Topic relevance IDF terms each evaluating process loads, most frequent first
+    # (0 loads them all; memory grows with the vocabulary of every submission)
+    TOPIC_STATS_MAX_TERMS: int = 100_000
     
     model_config = SettingsConfigDict(
         case_sensitive=True,
@@ -0,0 +1,98 @@
+"""
+Prometheus metrics shared by the API and the Celery workers.
+
+Workers run several processes, so set PROMETHEUS_MULTIPROC_DIR (an empty,
+writable directory) in their environment; the metrics server started by the
+worker then aggregates samples from every pool process.
+"""
+
+import os
+import time
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+
+# Stages range from sub-millisecond (scoring) to minutes (rate-limited LLM calls)
+_DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 40, 80, 160, 320)
+
+STAGE_DURATION = Histogram(
+    "eduscore_stage_duration_seconds",
+    "Wall-clock duration of document processing and evaluation stages.",
+    ["stage"],
+    buckets=_DURATION_BUCKETS,
+)
+QUEUE_WAIT = Histogram(
+    "eduscore_task_queue_wait_seconds",
+    "Time between a task being published and a worker starting it.",
+    ["task"],
+    buckets=_DURATION_BUCKETS + (640, 1280, 2560),
+)
+LLM_REQUESTS = Counter(
+    "eduscore_llm_requests_total",
+    "LLM requests by model and outcome.",
+    ["model", "outcome"],
+)
+TASK_RETRIES = Counter(
+    "eduscore_task_retries_total",
+    "Task retries by task name and reason.",
+    ["task", "reason"],
+)
+CACHE_LOOKUPS = Counter(
+    "eduscore_cache_lookups_total",
+    "Cache lookups by cache name and result (hit/miss).",
+    ["cache", "result"],
+)
+
+
+@contextmanager
+def stage_timer(stage: str, timings: Optional[Dict[str, float]] = None):
+    """
+    Times a block, records it in STAGE_DURATION and, if given, stores the
+    duration in milliseconds under timings[stage].
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        STAGE_DURATION.labels(stage).observe(elapsed)
+        if timings is not None:
+            timings[stage] = round(elapsed * 1000, 2)
+
+
+def record_cache_lookup(cache: str, hit: bool) -> None:
+    CACHE_LOOKUPS.labels(cache, "hit" if hit else "miss").inc()
+
+
+# Custom collectors registered by this process (e.g. broker queue gauges read at scrape time)
+_extra_collectors = []
+
+
+def register_collector(collector) -> None:
+    _extra_collectors.append(collector)
+    REGISTRY.register(collector)
+
+
+def get_registry() -> CollectorRegistry:
+    """Registry to expose: aggregated across processes in multiprocess mode."""
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        for collector in _extra_collectors:
+            registry.register(collector)
+        return registry
+    return REGISTRY
+
+
+def render_metrics() -> bytes:
+    return generate_latest(get_registry())
+
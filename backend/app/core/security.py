@@ -1,4 +1,4 @@
-from fastapi import HTTPException, Security, status
+from fastapi import HTTPException, Query, Security, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from firebase_admin import auth, credentials, initialize_app
 from typing import Optional
@@ -43,6 +43,8 @@ except Exception as e:
     firebase_app = None
 
 security = HTTPBearer()
+# For endpoints that also accept the token as a query parameter
+optional_security = HTTPBearer(auto_error=False)
 
 
 class FirebaseAuth:
@@ -136,4 +138,24 @@ async def get_current_user_dependency(
     """FastAPI dependency for getting current authenticated user"""
     firebase_auth = FirebaseAuth()
     token = await firebase_auth.verify_token(credentials)
-    return await firebase_auth.get_current_user(token)
\ No newline at end of file
+    return await firebase_auth.get_current_user(token)
+
+
+# Dependency for streaming routes: EventSource cannot send headers, so the
+# token may also be passed as ?token=...
+async def get_current_user_from_header_or_query(
+    credentials: Optional[HTTPAuthorizationCredentials] = Security(optional_security),
+    token: Optional[str] = Query(None, description="ID token, for clients that cannot set headers"),
+) -> dict:
+    """FastAPI dependency accepting a Bearer header or a token query parameter"""
+    if credentials is None and token:
+        credentials = HTTPAuthorizationCredentials(scheme="Bearer", credentials=token)
+    if credentials is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Not authenticated",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    firebase_auth = FirebaseAuth()
+    decoded = await firebase_auth.verify_token(credentials)
+    return await firebase_auth.get_current_user(decoded)
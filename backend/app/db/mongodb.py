@@ -13,6 +13,31 @@ db_manager = MongoClientManager()
 async def connect_to_mongo():
     db_manager.client = AsyncIOMotorClient(settings.MONGODB_URL)
     logger.info("Connected to MongoDB")
+    await ensure_indexes(db_manager.client[db_manager.db_name])
+
+async def ensure_indexes(db):
+    """Indexes the background pipeline relies on. Idempotent; failures are logged, not fatal."""
+    from app.services.checkpoints import CHECKPOINT_COLLECTION, CHECKPOINT_TTL_SECONDS
+    from app.services.parse_cache import PARSE_CACHE_COLLECTION, PARSE_CACHE_TTL_SECONDS
+    try:
+        # Incremental corpus loads query signatures by updated_at
+        await db["plagiarism_hashes"].create_index("updated_at")
+        # Abandoned stage checkpoints expire on their own
+        await db[CHECKPOINT_COLLECTION].create_index("updated_at", expireAfterSeconds=CHECKPOINT_TTL_SECONDS)
+        # Parse results not reused for a while expire; duplicate uploads are looked up by hash
+        await db[PARSE_CACHE_COLLECTION].create_index("last_used_at", expireAfterSeconds=PARSE_CACHE_TTL_SECONDS)
+        await db["documents"].create_index([("content_hash", 1), ("uploaded_by", 1)])
+        # Admission control: the beat task scans deferred uploads oldest first, and
+        # uploads count each user's and institution's documents by status
+        await db["documents"].create_index([("status", 1), ("created_at", 1)])
+        await db["documents"].create_index([("uploaded_by", 1), ("status", 1)])
+        await db["documents"].create_index([("institution_id", 1), ("status", 1)])
+        # Batch progress is counted from the batch's documents
+        await db["documents"].create_index("batch_id")
+        # Workers load the most frequent topic relevance terms
+        await db["topic_term_stats"].create_index([("df", -1)])
+    except Exception as e:
+        logger.warning(f"Could not create indexes: {e}")
 
 async def close_mongo_connection():
     db_manager.client.close()
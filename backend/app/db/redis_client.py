@@ -0,0 +1,31 @@
+import redis
+import redis.asyncio as aioredis
+from app.core.config import settings
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Lazily created, one pool per process (workers use the sync client, the API the async one)
+_sync_client: redis.Redis = None
+_async_client: aioredis.Redis = None
+
+
+def get_redis() -> redis.Redis:
+    global _sync_client
+    if _sync_client is None:
+        _sync_client = redis.from_url(settings.REDIS_URL, decode_responses=True)
+    return _sync_client
+
+
+def get_async_redis() -> aioredis.Redis:
+    global _async_client
+    if _async_client is None:
+        _async_client = aioredis.from_url(settings.REDIS_URL, decode_responses=True)
+    return _async_client
+
+
+async def close_async_redis():
+    global _async_client
+    if _async_client is not None:
+        await _async_client.close()
+        _async_client = None
@@ -1,12 +1,16 @@
 import logging
 from contextlib import asynccontextmanager
 
-from fastapi import FastAPI
+from fastapi import FastAPI, Response
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
 from app.core.config import settings
 from app.db.mongodb import connect_to_mongo, close_mongo_connection
+from app.db.redis_client import close_async_redis
 from app.api.v1.api import api_router
+from app.core.metrics import CONTENT_TYPE_LATEST, register_collector, render_metrics
 from app.workers.celery_app import celery_app  # Import to initialize Celery config
+from app.services.queue_monitor import QueueCollector
 
 logger = logging.getLogger(__name__)
 
@@ -18,11 +22,15 @@ async def lifespan(app):
     logger.info("Application startup complete.")
     yield
     await close_mongo_connection()
+    await close_async_redis()
     logger.info("Application shutdown complete.")
 
 
 app = FastAPI(title=settings.PROJECT_NAME, lifespan=lifespan)
 
+# Queue depth/throughput gauges for autoscaling, read from Redis on each scrape
+register_collector(QueueCollector())
+
 # Set all CORS enabled origins
 if settings.BACKEND_CORS_ORIGINS:
     app.add_middleware(
@@ -38,3 +46,10 @@ app.include_router(api_router, prefix=settings.API_V1_STR)
 @app.get("/")
 async def read_root():
     return {"message": "EduScore AI API is running!"}
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus scrape endpoint."""
+    # Collectors read Redis synchronously; keep that off the event loop
+    content = await run_in_threadpool(render_metrics)
+    return Response(content=content, media_type=CONTENT_TYPE_LATEST)
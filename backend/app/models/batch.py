@@ -0,0 +1,25 @@
+from datetime import datetime
+from typing import List, Optional
+from pydantic import BaseModel, Field
+from app.models.common import PyObjectId
+
+class Batch(BaseModel):
+    """A class submission uploaded in one request (ZIP archive or several files)."""
+    id: PyObjectId = Field(default_factory=PyObjectId, alias="_id")
+    name: Optional[str] = None
+
+    created_by: str = Field(..., index=True)
+    institution_id: Optional[str] = None
+
+    document_ids: List[str] = Field(default_factory=list)
+    total_documents: int = 0
+    # Files in the upload that were not accepted, with the reason
+    skipped: List[dict] = Field(default_factory=list)
+    # Celery group fanning out the per-document pipelines
+    group_id: Optional[str] = None
+
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+
+    class Config:
+        populate_by_name = True
+        arbitrary_types_allowed = True
@@ -8,6 +8,8 @@ class Document(BaseModel):
     
     uploaded_by: str = Field(..., index=True)
     institution_id: Optional[str] = Field(None, index=True)
+    # Set for documents uploaded as part of a batch (see app.models.batch)
+    batch_id: Optional[str] = Field(None, index=True)
     
     filename: str
     original_filename: str
@@ -15,14 +17,21 @@ class Document(BaseModel):
     file_type: str  # e.g., 'pdf', 'docx', 'txt'
     file_size_bytes: int
     storage_path: str  # Path in the storage system
+    # SHA-256 of the uploaded bytes, computed while storing; keys the parse cache
+    content_hash: Optional[str] = Field(None, index=True)
     
     extracted_text: Optional[str] = None
     word_count: Optional[int] = 0
     page_count: Optional[int] = None
+    # Paragraph/sentence/heading/page offsets into extracted_text (see app.utils.text_processing.build_structure)
+    structure: Optional[Dict[str, Any]] = None
+    # Durations of the parsing task stages, merged into the evaluation's timings
+    processing_timings_ms: Optional[Dict[str, float]] = None
     
     prompt: Optional[str] = None # New field for topic relevance
     rubric_id: Optional[str] = None # Selected rubric for evaluation
     grading_mode: str = Field(default="suggested") # 'auto' or 'suggested'
+    priority: str = Field(default="normal") # Queue priority level it was submitted with (used for ETAs)
     
     # Processing status
     status: str = Field(default="pending", index=True) # pending, processing, completed, failed
@@ -29,9 +29,19 @@ class Evaluation(BaseModel):
     status: Optional[str] = None  # "pending_review", "finalized"
     finalized_at: Optional[datetime] = None
     finalized_by: Optional[str] = None
+    # Set when scores were recomputed from stored components after a rubric edit
+    rescored_at: Optional[datetime] = None
     
     # Metadata
     processing_time_ms: Optional[float] = None
+    # Per-stage wall-clock durations (queue wait, parse, plagiarism, llm_scoring, ...)
+    stage_timings_ms: Optional[Dict[str, float]] = None
+    model_used: Optional[str] = None
+    retry_count: int = 0
+    # Document id + extracted text hash + rubric version (see app.services.evaluation_dedup)
+    idempotency_key: Optional[str] = None
+    # Document whose evaluation was copied, when this one is a duplicate upload
+    reused_from: Optional[str] = None
     created_at: datetime = Field(default_factory=datetime.utcnow)
     
     class Config:
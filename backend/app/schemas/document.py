@@ -1,4 +1,4 @@
-from typing import Optional
+from typing import Any, Dict, Optional
 from datetime import datetime
 from pydantic import BaseModel, Field
 from app.models.common import PyObjectId
@@ -20,6 +20,7 @@ class DocumentResponse(DocumentBase):
     page_count: Optional[int] = None
     created_at: datetime
     error_message: Optional[str] = None
+    batch_id: Optional[str] = None
     
     # We hide 'storage_path' and 'extracted_text' for security and performance
 
@@ -30,3 +31,5 @@ class DocumentResponse(DocumentBase):
 
 class DocumentDetailResponse(DocumentResponse):
     extracted_text: Optional[str] = None
+    # Offsets of paragraphs, sentences, headings and pages in extracted_text
+    structure: Optional[Dict[str, Any]] = None
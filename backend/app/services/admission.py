@@ -0,0 +1,96 @@
+"""
+Upload admission control.
+
+Before a new document enters the pipeline, its room is checked against three
+limits: the backlog waiting in the Celery queues, the documents the uploader
+already has in flight and those of their institution. Over a limit, an
+upload is either rejected (429 with Retry-After) or stored as "deferred" and
+released by the `release_deferred_documents` beat task once there is room,
+depending on ADMISSION_OVERFLOW_MODE. Every limit set to 0 is disabled.
+"""
+
+import math
+import asyncio
+import logging
+from typing import Dict, NamedTuple, Optional
+
+from motor.motor_asyncio import AsyncIOMotorDatabase
+
+from app.core.config import settings
+from app.services import queue_monitor
+from app.services.progress import TERMINAL_STATUSES
+
+logger = logging.getLogger(__name__)
+
+DEFERRED_STATUS = "deferred"
+# Statuses of documents that are neither finished nor waiting for admission
+_NOT_IN_FLIGHT = sorted(TERMINAL_STATUSES | {DEFERRED_STATUS})
+
+DEFAULT_RETRY_AFTER_SECONDS = 60
+MIN_RETRY_AFTER_SECONDS = 10
+
+
+class Admission(NamedTuple):
+    capacity: Optional[int]  # Documents that can enter now; None when unlimited
+    limit: Optional[str]  # Limit that bounds the capacity ("queue", "user", "institution")
+    retry_after: int  # Seconds until room is expected, when capacity is exhausted
+
+    def admits(self, count: int = 1) -> bool:
+        return self.capacity is None or self.capacity >= count
+
+
+def in_flight_filter(**match) -> dict:
+    return {**match, "status": {"$nin": _NOT_IN_FLIGHT}}
+
+
+def queue_backlog() -> int:
+    """Messages waiting in the pipeline queues (blocking Redis read)."""
+    return sum(sum(levels.values()) for levels in queue_monitor.queue_depths().values())
+
+
+def _retry_after(excess: int) -> int:
+    """Seconds to evaluate `excess` documents at the recent evaluation rate."""
+    try:
+        rate = queue_monitor.throughput()["evaluation"]["per_minute"]
+    except Exception:
+        rate = 0
+    if not rate:
+        return DEFAULT_RETRY_AFTER_SECONDS
+    return max(MIN_RETRY_AFTER_SECONDS, math.ceil(excess / rate * 60))
+
+
+def evaluate_admission(backlog: int, user_in_flight: int, institution_in_flight: Optional[int]) -> Admission:
+    """Remaining capacity under each enabled limit; blocking (reads throughput from Redis when full)."""
+    room: Dict[str, int] = {}
+    if settings.ADMISSION_MAX_QUEUE_DEPTH > 0:
+        room["queue"] = settings.ADMISSION_MAX_QUEUE_DEPTH - backlog
+    if settings.ADMISSION_MAX_INFLIGHT_PER_USER > 0:
+        room["user"] = settings.ADMISSION_MAX_INFLIGHT_PER_USER - user_in_flight
+    if settings.ADMISSION_MAX_INFLIGHT_PER_TENANT > 0 and institution_in_flight is not None:
+        room["institution"] = settings.ADMISSION_MAX_INFLIGHT_PER_TENANT - institution_in_flight
+
+    if not room:
+        return Admission(None, None, 0)
+    limit = min(room, key=room.get)
+    capacity = max(0, room[limit])
+    retry_after = _retry_after(1 - room[limit]) if capacity == 0 else 0
+    return Admission(capacity, limit, retry_after)
+
+
+async def check_admission(
+    db: AsyncIOMotorDatabase, user_id: str, institution_id: Optional[str] = None
+) -> Admission:
+    """Admission for a new upload by user_id (API side)."""
+    user_in_flight = await db["documents"].count_documents(in_flight_filter(uploaded_by=user_id))
+    institution_in_flight = None
+    if institution_id:
+        institution_in_flight = await db["documents"].count_documents(
+            in_flight_filter(institution_id=institution_id)
+        )
+    try:
+        backlog = await asyncio.to_thread(queue_backlog)
+    except Exception as e:
+        # Fail open on the queue limit: the per-user and per-institution limits still apply
+        logger.warning(f"Queue depth unavailable for admission control: {e}")
+        backlog = 0
+    return await asyncio.to_thread(evaluate_admission, backlog, user_in_flight, institution_in_flight)
@@ -0,0 +1,60 @@
+"""
+Per-stage checkpoints of the evaluation pipeline.
+
+Stage outputs are saved in `evaluation_checkpoints` under the evaluation's
+idempotency key (document, extracted text hash and rubric version), so a
+retried task resumes from the stages that did not finish instead of
+recomputing plagiarism or calling the LLM again. Checkpoints are deleted once
+the evaluation is stored; abandoned ones expire through a TTL index on
+`updated_at` (see app.db.mongodb.ensure_indexes).
+"""
+
+import logging
+from datetime import datetime
+from typing import Any, Dict
+
+from motor.motor_asyncio import AsyncIOMotorDatabase
+
+logger = logging.getLogger(__name__)
+
+CHECKPOINT_COLLECTION = "evaluation_checkpoints"
+CHECKPOINT_TTL_SECONDS = 2 * 24 * 3600
+
+
+class StageCheckpoints:
+    def __init__(self, db: AsyncIOMotorDatabase, key: str, document_id: str):
+        self._collection = db[CHECKPOINT_COLLECTION]
+        self.key = key
+        self.document_id = document_id
+
+    async def load(self) -> Dict[str, Any]:
+        """Outputs of the stages already completed for this key."""
+        try:
+            doc = await self._collection.find_one({"_id": self.key}, {"stages": 1})
+        except Exception as e:
+            logger.warning(f"Could not load checkpoints for {self.document_id}: {e}")
+            return {}
+        return (doc or {}).get("stages") or {}
+
+    async def save(self, stage: str, result: Any) -> None:
+        # Best effort: a lost checkpoint only means the stage runs again on retry
+        try:
+            await self._collection.update_one(
+                {"_id": self.key},
+                {
+                    "$set": {
+                        f"stages.{stage}": result,
+                        "document_id": self.document_id,
+                        "updated_at": datetime.utcnow(),
+                    }
+                },
+                upsert=True,
+            )
+        except Exception as e:
+            logger.warning(f"Could not checkpoint stage '{stage}' for {self.document_id}: {e}")
+
+    async def clear(self) -> None:
+        try:
+            await self._collection.delete_one({"_id": self.key})
+        except Exception as e:
+            logger.warning(f"Could not clear checkpoints for {self.document_id}: {e}")
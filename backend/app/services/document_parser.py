@@ -3,19 +3,46 @@ import logging
 import re
 import unicodedata
 import subprocess
-from typing import Dict, Any, Optional
+import posixpath
+import zipfile
+import xml.etree.ElementTree as ET
+import threading
+import time
+from collections import deque
+from typing import Dict, Any, Iterator, List, Optional, Tuple
 try:
     import fitz  # PyMuPDF
 except ImportError:
     fitz = None
-import docx
+# Celery's multiprocessing fork: unlike multiprocessing's, its pools can start
+# inside the daemonic processes of the prefork worker pool
+import billiard
+from billiard.exceptions import TimeoutError as PoolTimeoutError, WorkerLostError
 try:
     import magic
 except ImportError:
     magic = None
 
+from app.core.config import settings
+from app.utils.text_processing import build_structure
+
 logger = logging.getLogger(__name__)
 
+# Bump whenever a change alters the extracted text: cached parses of older
+# versions are then ignored (see app.services.parse_cache)
+PARSER_VERSION = 4
+
+# Seconds before the parse task's soft time limit at which waiting on the
+# extraction pool gives up, so the pool is recycled before the task is interrupted
+POOL_TIMEOUT_MARGIN_SECONDS = 15
+
+# Distinct DOCX header/footer lines kept in metadata when they are not graded
+MAX_MARGIN_LINES = 50
+
+# Three or more line breaks (two or more blank lines)
+_BLANK_LINES = re.compile(r'\n{3,}')
+
+
 class DocumentParser:
     """
     Service to parse content from various document formats (PDF, DOCX, TXT).
@@ -68,54 +95,61 @@ class DocumentParser:
 
     def _clean_text(self, text: str) -> str:
         """
-        Cleans and normalizes text.
+        Cleans and normalizes text: NFKC, no null bytes, whitespace within
+        lines collapsed to one space, lines stripped and at most one blank
+        line between paragraphs.
         """
         if not text:
             return ""
         
-        # Normalize unicode characters
-        text = unicodedata.normalize('NFKC', text)
+        # Normalize unicode characters (ASCII is already NFKC)
+        if not text.isascii():
+            text = unicodedata.normalize('NFKC', text)
         
         # Remove null bytes
-        text = text.replace('\x00', '')
-        
-        # Replace multiple spaces/newlines with single space/newline
-        # But keep paragraph breaks (double newlines)
-        text = re.sub(r'\r\n', '\n', text) # Normalize newlines
+        if '\x00' in text:
+            text = text.replace('\x00', '')
         
-        # Remove excessive whitespace within lines, but preserve newlines
-        lines = [re.sub(r'\s+', ' ', line).strip() for line in text.split('\n')]
-        
-        cleaned_text = "\n".join(lines)
+        # Collapse whitespace within each line and strip it. str.split() splits on
+        # exactly the characters r'\s' matches and drops them at both ends; \r
+        # is one of them, so CRLF line ends need no separate pass.
+        text = "\n".join([" ".join(line.split()) for line in text.split("\n")])
         
         # Remove multiple newlines (e.g. more than 2)
-        cleaned_text = re.sub(r'\n{3,}', '\n\n', cleaned_text)
-        
-        return cleaned_text.strip()
+        return _BLANK_LINES.sub('\n\n', text).strip()
 
     def _parse_pdf(self, file_path: str) -> Dict[str, Any]:
         if fitz:
              # Use PyMuPDF if available
-            text_content = []
-            page_count = 0
             with fitz.open(file_path) as doc:
                 page_count = len(doc)
-                for page in doc:
-                    text_content.append(page.get_text())
-            full_text = "\n".join(text_content)
+            pages = min(page_count, settings.PDF_MAX_PAGES) if settings.PDF_MAX_PAGES > 0 else page_count
+            truncated = pages < page_count
+            if settings.PDF_EXTRACT_WORKERS > 0 and pages >= settings.PDF_PARALLEL_MIN_PAGES:
+                chunks = self._extract_pdf_parallel(file_path, pages)
+            else:
+                chunks = iter([_extract_pdf_pages(file_path, 0, pages)])
+            cleaned_text, cut, page_starts = self._join_capped(chunks)
+            truncated = truncated or cut
             source = "pdf (pymupdf)"
         else:
             # Fallback to pdftotext (poppler-utils)
             logger.info("PyMuPDF not found. Falling back to pdftotext.")
             try:
+                command = ["pdftotext"]
+                if settings.PDF_MAX_PAGES > 0:
+                    command += ["-l", str(settings.PDF_MAX_PAGES)]
                 result = subprocess.run(
-                    ["pdftotext", file_path, "-"], 
+                    command + [file_path, "-"],
                     capture_output=True, 
                     text=True, 
                     check=True
                 )
-                full_text = result.stdout
-                page_count = 1 # pdftotext doesn't give page count easily
+                # pdftotext ends every page with a form feed
+                pages = result.stdout.split("\f")
+                if len(pages) > 1 and not pages[-1].strip():
+                    pages.pop()
+                page_count = len(pages) # At most PDF_MAX_PAGES: pdftotext doesn't give the total easily
                 source = "pdf (pdftotext)"
             except Exception as e:
                 logger.error(f"pdftotext failed: {e}")
@@ -125,31 +159,156 @@ class DocumentParser:
                     "page_count": 0,
                     "metadata": {"source": "pdf", "error": "parsing_failed"}
                 }
+            cleaned_text, truncated, page_starts = self._join_capped(iter([[self._clean_text(p) for p in pages]]))
 
-        cleaned_text = self._clean_text(full_text)
+        metadata = {"source": source}
+        if truncated:
+            logger.warning(f"PDF {file_path} exceeds the extraction caps; text truncated.")
+            metadata["truncated"] = True
         
         return {
             "extracted_text": cleaned_text,
             "word_count": self._count_words(cleaned_text),
             "page_count": page_count,
-            "metadata": {"source": source}
+            "metadata": metadata,
+            "structure": build_structure(cleaned_text, page_starts=page_starts),
         }
 
+    def _extract_pdf_parallel(self, file_path: str, pages: int) -> Iterator[List[str]]:
+        """
+        Yields the cleaned pages of page chunks [0, pages) in order, extracted by
+        this process's extraction pool. At most two chunks per pool process are
+        pending at once, so memory stays bounded however long the document is.
+        If the pool breaks (e.g. a pool process is killed), it is dropped and
+        the remaining chunks run serially. If the chunks are not all back shortly
+        before the parse task's soft time limit (a pathological PDF), the pool is
+        terminated, so no pool process stays stuck, and TimeoutError is raised.
+        """
+        size = max(1, settings.PDF_PAGES_PER_CHUNK)
+        ranges = [(start, min(start + size, pages)) for start in range(0, pages, size)]
+        window = settings.PDF_EXTRACT_WORKERS * 2
+        budget = max(1, settings.PARSE_SOFT_TIME_LIMIT_SECONDS - POOL_TIMEOUT_MARGIN_SECONDS)
+        deadline = time.monotonic() + budget
+
+        done = 0
+        pending = deque()
+        try:
+            pool = _extraction_pool()
+            for start, stop in ranges[:window]:
+                pending.append(pool.apply_async(_extract_pdf_pages, (file_path, start, stop)))
+            while pending:
+                chunk = pending.popleft().get(timeout=max(0.0, deadline - time.monotonic()))
+                queued = done + len(pending) + 1
+                if queued < len(ranges):
+                    pending.append(pool.apply_async(_extract_pdf_pages, (file_path, *ranges[queued])))
+                done += 1
+                yield chunk
+        except PoolTimeoutError:
+            logger.error(f"PDF extraction of {file_path} exceeded {budget}s; terminating the extraction pool.")
+            close_extraction_pool(terminate=True)
+            raise TimeoutError(f"PDF extraction did not finish within {budget} seconds") from None
+        except (OSError, AssertionError, WorkerLostError) as e:
+            logger.warning(f"PDF extraction pool failed ({e}); extracting remaining pages serially.")
+            close_extraction_pool(terminate=True)
+            for start, stop in ranges[done:]:
+                yield _extract_pdf_pages(file_path, start, stop)
+        # Chunks still pending when the caller stops at the character cap finish
+        # in the pool and are discarded; there are at most `window` of them
+
+    def _join_capped(self, chunks: Iterator[List[str]]) -> Tuple[str, bool, List[int]]:
+        """
+        Joins chunks of cleaned pages with paragraph breaks up to MAX_EXTRACTED_CHARS.
+        Returns (text, truncated, start offset of each page); stops consuming
+        chunks once the cap is hit. Empty pages start where the next text does.
+        """
+        cap = settings.MAX_EXTRACTED_CHARS
+        parts = []
+        page_starts = []
+        total = 0  # Length of the text joined so far
+        truncated = False
+        try:
+            for pages in chunks:
+                for page in pages:
+                    start = total + 2 if parts else 0
+                    if cap > 0 and start + len(page) > cap:
+                        page = page[:max(0, cap - start)].rstrip()
+                        truncated = True
+                    page_starts.append(start)
+                    if page:
+                        parts.append(page)
+                        total = start + len(page)
+                    if truncated:
+                        break
+                if truncated:
+                    break
+        finally:
+            if hasattr(chunks, "close"):
+                chunks.close()
+        return "\n\n".join(parts), truncated, [min(start, total) for start in page_starts]
+
     def _parse_docx(self, file_path: str) -> Dict[str, Any]:
-        doc = docx.Document(file_path)
+        """
+        Streams the text of the main document (paragraphs, tables, text boxes),
+        then footnotes and endnotes, part by part with an incremental XML
+        parser; stops at MAX_EXTRACTED_CHARS. Paragraphs are separated by blank
+        lines; heading styles mark the structure's headings. Headers and
+        footers (running titles, page numbers) are graded text only with
+        DOCX_GRADE_HEADERS_FOOTERS; otherwise their distinct lines are kept
+        in metadata["headers_footers"].
+        """
+        cap = settings.MAX_EXTRACTED_CHARS
+        grade_margins = settings.DOCX_GRADE_HEADERS_FOOTERS
         text_content = []
-        
-        for para in doc.paragraphs:
-            text_content.append(para.text)
-            
-        full_text = "\n".join(text_content)
+        margin_lines = []
+        total = 0
+        truncated = False
+        # Sections often repeat the same header/footer (first page, default, even pages)
+        seen_margins = set()
+        headings = {}
+
+        with zipfile.ZipFile(file_path) as archive:
+            for part in _docx_text_parts(archive):
+                margin = posixpath.basename(part).startswith(("header", "footer"))
+                with archive.open(part) as xml:
+                    for paragraph, level in _iter_docx_paragraphs(xml):
+                        if margin:
+                            if paragraph in seen_margins:
+                                continue
+                            seen_margins.add(paragraph)
+                            if not grade_margins:
+                                line = self._clean_text(paragraph)
+                                if line and len(margin_lines) < MAX_MARGIN_LINES:
+                                    margin_lines.append(line)
+                                continue
+                        if level is not None:
+                            headings.setdefault(self._clean_text(paragraph), level)
+                        text_content.append(paragraph)
+                        total += len(paragraph) + 2
+                        if cap > 0 and total > cap:
+                            truncated = True
+                            break
+                if truncated:
+                    break
+
+        full_text = "\n\n".join(text_content)
+        if truncated:
+            full_text = full_text[:cap]
         cleaned_text = self._clean_text(full_text)
+
+        metadata = {"source": "docx"}
+        if margin_lines:
+            metadata["headers_footers"] = margin_lines
+        if truncated:
+            logger.warning(f"DOCX {file_path} exceeds the extraction cap; text truncated.")
+            metadata["truncated"] = True
         
         return {
             "extracted_text": cleaned_text,
             "word_count": self._count_words(cleaned_text),
             "page_count": None, 
-            "metadata": {"source": "docx"}
+            "metadata": metadata,
+            # Without heading styles, headings are told apart by layout
+            "structure": build_structure(cleaned_text, headings=headings or None),
         }
 
     def _parse_txt(self, file_path: str) -> Dict[str, Any]:
@@ -162,7 +321,8 @@ class DocumentParser:
             "extracted_text": cleaned_text,
             "word_count": self._count_words(cleaned_text),
             "page_count": 1,
-            "metadata": {"source": "txt"}
+            "metadata": {"source": "txt"},
+            "structure": build_structure(cleaned_text),
         }
 
     def _count_words(self, text: str) -> int:
@@ -171,3 +331,144 @@ class DocumentParser:
         return len(text.split())
 
 document_parser = DocumentParser()
+
+
+_pool = None
+_pool_pid: Optional[int] = None
+_pool_lock = threading.Lock()
+
+
+def _extraction_pool():
+    """
+    This process's pool of PDF_EXTRACT_WORKERS page extraction processes,
+    started on first use and reused for every document. A pool inherited
+    through fork belongs to the parent and is never used.
+    """
+    global _pool, _pool_pid
+    with _pool_lock:
+        if _pool is None or _pool_pid != os.getpid():
+            # Recycled now and then: PyMuPDF keeps caches between documents
+            _pool = billiard.Pool(processes=settings.PDF_EXTRACT_WORKERS, maxtasksperchild=200)
+            _pool_pid = os.getpid()
+            logger.info(f"Started PDF extraction pool with {settings.PDF_EXTRACT_WORKERS} processes (pid {_pool_pid}).")
+        return _pool
+
+
+def close_extraction_pool(terminate: bool = False) -> None:
+    """Stops this process's extraction pool, if it started one (worker shutdown, broken pool)."""
+    global _pool, _pool_pid
+    with _pool_lock:
+        pool, owner = _pool, _pool_pid
+        _pool = _pool_pid = None
+    if pool is None or owner != os.getpid():
+        return
+    try:
+        if terminate:
+            pool.terminate()
+        else:
+            pool.close()
+        pool.join()
+    except Exception as e:
+        logger.warning(f"Could not stop the PDF extraction pool: {e}")
+
+
+def _extract_pdf_pages(file_path: str, start: int, stop: int) -> List[str]:
+    """
+    Cleaned text of each page in [start, stop) of a PDF. Module-level so process
+    pool workers can run it; each page is cleaned as it is read, so the raw
+    text of at most one page is held at a time.
+    """
+    with fitz.open(file_path) as doc:
+        return [document_parser._clean_text(doc[i].get_text()) for i in range(start, stop)]
+
+
+_W = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+_M = "{http://schemas.openxmlformats.org/officeDocument/2006/math}"
+_MC_FALLBACK = "{http://schemas.openxmlformats.org/markup-compatibility/2006}Fallback"
+_PACKAGE_RELS = "{http://schemas.openxmlformats.org/package/2006/relationships}Relationship"
+_OFFICE_DOCUMENT_REL = "http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument"
+
+# Run content that stands for text; w:delText (tracked deletions) and
+# w:instrText (field codes) are deliberately absent
+_DOCX_TEXT = {_W + "t", _M + "t"}
+_DOCX_CHARS = {_W + "tab": "\t", _W + "br": "\n", _W + "cr": "\n", _W + "noBreakHyphen": "-"}
+# Elements whose children are the part's blocks, cleared as each block ends
+_DOCX_CONTAINERS = {_W + "body", _W + "hdr", _W + "ftr", _W + "footnotes", _W + "endnotes"}
+_DOCX_NOTES = {_W + "footnote", _W + "endnote"}
+_DOCX_NOTE_SEPARATORS = {"separator", "continuationSeparator", "continuationNotice"}
+# Style ids of headings: "Heading1".."Heading9" and "Title" (level 0)
+_DOCX_HEADING_STYLE = re.compile(r"(?i)heading\s*(\d)|title")
+
+
+def _docx_text_parts(archive: zipfile.ZipFile) -> List[str]:
+    """Parts of a DOCX package holding text: the main document first, then notes, headers and footers."""
+    main = "word/document.xml"
+    try:
+        with archive.open("_rels/.rels") as rels:
+            for rel in ET.parse(rels).getroot().iter(_PACKAGE_RELS):
+                if rel.get("Type") == _OFFICE_DOCUMENT_REL:
+                    main = rel.get("Target", main).lstrip("/")
+                    break
+    except (KeyError, ET.ParseError):
+        pass
+
+    folder = posixpath.dirname(main)
+    names = set(archive.namelist())
+    if main not in names:
+        raise ValueError("Invalid DOCX file: main document part not found")
+
+    def numbered(prefix: str) -> List[str]:
+        # header1.xml, header2.xml, ..., header10.xml in numeric order
+        found = [n for n in names if posixpath.dirname(n) == folder
+                 and re.fullmatch(prefix + r"\d*\.xml", posixpath.basename(n))]
+        return sorted(found, key=lambda n: (len(n), n))
+
+    notes = [posixpath.join(folder, name) for name in ("footnotes.xml", "endnotes.xml")]
+    return [main] + [n for n in notes if n in names] + numbered("header") + numbered("footer")
+
+
+def _iter_docx_paragraphs(xml) -> Iterator[Tuple[str, Optional[int]]]:
+    """
+    (text, heading level or None) of each w:p of a WordprocessingML part, in
+    document order. The level comes from the paragraph style. Paragraphs
+    nested in a text box come out before the paragraph anchoring it. Fallback
+    renderings of alternate content and footnote separators are skipped, and
+    finished blocks are dropped from the tree, so memory stays flat however
+    long the part is.
+    """
+    stack = []  # Open elements
+    paragraphs = []  # Text of the open (possibly nested) paragraphs
+    levels = []  # Their heading levels
+    skipping = 0
+
+    for event, elem in ET.iterparse(xml, events=("start", "end")):
+        tag = elem.tag
+        if event == "start":
+            stack.append(elem)
+            if skipping or tag == _MC_FALLBACK or (
+                tag in _DOCX_NOTES and elem.get(_W + "type") in _DOCX_NOTE_SEPARATORS
+            ):
+                skipping += 1
+            elif tag == _W + "p":
+                paragraphs.append([])
+                levels.append(None)
+            continue
+
+        stack.pop()
+        if skipping:
+            skipping -= 1
+        elif tag == _W + "p":
+            yield "".join(paragraphs.pop()), levels.pop()
+        elif paragraphs:
+            if tag == _W + "pStyle":
+                style = _DOCX_HEADING_STYLE.fullmatch(elem.get(_W + "val") or "")
+                if style:
+                    levels[-1] = int(style.group(1)) if style.group(1) else 0
+            elif tag in _DOCX_TEXT:
+                if elem.text:
+                    paragraphs[-1].append(elem.text)
+            elif tag in _DOCX_CHARS:
+                paragraphs[-1].append(_DOCX_CHARS[tag])
+
+        if stack and stack[-1].tag in _DOCX_CONTAINERS:
+            stack[-1].clear()
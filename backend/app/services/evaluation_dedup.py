@@ -0,0 +1,114 @@
+"""
+Deduplication of evaluation work.
+
+Three layers keep one document from being evaluated by several workers:
+
+- an enqueue marker (`evaluation_enqueued:{id}`, holding the task id) set when
+  an evaluation is queued and cleared when it finishes, so repeated triggers
+  and upload/trigger races coalesce into the task already queued;
+- a per-document lock (`evaluation_lock:{id}`) held while a worker evaluates,
+  so a duplicate that slipped through exits without calling the LLM;
+- an idempotency key (document id + extracted text hash + rubric version)
+  stored on the evaluation, so re-running unchanged input reuses the stored
+  result unless forced.
+
+Redis failures fail open: a missing marker or lock only costs a duplicate run.
+"""
+
+import hashlib
+import logging
+from typing import Optional
+
+from app.db.redis_client import get_async_redis, get_redis
+from app.services.rubric_plans import RubricPlan
+
+logger = logging.getLogger(__name__)
+
+# Outlives a long bulk backlog; cleared explicitly when the evaluation ends
+ENQUEUE_MARKER_TTL = 24 * 3600
+# Longer than any single evaluation; a crashed worker's lock expires on its own
+LOCK_TTL = 15 * 60
+
+# Deletes the lock only if this task still owns it
+_RELEASE_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+
+def _marker_key(document_id: str) -> str:
+    return f"evaluation_enqueued:{document_id}"
+
+
+def _lock_key(document_id: str) -> str:
+    return f"evaluation_lock:{document_id}"
+
+
+def idempotency_key(document_id: str, text: str, plan: RubricPlan) -> str:
+    """Identifies one evaluation input: the document, its extracted text and the rubric version."""
+    text_hash = hashlib.sha256(text.encode("utf-8")).hexdigest()
+    version = plan.version.isoformat() if plan.version else ""
+    raw = f"{document_id}:{text_hash}:{plan.rubric_id or plan.name}:{version}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def claim_enqueue(document_id: str, task_id: str) -> Optional[str]:
+    """
+    Marks an evaluation of document_id as queued under task_id.
+    Returns the id of the task already queued, or None if the claim succeeded.
+    """
+    try:
+        client = get_redis()
+        if client.set(_marker_key(document_id), task_id, nx=True, ex=ENQUEUE_MARKER_TTL):
+            return None
+        return client.get(_marker_key(document_id))
+    except Exception as e:
+        logger.warning(f"Enqueue marker unavailable for {document_id}: {e}")
+        return None
+
+
+async def claim_enqueue_async(document_id: str, task_id: str) -> Optional[str]:
+    """Async claim_enqueue for the API process."""
+    try:
+        client = get_async_redis()
+        if await client.set(_marker_key(document_id), task_id, nx=True, ex=ENQUEUE_MARKER_TTL):
+            return None
+        return await client.get(_marker_key(document_id))
+    except Exception as e:
+        logger.warning(f"Enqueue marker unavailable for {document_id}: {e}")
+        return None
+
+
+def clear_enqueue(document_id: str) -> None:
+    try:
+        get_redis().delete(_marker_key(document_id))
+    except Exception as e:
+        logger.warning(f"Could not clear enqueue marker for {document_id}: {e}")
+
+
+async def clear_enqueue_async(document_id: str) -> None:
+    try:
+        await get_async_redis().delete(_marker_key(document_id))
+    except Exception as e:
+        logger.warning(f"Could not clear enqueue marker for {document_id}: {e}")
+
+
+def acquire_lock(document_id: str, owner: str) -> bool:
+    """Takes the per-document evaluation lock. Re-entrant for the same owner (task retries)."""
+    try:
+        client = get_redis()
+        if client.set(_lock_key(document_id), owner, nx=True, ex=LOCK_TTL):
+            return True
+        return client.get(_lock_key(document_id)) == owner
+    except Exception as e:
+        logger.warning(f"Evaluation lock unavailable for {document_id}: {e}")
+        return True
+
+
+def release_lock(document_id: str, owner: str) -> None:
+    try:
+        get_redis().eval(_RELEASE_SCRIPT, 1, _lock_key(document_id), owner)
+    except Exception as e:
+        logger.warning(f"Could not release evaluation lock for {document_id}: {e}")
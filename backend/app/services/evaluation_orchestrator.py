@@ -1,13 +1,59 @@
+import asyncio
+import inspect
 import logging
-from typing import Dict, Any, Callable, Optional
+from typing import Dict, Any, Awaitable, Callable, Optional, NamedTuple, Tuple
 from app.ai.plagiarism_detector import plagiarism_detector
 from app.ai.gemini_evaluator import gemini_evaluator
+from app.ai.ai_text_detector import ai_text_detector
+from app.ai.coherence_scorer import coherence_scorer
+from app.ai.topic_relevance import topic_relevance_analyzer
+from app.core.config import settings
+from app.core.metrics import stage_timer
 from app.ai.rag_engine import rag_engine
 from app.models.rubric import Rubric
+from app.services.checkpoints import StageCheckpoints
+from app.services.rubric_plans import RubricPlan, compile_rubric
+from app.utils.text_processing import locate
 
 logger = logging.getLogger(__name__)
 
 
+class Stage(NamedTuple):
+    name: str
+    depends_on: Tuple[str, ...] = ()
+    status: Optional[str] = None  # Progress status reported when the stage starts
+
+
+# Dependency graph of the evaluation pipeline. A stage starts as soon as all of
+# its dependencies have finished, so independent stages run concurrently and
+# wall-clock time is the longest path rather than the sum of all stages.
+PIPELINE_STAGES = (
+    Stage("plagiarism", status="analyzing_plagiarism"),
+    Stage("ai_detection"),
+    Stage("local_analysis"),
+    Stage("llm_scoring", status="analyzing_with_gemini"),
+    Stage("scoring", ("plagiarism", "ai_detection", "llm_scoring"), "calculating_score"),
+    Stage("feedback", ("llm_scoring",), "generating_feedback"),
+)
+
+
+def _validate_stage_graph(stages) -> None:
+    """Fails fast at import time on unknown dependencies or cycles."""
+    names = {stage.name for stage in stages}
+    resolved = set()
+    remaining = list(stages)
+    while remaining:
+        ready = [st for st in remaining if set(st.depends_on) <= resolved]
+        if not ready:
+            unknown = {d for st in remaining for d in st.depends_on} - names
+            raise ValueError(f"Invalid pipeline stage graph (unknown: {unknown or 'none'}, cycle otherwise)")
+        resolved.update(st.name for st in ready)
+        remaining = [st for st in remaining if st.name not in resolved]
+
+
+_validate_stage_graph(PIPELINE_STAGES)
+
+
 class EvaluationOrchestrator:
     """
     Coordinator service that runs AI analysis modules on a document.
@@ -16,7 +62,13 @@ class EvaluationOrchestrator:
     - Gemini handles ALL scoring (grammar, vocabulary, coherence, topic_relevance)
     - LanguageTool provides error spans for the interactive EssayViewer (UI only)
     - MinHash handles internal plagiarism detection (duplicate submissions)
-    - AI detection is informational only (no score penalty)
+    - AI detection is informational only (no score penalty). It runs locally
+      (AITextDetector) unless AI_DETECTION_ENGINE is "gemini".
+    - Local analyzers (coherence transitions, topic similarity) add
+      informational metrics only.
+
+    Stages are declared in PIPELINE_STAGES. CPU-bound stages run in the default
+    executor so they overlap with the Gemini call instead of blocking the loop.
     
     Penalties:
     - Plagiarism: additive deductions (not multiplicative)  
@@ -29,41 +81,195 @@ class EvaluationOrchestrator:
         document_id: str = None,
         prompt: str = None,
         rubric: Rubric = None,
-        status_callback: Optional[Callable[[str], None]] = None,
+        status_callback: Optional[Callable[[str], Optional[Awaitable[None]]]] = None,
+        rubric_plan: Optional[RubricPlan] = None,
+        checkpoints: Optional[StageCheckpoints] = None,
+        structure: Optional[Dict[str, Any]] = None,
     ) -> Dict[str, Any]:
         if not text:
             raise ValueError("No text provided for evaluation")
 
-        def _update(stage: str):
+        # Workers pass a cached plan; compiling here keeps the Rubric-based API working
+        plan = rubric_plan or compile_rubric(rubric)
+
+        # Workers pass a coroutine function, so publishing never blocks the event loop
+        async def _update(stage: str):
             if status_callback:
                 try:
-                    status_callback(stage)
+                    result = status_callback(stage)
+                    if inspect.isawaitable(result):
+                        await result
                 except Exception as e:
                     logger.warning(f"Status callback failed: {e}")
 
         logger.info("Starting document evaluation...")
+        loop = asyncio.get_running_loop()
+        use_gemini_ai_detection = settings.AI_DETECTION_ENGINE == "gemini"
+        stage_timings: Dict[str, float] = {}
+        # Stages finished by an earlier attempt (e.g. before a Gemini rate limit) are not rerun
+        completed = await checkpoints.load() if checkpoints else {}
+        if completed:
+            logger.info(f"Resuming evaluation from checkpoints: {', '.join(completed)}")
+
+        # ── Plagiarism (MinHash — internal duplicate detection) ──
+        async def run_plagiarism(results):
+            logger.info("Running Plagiarism Detection (MinHash)...")
+            return await loop.run_in_executor(
+                None, plagiarism_detector.check_plagiarism, text, document_id
+            )
 
-        # ── Step 1: Plagiarism (MinHash — internal duplicate detection) ──
-        _update("analyzing_plagiarism")
-        logger.info("Running Plagiarism Detection (MinHash)...")
-        plagiarism_result = plagiarism_detector.check_plagiarism(
-            text, exclude_doc_id=document_id
+        # ── AI detection (local detector unless Gemini handles it) ──
+        async def run_ai_detection(results):
+            if use_gemini_ai_detection:
+                return None
+            return await loop.run_in_executor(None, ai_text_detector.detect, text)
+
+        # ── Local analyzers (informational metrics, no effect on the score) ──
+        async def run_local_analysis(results):
+            return await loop.run_in_executor(None, self._local_analysis, text, prompt, structure)
+
+        # ── Gemini Evaluation (ALL scoring dimensions) ──
+        async def run_llm_scoring(results):
+            logger.info("Running Gemini AI Evaluation...")
+            gemini_result = await gemini_evaluator.evaluate(
+                text, prompt=prompt, include_ai_detection=use_gemini_ai_detection
+            )
+            if not gemini_result:
+                raise RuntimeError(
+                    "Gemini AI is currently unavailable. Evaluation cannot proceed without it. "
+                    "Please check if the API key is valid and the rate limit hasn't been exceeded, then retry."
+                )
+            logger.info("Using Gemini scores for evaluation.")
+            components = self._build_llm_components(text, gemini_result, structure)
+            components["model_used"] = gemini_result.get("_model")
+            return components
+
+        # ── Score Aggregation ──
+        async def run_scoring(results):
+            ai_detection_result = self._ai_detection_component(
+                results["ai_detection"], results["llm_scoring"]
+            )
+            return self._aggregate_scores(
+                results["llm_scoring"], results["plagiarism"], ai_detection_result, plan
+            )
+
+        # ── Generate Feedback (needs component results, not the final score) ──
+        async def run_feedback(results):
+            llm = results["llm_scoring"]
+            return await rag_engine.generate_feedback(
+                text, llm["grammar"], llm["vocabulary"], llm["coherence"], llm["topic_relevance"]
+            )
+
+        handlers = {
+            "plagiarism": run_plagiarism,
+            "ai_detection": run_ai_detection,
+            "local_analysis": run_local_analysis,
+            "llm_scoring": run_llm_scoring,
+            "scoring": run_scoring,
+            "feedback": run_feedback,
+        }
+        results = await self._run_stages(
+            handlers, _update, stage_timings,
+            completed=completed, on_stage_done=checkpoints.save if checkpoints else None,
         )
 
-        # ── Step 3: Gemini Evaluation (ALL scoring dimensions) ──
-        _update("analyzing_with_gemini")
-        logger.info("Running Gemini AI Evaluation...")
-        gemini_result = await gemini_evaluator.evaluate(text, prompt=prompt)
+        llm = results["llm_scoring"]
+        score_breakdown, final_score, grade = results["scoring"]
 
-        if not gemini_result:
-            raise RuntimeError(
-                "Gemini AI is currently unavailable. Evaluation cannot proceed without it. "
-                "Please check if the API key is valid and the rate limit hasn't been exceeded, then retry."
-            )
+        # Attach local metrics (e.g. transition offsets for highlighting) next to the LLM scores
+        coherence_result = dict(llm["coherence"])
+        topic_result = dict(llm["topic_relevance"])
+        local = results["local_analysis"]
+        if local["coherence"]:
+            coherence_result["local_analysis"] = local["coherence"]
+        if local["topic_relevance"]:
+            topic_result["local_analysis"] = local["topic_relevance"]
 
-        scoring_engine = "gemini"
-        logger.info("Using Gemini scores for evaluation.")
+        return {
+            "final_score": round(final_score, 2),
+            "grade": grade,
+            "rubric_used": plan.name,
+            "scoring_engine": "gemini",
+            "components": {
+                "grammar": llm["grammar"],
+                "plagiarism": results["plagiarism"],
+                "vocabulary": llm["vocabulary"],
+                "coherence": coherence_result,
+                "topic_relevance": topic_result,
+                "ai_detection": self._ai_detection_component(results["ai_detection"], llm),
+            },
+            "score_breakdown": score_breakdown,
+            "overall_feedback": results["feedback"],
+            "model_used": llm.get("model_used"),
+            "stage_timings_ms": stage_timings,
+        }
+
+    async def _run_stages(
+        self,
+        handlers: Dict[str, Callable],
+        update: Callable[[str], Awaitable[None]],
+        timings: Optional[Dict[str, float]] = None,
+        completed: Optional[Dict[str, Any]] = None,
+        on_stage_done: Optional[Callable[[str, Any], Awaitable[None]]] = None,
+    ) -> Dict[str, Any]:
+        """
+        Runs PIPELINE_STAGES as a dependency graph. Each handler receives the
+        results of finished stages. The first failure cancels everything still running.
+        Per-stage durations are recorded in `timings` (milliseconds).
+        Stages in `completed` are taken as done with the given result;
+        `on_stage_done` is awaited with each newly finished stage's result.
+        """
+        async def timed(name: str):
+            with stage_timer(name, timings):
+                result = await handlers[name](results)
+            if on_stage_done:
+                await on_stage_done(name, result)
+            return result
+
+        results: Dict[str, Any] = {
+            name: result for name, result in (completed or {}).items() if name in handlers
+        }
+        pending = [stage for stage in PIPELINE_STAGES if stage.name not in results]
+        running: Dict[asyncio.Future, str] = {}
+
+        try:
+            while pending or running:
+                for stage in [st for st in pending if all(d in results for d in st.depends_on)]:
+                    pending.remove(stage)
+                    if stage.status:
+                        await update(stage.status)
+                    running[asyncio.ensure_future(timed(stage.name))] = stage.name
+
+                done, _ = await asyncio.wait(running.keys(), return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    name = running.pop(task)
+                    results[name] = task.result()
+        finally:
+            for task in running:
+                task.cancel()
+
+        return results
+
+    def _local_analysis(
+        self, text: str, prompt: Optional[str], structure: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, Any]:
+        coherence = coherence_scorer.analyze(text, structure=structure)
+        local = {
+            "coherence": {"score": coherence["score"], **coherence["analysis"]},
+            "topic_relevance": None,
+        }
+        if prompt:
+            local["topic_relevance"] = topic_relevance_analyzer.analyze(text, prompt)
+        return local
 
+    def _build_llm_components(
+        self, text: str, gemini_result: Dict[str, Any], structure: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, Any]:
+        """
+        Maps the raw Gemini response onto per-dimension component results.
+        With the parser's `structure`, grammar errors also carry their
+        paragraph, sentence and (PDFs) page index.
+        """
         # Process grammar error spans natively from Gemini's response
         computed_errors = []
         gemini_spans = gemini_result["grammar"].get("error_spans", [])
@@ -75,6 +281,7 @@ class EvaluationOrchestrator:
                 
             offset = text.find(original)
             if offset != -1:
+                location = locate(structure, offset) if structure else {}
                 computed_errors.append({
                     "message": span.get("message", "Grammar issue"),
                     "short_message": span.get("message", "Grammar issue"),
@@ -84,155 +291,135 @@ class EvaluationOrchestrator:
                     "suggestion": span.get("suggestion", ""),
                     "rule_id": "GEMINI_AI_GRAMMAR",
                     "rule_category": "GRAMMAR",
-                    "context": original
+                    "context": original,
+                    **location,
                 })
 
-        grammar_result = {
-            "score": gemini_result["grammar"]["score"],
-            "reasoning": gemini_result["grammar"].get("reasoning", ""),
-            "strengths": gemini_result["grammar"].get("strengths", []),
-            "improvements": gemini_result["grammar"].get("improvements", []),
-            "engine": "gemini",
-            "errors": computed_errors,
-            "error_count": len(computed_errors),
-            "error_rate": round(len(computed_errors) / max(1, len(text.split())), 4),
-        }
-        vocab_result = {
-            "score": gemini_result["vocabulary"]["score"],
-            "reasoning": gemini_result["vocabulary"].get("reasoning", ""),
-            "strengths": gemini_result["vocabulary"].get("strengths", []),
-            "improvements": gemini_result["vocabulary"].get("improvements", []),
-            "engine": "gemini",
-        }
-        coherence_result = {
-            "score": gemini_result["coherence"]["score"],
-            "reasoning": gemini_result["coherence"].get("reasoning", ""),
-            "strengths": gemini_result["coherence"].get("strengths", []),
-            "improvements": gemini_result["coherence"].get("improvements", []),
-            "engine": "gemini",
-        }
-        topic_result = {
-            "score": gemini_result["topic_relevance"]["score"],
-            "reasoning": gemini_result["topic_relevance"].get("reasoning", ""),
-            "strengths": gemini_result["topic_relevance"].get("strengths", []),
-            "improvements": gemini_result["topic_relevance"].get("improvements", []),
-            "engine": "gemini",
+        components = {
+            "grammar": {
+                "score": gemini_result["grammar"]["score"],
+                "reasoning": gemini_result["grammar"].get("reasoning", ""),
+                "strengths": gemini_result["grammar"].get("strengths", []),
+                "improvements": gemini_result["grammar"].get("improvements", []),
+                "engine": "gemini",
+                "errors": computed_errors,
+                "error_count": len(computed_errors),
+                "error_rate": round(len(computed_errors) / max(1, len(text.split())), 4),
+            },
         }
-        ai_detection_result = {
-            "score": gemini_result["ai_detection"]["score"],
-            "label": gemini_result["ai_detection"].get("label", "Unknown"),
-            "reasoning": gemini_result["ai_detection"].get("reasoning", ""),
-            "engine": "gemini",
+        for key in ("vocabulary", "coherence", "topic_relevance"):
+            components[key] = {
+                "score": gemini_result[key]["score"],
+                "reasoning": gemini_result[key].get("reasoning", ""),
+                "strengths": gemini_result[key].get("strengths", []),
+                "improvements": gemini_result[key].get("improvements", []),
+                "engine": "gemini",
+            }
+        if "ai_detection" in gemini_result:
+            components["ai_detection"] = {
+                "score": gemini_result["ai_detection"]["score"],
+                "label": gemini_result["ai_detection"].get("label", "Unknown"),
+                "reasoning": gemini_result["ai_detection"].get("reasoning", ""),
+                "engine": "gemini",
+            }
+        return components
+
+    def _ai_detection_component(
+        self, local_detection: Optional[Dict[str, Any]], llm: Dict[str, Any]
+    ) -> Dict[str, Any]:
+        if local_detection is None:
+            return llm.get("ai_detection") or {"score": 0, "label": "Unknown", "reasoning": "", "engine": "gemini"}
+        return {
+            "score": local_detection["score"],
+            "label": local_detection["label"],
+            "reasoning": local_detection.get("reasoning", ""),
+            "details": local_detection.get("details", {}),
+            "engine": "local",
         }
 
-        # ── Step 4: Score Aggregation ──
-        _update("calculating_score")
+    def rescore(
+        self, components: Dict[str, Any], plan: RubricPlan
+    ) -> Tuple[Dict[str, Any], float, str]:
+        """
+        Recomputes (score_breakdown, final_score, grade) from stored evaluation
+        components, e.g. after a rubric edit. No LLM calls.
+        """
+        return self._aggregate_scores(
+            components, components["plagiarism"], components["ai_detection"], plan
+        )
 
-        grammar_score = grammar_result["score"]
-        vocab_score = vocab_result["score"]
-        coherence_score = coherence_result["score"]
-        topic_score = topic_result["score"]
+    def _aggregate_scores(
+        self,
+        llm: Dict[str, Any],
+        plagiarism_result: Dict[str, Any],
+        ai_detection_result: Dict[str, Any],
+        plan: RubricPlan,
+    ) -> Tuple[Dict[str, Any], float, str]:
+        """Weighted rubric total plus penalties. Returns (score_breakdown, final_score, grade)."""
+        topic_score = llm["topic_relevance"]["score"]
         plagiarism_pct = plagiarism_result["percentage"]
 
         # Score lookup for rubric criterion matching
         score_map = {
-            "grammar": grammar_score,
-            "vocabulary": vocab_score,
-            "coherence": coherence_score,
+            "grammar": llm["grammar"]["score"],
+            "vocabulary": llm["vocabulary"]["score"],
+            "coherence": llm["coherence"]["score"],
             "topic_relevance": topic_score,
         }
+        # If the AI doesn't have an explicit pillar for a criterion, it gets the average
+        # score of the text to prevent it from dragging the essay down to a 0 artificially.
+        average_score = sum(score_map.values()) / max(1, len(score_map))
 
-        # Build weighted components from rubric (or defaults)
+        # Build weighted components from the compiled rubric plan
         weighted_components = []
         weighted_score = 0.0
-        total_weight_used = 0.0
-
-        if rubric:
-            logger.info(f"Using Rubric: {rubric.name}")
-            for criterion in rubric.criteria:
-                matched_key = self._match_criterion(criterion.name)
-                if matched_key is None:
-                    # If the AI doesn't have an explicit pillar for this, give it the average score of the text
-                    # to prevent it from dragging the essay down to a 0 artificially.
-                    c_score = sum(score_map.values()) / max(1, len(score_map))
-                    logger.warning(f"Unknown criterion: '{criterion.name}'. Defaulting to average score {c_score}.")
-                else:
-                    c_score = score_map.get(matched_key, 0)
-
-                contribution = round(c_score * (criterion.weight / 100.0), 2)
-                weighted_score += contribution
-                total_weight_used += criterion.weight
-                weighted_components.append({
-                    "name": criterion.name,
-                    "raw_score": round(c_score, 2),
-                    "weight": criterion.weight,
-                    "contribution": contribution,
-                })
+
+        if plan.is_rubric:
+            logger.info(f"Using Rubric: {plan.name}")
         else:
             logger.info("No rubric provided. Using default weights.")
-            defaults = [
-                ("Grammar", "grammar", 25),
-                ("Vocabulary", "vocabulary", 20),
-                ("Coherence", "coherence", 25),
-                ("Topic Relevance", "topic_relevance", 30),
-            ]
-            for name, key, weight in defaults:
-                c_score = score_map[key]
-                contribution = round(c_score * (weight / 100.0), 2)
-                weighted_score += contribution
-                total_weight_used += weight
-                weighted_components.append({
-                    "name": name,
-                    "raw_score": round(c_score, 2),
-                    "weight": weight,
-                    "contribution": contribution,
-                })
+        for criterion in plan.criteria:
+            c_score = average_score if criterion.key is None else score_map[criterion.key]
+            contribution = round(c_score * (criterion.weight / 100.0), 2)
+            weighted_score += contribution
+            weighted_components.append({
+                "name": criterion.name,
+                "raw_score": round(c_score, 2),
+                "weight": criterion.weight,
+                "contribution": contribution,
+            })
 
         # Normalize if weights don't add to 100 (e.g. custom rubric missing a category)
-        if total_weight_used > 0 and total_weight_used < 100:
-            scale = 100.0 / total_weight_used
-            weighted_score *= scale
+        if plan.scale != 1.0:
+            weighted_score *= plan.scale
             for comp in weighted_components:
-                comp["adjusted_weight"] = round(comp["weight"] * scale, 1)
-                comp["contribution"] = round(comp["contribution"] * scale, 2)
-            logger.info(f"Weights only summed to {total_weight_used}%. Normalized to 100%.")
+                comp["adjusted_weight"] = round(comp["weight"] * plan.scale, 1)
+                comp["contribution"] = round(comp["contribution"] * plan.scale, 2)
 
         weighted_total = round(weighted_score, 2)
         final_score = weighted_score
 
         # ── Apply Penalties (additive, not multiplicative) ──
         penalties = []
-
-        # Plagiarism penalty — additive deduction, capped at 40 points
-        if plagiarism_pct > 50:
-            deduction = min(40.0, round(plagiarism_pct * 0.4, 2))
-            final_score -= deduction
-            penalties.append({
-                "name": "Severe Plagiarism",
-                "detail": f"{plagiarism_pct}% similarity — {deduction} point deduction",
-                "deduction": -deduction,
-            })
-        elif plagiarism_pct > 20:
-            deduction = round(plagiarism_pct * 0.3, 2)
-            final_score -= deduction
-            penalties.append({
-                "name": "Plagiarism",
-                "detail": f"{plagiarism_pct}% similarity — {deduction} point deduction",
-                "deduction": -deduction,
-            })
-        elif plagiarism_pct > 5:
-            deduction = round(plagiarism_pct * 0.15, 2)
-            final_score -= deduction
-            penalties.append({
-                "name": "Minor Similarity",
-                "detail": f"{plagiarism_pct}% similarity — {deduction} point deduction",
-                "deduction": -deduction,
-            })
-        # <= 5% is considered noise/common phrases — no penalty
+        config = plan.penalties
+
+        # Plagiarism penalty — additive deduction by similarity tier
+        for tier in config.plagiarism_tiers:
+            if plagiarism_pct > tier.threshold:
+                deduction = round(plagiarism_pct * tier.rate, 2)
+                if tier.cap is not None:
+                    deduction = min(tier.cap, deduction)
+                final_score -= deduction
+                penalties.append({
+                    "name": tier.name,
+                    "detail": f"{plagiarism_pct}% similarity — {deduction} point deduction",
+                    "deduction": -deduction,
+                })
+                break
 
         # AI detection: informational only, NO score penalty
         # Displayed as a badge/flag in the UI, not a deduction
-        if ai_detection_result["score"] > 80:
+        if ai_detection_result["score"] > config.ai_flag_threshold:
             penalties.append({
                 "name": "AI Content Flag",
                 "detail": f"AI probability {ai_detection_result['score']}% — flagged for review (no score deduction)",
@@ -240,8 +427,8 @@ class EvaluationOrchestrator:
             })
 
         # Off-topic floor: if essay is completely off-topic, cap the score
-        if topic_score < 10:
-            off_topic_cap = 25.0
+        if topic_score < config.off_topic_threshold:
+            off_topic_cap = config.off_topic_cap
             if final_score > off_topic_cap:
                 overshoot = round(final_score - off_topic_cap, 2)
                 final_score = off_topic_cap
@@ -261,48 +448,7 @@ class EvaluationOrchestrator:
         }
 
         grade = self._assign_grade(final_score)
-
-        # ── Step 5: Generate Feedback ──
-        _update("generating_feedback")
-        feedback = await rag_engine.generate_feedback(
-            text, grammar_result, vocab_result, coherence_result, topic_result
-        )
-
-        return {
-            "final_score": round(final_score, 2),
-            "grade": grade,
-            "rubric_used": rubric.name if rubric else "Default",
-            "scoring_engine": scoring_engine,
-            "components": {
-                "grammar": grammar_result,
-                "plagiarism": plagiarism_result,
-                "vocabulary": vocab_result,
-                "coherence": coherence_result,
-                "topic_relevance": topic_result,
-                "ai_detection": ai_detection_result,
-            },
-            "score_breakdown": score_breakdown,
-            "overall_feedback": feedback,
-        }
-
-    def _match_criterion(self, name: str) -> str:
-        """Map a rubric criterion name to an internal score key."""
-        n = name.lower()
-        grammar_words = ["grammar", "mechanic", "spelling", "punctuation", "syntax"]
-        vocab_words = ["vocab", "lexic", "word choice", "diction", "language use", "style", "creativity", "originality", "voice"]
-        coherence_words = ["coheren", "flow", "structure", "organization", "logic", "clarity",
-                           "consistency", "quality", "formatting"]
-        topic_words = ["topic", "relevan", "prompt", "focus", "content", "thesis", "argument"]
-
-        if any(w in n for w in grammar_words):
-            return "grammar"
-        elif any(w in n for w in vocab_words):
-            return "vocabulary"
-        elif any(w in n for w in coherence_words):
-            return "coherence"
-        elif any(w in n for w in topic_words):
-            return "topic_relevance"
-        return None
+        return score_breakdown, final_score, grade
 
     def _assign_grade(self, score: float) -> str:
         if score >= 90: return "A+"
@@ -0,0 +1,63 @@
+"""
+Parse results cached by content hash.
+
+Uploads are hashed (SHA-256) while they are stored, so a file whose bytes were
+parsed before (a re-upload, or the same file in several batches) reuses the
+extracted text instead of being parsed again. Entries record the parser
+version that produced them and are ignored once it changes; unused entries
+expire through a TTL index on `last_used_at` (see app.db.mongodb.ensure_indexes).
+Lookups and writes are best effort: a cache failure only costs a parse.
+"""
+
+import logging
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+from pymongo.database import Database
+
+from app.core.metrics import CACHE_LOOKUPS
+from app.services.document_parser import PARSER_VERSION
+
+logger = logging.getLogger(__name__)
+
+PARSE_CACHE_COLLECTION = "parse_cache"
+PARSE_CACHE_TTL_SECONDS = 30 * 24 * 3600
+
+_CACHED_FIELDS = ("extracted_text", "word_count", "page_count", "metadata", "structure")
+
+
+def get_parsed(db: Database, content_hash: str) -> Optional[Dict[str, Any]]:
+    """The parse result stored for content_hash by the current parser version, if any."""
+    try:
+        entry = db[PARSE_CACHE_COLLECTION].find_one_and_update(
+            {"_id": content_hash, "parser_version": PARSER_VERSION},
+            {"$set": {"last_used_at": datetime.utcnow()}},
+            projection={field: 1 for field in _CACHED_FIELDS},
+        )
+    except Exception as e:
+        logger.warning(f"Parse cache unavailable for {content_hash}: {e}")
+        return None
+    CACHE_LOOKUPS.labels("parse", "hit" if entry else "miss").inc()
+    if not entry:
+        return None
+    return {field: entry.get(field) for field in _CACHED_FIELDS}
+
+
+def store_parsed(db: Database, content_hash: str, parsed: Dict[str, Any]) -> None:
+    # Failed parses are not cached, so a fixed parser gets another go at the file
+    if (parsed.get("metadata") or {}).get("error") or not parsed.get("extracted_text"):
+        return
+    now = datetime.utcnow()
+    try:
+        db[PARSE_CACHE_COLLECTION].replace_one(
+            {"_id": content_hash},
+            {
+                **{field: parsed.get(field) for field in _CACHED_FIELDS},
+                "parser_version": PARSER_VERSION,
+                "created_at": now,
+                "last_used_at": now,
+            },
+            upsert=True,
+        )
+    except Exception as e:
+        logger.warning(f"Could not cache parse result for {content_hash}: {e}")
@@ -0,0 +1,131 @@
+"""
+Document progress events.
+
+Workers publish every pipeline status to the Redis channel
+`document_progress:{id}` and keep the latest event under
+`document_progress_last:{id}`. Only terminal states (and long waits such as
+"retrying") are also written to MongoDB, so intermediate stages cost one
+Redis round trip instead of a document write. Clients subscribe through the
+SSE endpoint instead of polling.
+"""
+
+import json
+import time
+import logging
+from datetime import timezone
+from typing import Any, AsyncIterator, Dict, Optional
+
+from app.db.redis_client import get_async_redis, get_redis
+
+logger = logging.getLogger(__name__)
+
+# States after which nothing else happens to the document without a new request
+TERMINAL_STATUSES = {"evaluated", "graded", "failed", "failed_evaluation"}
+
+LAST_EVENT_TTL_SECONDS = 24 * 3600
+HEARTBEAT_SECONDS = 15
+
+
+def progress_channel(document_id: str) -> str:
+    return f"document_progress:{document_id}"
+
+
+def _last_event_key(document_id: str) -> str:
+    return f"document_progress_last:{document_id}"
+
+
+def make_event(document_id: str, status: str, **extra: Any) -> Dict[str, Any]:
+    return {
+        "document_id": document_id,
+        "status": status,
+        "terminal": status in TERMINAL_STATUSES,
+        "ts": time.time(),
+        **extra,
+    }
+
+
+def publish_progress(document_id: str, status: str, **extra: Any) -> None:
+    """
+    Publishes a status event (sync; called from workers). Best effort: progress
+    is informational, so Redis errors are logged and never fail the task.
+    """
+    payload = json.dumps(make_event(document_id, status, **extra))
+    try:
+        pipe = get_redis().pipeline(transaction=False)
+        pipe.set(_last_event_key(document_id), payload, ex=LAST_EVENT_TTL_SECONDS)
+        pipe.publish(progress_channel(document_id), payload)
+        pipe.execute()
+    except Exception as e:
+        logger.warning(f"Could not publish progress for {document_id}: {e}")
+
+
+async def publish_progress_async(document_id: str, status: str, **extra: Any) -> None:
+    """publish_progress for coroutines: the API (e.g. "queued") and stage updates on a worker's event loop."""
+    payload = json.dumps(make_event(document_id, status, **extra))
+    try:
+        pipe = get_async_redis().pipeline(transaction=False)
+        pipe.set(_last_event_key(document_id), payload, ex=LAST_EVENT_TTL_SECONDS)
+        pipe.publish(progress_channel(document_id), payload)
+        await pipe.execute()
+    except Exception as e:
+        logger.warning(f"Could not publish progress for {document_id}: {e}")
+
+
+async def get_last_event(document_id: str) -> Optional[Dict[str, Any]]:
+    try:
+        payload = await get_async_redis().get(_last_event_key(document_id))
+    except Exception as e:
+        logger.warning(f"Could not read progress for {document_id}: {e}")
+        return None
+    return json.loads(payload) if payload else None
+
+
+async def apply_live_status(doc: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Overlays the latest Redis status on a document read from MongoDB, when it is
+    newer than the stored one (intermediate stages are not written to MongoDB).
+    A terminal stored status is only replaced by a newer terminal event: a new
+    run writes its non-terminal status (e.g. "queued") to MongoDB first.
+    """
+    event = await get_last_event(str(doc["_id"]))
+    if not event:
+        return doc
+    updated_at = doc.get("updated_at")
+    stored_ts = updated_at.replace(tzinfo=timezone.utc).timestamp() if updated_at else 0
+    if event["ts"] <= stored_ts:
+        return doc
+    if doc.get("status") in TERMINAL_STATUSES and not event.get("terminal"):
+        return doc
+    doc["status"] = event["status"]
+    return doc
+
+
+async def iter_progress(document_id: str) -> AsyncIterator[Optional[Dict[str, Any]]]:
+    """
+    Yields progress events until a terminal one, starting with the latest known
+    event. Yields None every HEARTBEAT_SECONDS without events (keep-alive).
+    """
+    client = get_async_redis()
+    pubsub = client.pubsub()
+    # Subscribe before reading the last event so nothing published in between is lost
+    await pubsub.subscribe(progress_channel(document_id))
+    try:
+        last = await client.get(_last_event_key(document_id))
+        if last:
+            event = json.loads(last)
+            yield event
+            if event.get("terminal"):
+                return
+
+        while True:
+            message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=HEARTBEAT_SECONDS)
+            if message is None:
+                yield None
+                continue
+            event = json.loads(message["data"])
+            yield event
+            if event.get("terminal"):
+                return
+    finally:
+        await pubsub.unsubscribe()
+        await pubsub.reset()
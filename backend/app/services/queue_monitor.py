@@ -0,0 +1,214 @@
+"""
+Queue depth, in-flight work, throughput and wait-time estimates.
+
+Everything is read from Redis: queue lengths from the broker lists, work in
+progress from the transport's `unacked` hash, and throughput from per-minute
+completion counters that the tasks record when a stage really finishes
+(deferred or deduplicated tasks do not count). Used by the operator endpoint,
+the per-document ETA endpoint and the Prometheus gauges that drive worker
+autoscaling. Calls are blocking; run them in a thread from async code.
+"""
+
+import json
+import time
+import logging
+from typing import Any, Dict, Optional
+
+from prometheus_client.core import GaugeMetricFamily
+
+from app.db.redis_client import get_redis
+from app.services.progress import TERMINAL_STATUSES
+from app.workers.celery_app import CPU_QUEUE, LLM_QUEUE, PRIORITIES
+
+logger = logging.getLogger(__name__)
+
+# Pipeline stage served by each queue, for turning queue depth into wait time
+QUEUE_STAGES = {CPU_QUEUE: "parse", LLM_QUEUE: "evaluation"}
+
+THROUGHPUT_WINDOW_MINUTES = 15
+_THROUGHPUT_TTL = 2 * 3600
+
+# Kombu's Redis transport: one list per priority step ("cpu", "cpu:3", "cpu:9")
+# and a hash of delivered-but-unacknowledged messages
+_PRIORITY_SEP = ":"
+_UNACKED_KEY = "unacked"
+
+
+def _priority_list(queue: str, priority: int) -> str:
+    return f"{queue}{_PRIORITY_SEP}{priority}" if priority else queue
+
+
+def _throughput_key(minute: int) -> str:
+    return f"stage_throughput:{minute}"
+
+
+def record_completion(stage: str, runtime_seconds: float) -> None:
+    """Counts a finished stage and its runtime in the current minute's bucket (best effort)."""
+    key = _throughput_key(int(time.time() // 60))
+    try:
+        pipe = get_redis().pipeline(transaction=False)
+        pipe.hincrby(key, f"{stage}:count", 1)
+        pipe.hincrbyfloat(key, f"{stage}:runtime", runtime_seconds)
+        pipe.expire(key, _THROUGHPUT_TTL)
+        pipe.execute()
+    except Exception as e:
+        logger.warning(f"Could not record {stage} completion: {e}")
+
+
+def queue_depths() -> Dict[str, Dict[str, int]]:
+    """Messages waiting per queue and priority level name."""
+    pipe = get_redis().pipeline(transaction=False)
+    for queue in QUEUE_STAGES:
+        for priority in PRIORITIES.values():
+            pipe.llen(_priority_list(queue, priority))
+    lengths = iter(pipe.execute())
+    return {
+        queue: {level: next(lengths) for level in PRIORITIES}
+        for queue in QUEUE_STAGES
+    }
+
+
+def in_flight() -> Dict[str, Dict[str, int]]:
+    """
+    Delivered, unacknowledged messages per queue: "active" ones are running
+    (or reserved by a free slot), "scheduled" ones wait for a retry/deferral countdown.
+    """
+    counts = {queue: {"active": 0, "scheduled": 0} for queue in QUEUE_STAGES}
+    for raw in get_redis().hvals(_UNACKED_KEY):
+        try:
+            message, _exchange, routing_key = json.loads(raw)
+        except (ValueError, TypeError):
+            continue
+        if routing_key not in counts:
+            continue
+        eta = (message.get("headers") or {}).get("eta")
+        counts[routing_key]["scheduled" if eta else "active"] += 1
+    return counts
+
+
+def throughput() -> Dict[str, Dict[str, Optional[float]]]:
+    """Completions per minute and mean runtime per stage over the recent window."""
+    now = time.time()
+    current = int(now // 60)
+    pipe = get_redis().pipeline(transaction=False)
+    for minute in range(current - THROUGHPUT_WINDOW_MINUTES, current + 1):
+        pipe.hgetall(_throughput_key(minute))
+    buckets = pipe.execute()
+
+    # The window ends now, mid-way through the current minute
+    window_minutes = THROUGHPUT_WINDOW_MINUTES + (now % 60) / 60
+    stats = {}
+    for stage in QUEUE_STAGES.values():
+        count = sum(int(b.get(f"{stage}:count", 0)) for b in buckets)
+        runtime = sum(float(b.get(f"{stage}:runtime", 0)) for b in buckets)
+        stats[stage] = {
+            "per_minute": round(count / window_minutes, 2),
+            "avg_runtime_seconds": round(runtime / count, 2) if count else None,
+        }
+    return stats
+
+
+def _wait_seconds(ahead: int, stage_stats: Dict[str, Optional[float]]) -> Optional[float]:
+    """Time to drain `ahead` messages at the recent rate, plus one run of the stage."""
+    rate = stage_stats["per_minute"]
+    if not rate:
+        return None
+    return ahead / rate * 60 + (stage_stats["avg_runtime_seconds"] or 0)
+
+
+def queue_snapshot() -> Dict[str, Any]:
+    """Everything operators and autoscalers need, in one Redis round trip per source."""
+    depths = queue_depths()
+    active = in_flight()
+    stats = throughput()
+
+    queues = {}
+    for queue, stage in QUEUE_STAGES.items():
+        depth = sum(depths[queue].values())
+        rate = stats[stage]["per_minute"]
+        queues[queue] = {
+            "stage": stage,
+            "depth": depth,
+            "by_priority": depths[queue],
+            "in_flight": active[queue]["active"],
+            "scheduled": active[queue]["scheduled"],
+            "drain_eta_seconds": round(depth / rate * 60) if rate else (0 if depth == 0 else None),
+        }
+    return {
+        "queues": queues,
+        "throughput": stats,
+        "window_minutes": THROUGHPUT_WINDOW_MINUTES,
+        "generated_at": time.time(),
+    }
+
+
+def estimate_document_eta(status: str, priority: str = "normal") -> Optional[float]:
+    """
+    Estimated seconds until a document in `status` is evaluated, or None
+    without recent throughput to go by. Counts every queued message at the
+    document's priority or higher as ahead of it, so it errs on the long side.
+    """
+    if status in TERMINAL_STATUSES:
+        return 0.0
+
+    depths = queue_depths()
+    stats = throughput()
+    level = priority if priority in PRIORITIES else "normal"
+
+    def ahead(queue: str) -> int:
+        return sum(n for name, n in depths[queue].items() if PRIORITIES[name] <= PRIORITIES[level])
+
+    # Deferred uploads are counted as if just queued (the admission wait is not included)
+    stages = []
+    if status in ("deferred", "pending", "processing"):
+        stages.append(_wait_seconds(0 if status == "processing" else ahead(CPU_QUEUE), stats["parse"]))
+    # Once parsed (or re-triggered) the document waits for, or is in, evaluation
+    evaluating = status not in ("deferred", "pending", "processing", "completed", "queued", "retrying")
+    stages.append(_wait_seconds(0 if evaluating else ahead(LLM_QUEUE), stats["evaluation"]))
+
+    if any(s is None for s in stages):
+        return None
+    return round(sum(stages), 1)
+
+
+class QueueCollector:
+    """Prometheus collector exposing the queue snapshot as gauges, read at scrape time."""
+
+    @staticmethod
+    def _families():
+        return (
+            GaugeMetricFamily(
+                "eduscore_queue_depth", "Messages waiting per queue and priority.", labels=["queue", "priority"]
+            ),
+            GaugeMetricFamily(
+                "eduscore_tasks_in_flight", "Delivered, unacknowledged tasks per queue.", labels=["queue", "state"]
+            ),
+            GaugeMetricFamily(
+                "eduscore_stage_throughput_per_minute",
+                f"Completed stages per minute over the last {THROUGHPUT_WINDOW_MINUTES} minutes.",
+                labels=["stage"],
+            ),
+        )
+
+    def describe(self):
+        # Lets the registry learn the metric names without reading Redis at registration
+        return self._families()
+
+    def collect(self):
+        try:
+            snapshot = queue_snapshot()
+        except Exception as e:
+            logger.warning(f"Queue metrics unavailable: {e}")
+            return
+
+        depth, running, rate = self._families()
+        for queue, info in snapshot["queues"].items():
+            for level, count in info["by_priority"].items():
+                depth.add_metric([queue, level], count)
+            running.add_metric([queue, "active"], info["in_flight"])
+            running.add_metric([queue, "scheduled"], info["scheduled"])
+        for stage, stats in snapshot["throughput"].items():
+            rate.add_metric([stage], stats["per_minute"])
+        yield depth
+        yield running
+        yield rate
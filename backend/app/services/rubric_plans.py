@@ -0,0 +1,187 @@
+"""
+Compiled rubric scoring plans.
+
+A rubric is compiled once into an immutable RubricPlan: each criterion is
+mapped to the score key it draws from, and the weight normalization and
+penalty settings are fixed. Plans are cached per worker process, keyed by
+rubric id and `updated_at`, so the per-document scoring path does no
+rubric parsing or keyword matching.
+"""
+
+import logging
+from datetime import datetime
+from typing import Dict, Optional, NamedTuple, Tuple
+
+from bson import ObjectId
+from motor.motor_asyncio import AsyncIOMotorDatabase
+
+from app.core.metrics import record_cache_lookup
+from app.models.rubric import Rubric
+
+logger = logging.getLogger(__name__)
+
+
+class CriterionPlan(NamedTuple):
+    name: str
+    key: Optional[str]  # Score key, or None for criteria scored with the average
+    weight: float
+
+
+class PlagiarismTier(NamedTuple):
+    threshold: float  # Applies when similarity % is above this
+    rate: float  # Points deducted per similarity %
+    cap: Optional[float]
+    name: str
+
+
+class PenaltyConfig(NamedTuple):
+    # Checked in order; the first matching tier applies. <= 5% is noise, no penalty.
+    plagiarism_tiers: Tuple[PlagiarismTier, ...] = (
+        PlagiarismTier(50, 0.4, 40.0, "Severe Plagiarism"),
+        PlagiarismTier(20, 0.3, None, "Plagiarism"),
+        PlagiarismTier(5, 0.15, None, "Minor Similarity"),
+    )
+    # AI detection is informational only: flagged above this, never deducted
+    ai_flag_threshold: float = 80
+    # Essays below this topic relevance are capped at off_topic_cap
+    off_topic_threshold: float = 10
+    off_topic_cap: float = 25.0
+
+
+class RubricPlan(NamedTuple):
+    rubric_id: Optional[str]
+    name: str
+    version: Optional[datetime]  # Rubric updated_at the plan was compiled from
+    criteria: Tuple[CriterionPlan, ...]
+    # Factor applied when the criteria weights sum to less than 100
+    scale: float
+    penalties: PenaltyConfig = PenaltyConfig()
+    is_rubric: bool = True  # False for the built-in default weights
+
+
+CRITERION_KEYWORDS = (
+    ("grammar", ("grammar", "mechanic", "spelling", "punctuation", "syntax")),
+    ("vocabulary", ("vocab", "lexic", "word choice", "diction", "language use", "style",
+                    "creativity", "originality", "voice")),
+    ("coherence", ("coheren", "flow", "structure", "organization", "logic", "clarity",
+                   "consistency", "quality", "formatting")),
+    ("topic_relevance", ("topic", "relevan", "prompt", "focus", "content", "thesis", "argument")),
+)
+
+
+def match_criterion(name: str) -> Optional[str]:
+    """Map a rubric criterion name to an internal score key."""
+    n = name.lower()
+    for key, words in CRITERION_KEYWORDS:
+        if any(w in n for w in words):
+            return key
+    return None
+
+
+def _scale(total_weight: float) -> float:
+    # Normalize if weights don't add to 100 (e.g. custom rubric missing a category)
+    if 0 < total_weight < 100:
+        return 100.0 / total_weight
+    return 1.0
+
+
+def compile_rubric(rubric: Optional[Rubric]) -> "RubricPlan":
+    """Compiles a rubric (or None, for the built-in default weights) into a plan."""
+    if rubric is None:
+        return DEFAULT_PLAN
+
+    criteria = []
+    for criterion in rubric.criteria:
+        key = match_criterion(criterion.name)
+        if key is None:
+            logger.warning(f"Unknown criterion: '{criterion.name}'. It will be scored with the average score.")
+        criteria.append(CriterionPlan(criterion.name, key, criterion.weight))
+
+    return RubricPlan(
+        rubric_id=str(rubric.id),
+        name=rubric.name,
+        version=rubric.updated_at,
+        criteria=tuple(criteria),
+        scale=_scale(sum(c.weight for c in criteria)),
+    )
+
+
+_DEFAULT_CRITERIA = (
+    CriterionPlan("Grammar", "grammar", 25),
+    CriterionPlan("Vocabulary", "vocabulary", 20),
+    CriterionPlan("Coherence", "coherence", 25),
+    CriterionPlan("Topic Relevance", "topic_relevance", 30),
+)
+
+DEFAULT_PLAN = RubricPlan(
+    rubric_id=None,
+    name="Default",
+    version=None,
+    criteria=_DEFAULT_CRITERIA,
+    scale=_scale(sum(c.weight for c in _DEFAULT_CRITERIA)),
+    is_rubric=False,
+)
+
+
+class RubricPlanCache:
+    """
+    Per-process cache of compiled rubric plans, keyed by rubric and checked
+    against its `updated_at` on every lookup with an `updated_at`-only
+    projection, so a rubric edited through any process is never scored with
+    its old plan. The full rubric is fetched and recompiled only when it changed.
+    """
+
+    _DEFAULT_KEY = "__default__"
+
+    def __init__(self):
+        # cache key -> plan (its version is the rubric's updated_at)
+        self._plans: Dict[str, RubricPlan] = {}
+
+    async def get(self, db: AsyncIOMotorDatabase, rubric_id: Optional[str] = None) -> RubricPlan:
+        """
+        Plan for rubric_id, falling back to the default rubric (and then to the
+        built-in default weights) when it is missing or invalid.
+        """
+        if rubric_id and ObjectId.is_valid(rubric_id):
+            plan = await self._get(db, str(rubric_id), {"_id": ObjectId(rubric_id)})
+            if plan is not None:
+                return plan
+        elif rubric_id:
+            logger.warning(f"Invalid rubric_id provided: {rubric_id}")
+
+        plan = await self._get(db, self._DEFAULT_KEY, {"is_default": True})
+        return plan or DEFAULT_PLAN
+
+    async def _get(self, db: AsyncIOMotorDatabase, key: str, query: dict) -> Optional[RubricPlan]:
+        plan = self._plans.get(key)
+        if plan:
+            current = await db["rubrics"].find_one(query, {"updated_at": 1})
+            if current and str(current["_id"]) == plan.rubric_id and current.get("updated_at") == plan.version:
+                record_cache_lookup("rubric_plan", hit=True)
+                return plan
+
+        record_cache_lookup("rubric_plan", hit=False)
+        rubric_doc = await db["rubrics"].find_one(query)
+        if not rubric_doc:
+            self._plans.pop(key, None)
+            return None
+
+        try:
+            plan = compile_rubric(Rubric(**rubric_doc))
+        except Exception as e:
+            logger.error(f"Failed to parse rubric: {e}")
+            return None
+
+        self._plans[key] = plan
+        return plan
+
+    def invalidate(self, rubric_id: Optional[str] = None) -> None:
+        """Drops a rubric's plan (and the default entry, which may alias it); all plans if None."""
+        if rubric_id is None:
+            self._plans.clear()
+            return
+        self._plans.pop(str(rubric_id), None)
+        self._plans.pop(self._DEFAULT_KEY, None)
+
+
+rubric_plan_cache = RubricPlanCache()
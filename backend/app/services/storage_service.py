@@ -1,6 +1,8 @@
 import os
+import hashlib
 import aiofiles
 import uuid
+from typing import BinaryIO, Optional, Tuple
 from fastapi import UploadFile
 from app.core.config import settings
 
@@ -10,17 +12,45 @@ class StorageService:
         if not os.path.exists(self.upload_dir):
             os.makedirs(self.upload_dir)
             
-    async def save_file(self, file: UploadFile) -> str:
+    async def save_file(self, file: UploadFile) -> Tuple[str, str]:
+        """Returns (path, SHA-256 hex digest of the content), hashed while writing."""
         file_extension = os.path.splitext(file.filename)[1]
         unique_filename = f"{uuid.uuid4()}{file_extension}"
         file_path = os.path.join(self.upload_dir, unique_filename)
+        digest = hashlib.sha256()
         
         async with aiofiles.open(file_path, 'wb') as out_file:
             while content := await file.read(1024*1024):  # Read file in chunks
+                digest.update(content)
                 await out_file.write(content)
                 
-        return file_path
+        return file_path, digest.hexdigest()
     
+    def save_stream(self, stream: BinaryIO, filename: str, max_bytes: Optional[int] = None) -> Tuple[str, int, str]:
+        """
+        Copies a file-like object (an upload or a ZIP entry) to storage in chunks.
+        Returns (path, size, SHA-256 hex digest). Raises ValueError, leaving
+        nothing behind, past max_bytes.
+        """
+        file_extension = os.path.splitext(filename)[1]
+        file_path = os.path.join(self.upload_dir, f"{uuid.uuid4()}{file_extension}")
+
+        size = 0
+        digest = hashlib.sha256()
+        try:
+            with open(file_path, 'wb') as out_file:
+                while content := stream.read(1024*1024):
+                    size += len(content)
+                    if max_bytes is not None and size > max_bytes:
+                        raise ValueError(f"File exceeds {max_bytes} bytes")
+                    digest.update(content)
+                    out_file.write(content)
+        except BaseException:
+            self.delete_file(file_path)
+            raise
+
+        return file_path, size, digest.hexdigest()
+
     def delete_file(self, file_path: str):
         if os.path.exists(file_path):
             os.remove(file_path)
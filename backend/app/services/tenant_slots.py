@@ -0,0 +1,99 @@
+"""
+Per-tenant concurrency caps for evaluations, enforced in Redis.
+
+Each tenant (institution, or the uploading user when there is none) has a
+sorted set of leases: member = task id, score = lease expiry. A worker must
+hold a lease to evaluate; when the tenant is at its cap the task is deferred
+and re-enqueued under the same task id, with a backoff bounded by the
+tenant's earliest lease expiry, so one tenant flooding the queues cannot take
+every worker slot or the whole Gemini budget. Leases expire on their own if a worker dies
+without releasing them.
+"""
+
+import time
+import logging
+from typing import Any, Dict, Optional
+
+from app.core.config import settings
+from app.db.redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+# KEYS[1] = tenant set; ARGV = now, lease expiry, cap, member
+_ACQUIRE_SCRIPT = """
+redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', ARGV[1])
+if redis.call('ZSCORE', KEYS[1], ARGV[4]) then
+    redis.call('ZADD', KEYS[1], ARGV[2], ARGV[4])
+    return 1
+end
+if redis.call('ZCARD', KEYS[1]) < tonumber(ARGV[3]) then
+    redis.call('ZADD', KEYS[1], ARGV[2], ARGV[4])
+    redis.call('EXPIRE', KEYS[1], math.ceil(ARGV[2] - ARGV[1]))
+    return 1
+end
+return 0
+"""
+
+
+def tenant_key(doc: Dict[str, Any]) -> str:
+    """Tenant of a document: its institution, else the uploading user."""
+    if doc.get("institution_id"):
+        return f"institution:{doc['institution_id']}"
+    return f"user:{doc.get('uploaded_by')}"
+
+
+def _slots_key(tenant: str) -> str:
+    return f"tenant_slots:{tenant}"
+
+
+class TenantSlots:
+    # Longer than any single evaluation; expired leases are reclaimed on acquire
+    LEASE_SECONDS = 15 * 60
+
+    def __init__(self):
+        self._script = None
+
+    def acquire(self, tenant: str, task_id: str) -> bool:
+        """Takes a slot for task_id (idempotent). True when the tenant is under its cap."""
+        cap = settings.TENANT_MAX_INFLIGHT_EVALUATIONS
+        if cap <= 0:
+            return True
+        try:
+            if self._script is None:
+                self._script = get_redis().register_script(_ACQUIRE_SCRIPT)
+            now = time.time()
+            return bool(self._script(
+                keys=[_slots_key(tenant)], args=[now, now + self.LEASE_SECONDS, cap, task_id]
+            ))
+        except Exception as e:
+            # Fail open: fairness is not worth stalling evaluations when Redis hiccups
+            logger.warning(f"Tenant slot check failed for {tenant}: {e}")
+            return True
+
+    def release(self, tenant: str, task_id: str) -> None:
+        if settings.TENANT_MAX_INFLIGHT_EVALUATIONS <= 0:
+            return
+        try:
+            get_redis().zrem(_slots_key(tenant), task_id)
+        except Exception as e:
+            logger.warning(f"Could not release tenant slot for {tenant}: {e}")
+
+    def seconds_until_free(self, tenant: str) -> Optional[float]:
+        """Seconds until the tenant's earliest lease expires, when a slot is free at the latest."""
+        try:
+            earliest = get_redis().zrange(_slots_key(tenant), 0, 0, withscores=True)
+        except Exception as e:
+            logger.warning(f"Could not read tenant leases for {tenant}: {e}")
+            return None
+        if not earliest:
+            return None
+        return max(0.0, earliest[0][1] - time.time())
+
+    def in_flight(self, tenant: str) -> int:
+        key = _slots_key(tenant)
+        client = get_redis()
+        client.zremrangebyscore(key, "-inf", time.time())
+        return client.zcard(key)
+
+
+tenant_slots = TenantSlots()
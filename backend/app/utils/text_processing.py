@@ -0,0 +1,249 @@
+import re
+from bisect import bisect_right
+from typing import Dict, Any, Iterable, List, Optional
+
+# Word tokens, keeping internal apostrophes ("don't", "students’") together
+WORD_RE = re.compile(r"\w+(?:['’]\w+)*")
+
+# Marks the end of a phrase inside the token trie
+_PHRASE_END = None
+
+
+class PhraseMatcher:
+    """
+    Finds multi-word phrases from a fixed lexicon in a single left-to-right pass.
+
+    Phrases are compiled into a token trie, so each word position only walks as
+    deep as the longest phrase starting there. Cost grows with the text length,
+    not with the size of the lexicon. Matching is case-insensitive, respects
+    word boundaries ("finally" does not match inside "finality") and returns the
+    leftmost-longest, non-overlapping matches with offsets into the original text.
+
+    Words of a phrase must be separated by whitespace in the text. With
+    `hyphenated`, a single hyphen also separates them, so the phrase
+    "fast-paced" matches "fast-paced" (the AI-marker lexicon). The transition
+    lexicon leaves it off, so transition matching stays whitespace-only.
+    """
+
+    def __init__(self, phrases: Iterable[str], hyphenated: bool = False):
+        self.hyphenated = hyphenated
+        self._trie: Dict[Any, Any] = {}
+        self.size = 0
+        for phrase in phrases:
+            tokens = [t.lower() for t in WORD_RE.findall(phrase)]
+            if not tokens:
+                continue
+            node = self._trie
+            for token in tokens:
+                node = node.setdefault(token, {})
+            if _PHRASE_END not in node:
+                self.size += 1
+            node[_PHRASE_END] = " ".join(tokens)
+
+    def find_all(self, text: str) -> List[Dict[str, Any]]:
+        """
+        Returns every phrase occurrence as {"phrase", "offset", "length"}.
+        """
+        if not text or not self._trie:
+            return []
+
+        tokens = [(m.start(), m.end(), m.group().lower()) for m in WORD_RE.finditer(text)]
+        matches = []
+        i = 0
+        n = len(tokens)
+        while i < n:
+            node = self._trie
+            best = None
+            j = i
+            while j < n:
+                start, end, word = tokens[j]
+                # Words of a phrase may only be separated by whitespace (or a hyphen)
+                if j > i:
+                    gap = text[tokens[j - 1][1]:start]
+                    if not gap.isspace() and not (self.hyphenated and gap == "-"):
+                        break
+                node = node.get(word)
+                if node is None:
+                    break
+                if _PHRASE_END in node:
+                    best = (j, node[_PHRASE_END])
+                j += 1
+
+            if best is None:
+                i += 1
+                continue
+
+            last, phrase = best
+            offset = tokens[i][0]
+            matches.append({
+                "phrase": phrase,
+                "offset": offset,
+                "length": tokens[last][1] - offset,
+            })
+            i = last + 1
+
+        return matches
+
+    def count(self, text: str) -> int:
+        return len(self.find_all(text))
+
+
+def load_phrase_list(path: str) -> List[str]:
+    """
+    Reads a lexicon file: one phrase per line, '#' starts a comment.
+    """
+    phrases = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.split("#", 1)[0].strip()
+            if line:
+                phrases.append(line)
+    return phrases
+
+
+# ═══════════════════════════════════════════════════════════════════
+# STRUCTURAL MAP
+# ═══════════════════════════════════════════════════════════════════
+STRUCTURE_VERSION = 1
+
+# Sentence terminators (with closing quotes/brackets) followed by whitespace or the end
+_SENTENCE_END = re.compile(r"[.!?]+[\"'”’)\]]*(?=\s|$)")
+# Words whose trailing period does not end a sentence
+_ABBREVIATIONS = frozenset({
+    "mr", "mrs", "ms", "dr", "prof", "sr", "jr", "st", "vs", "etc", "e.g", "i.e",
+    "cf", "al", "fig", "no", "vol", "pp", "approx", "ch", "sec", "eq",
+})
+# "2.1 Methods", "3. Results"
+_NUMBERED_HEADING = re.compile(r"(\d+(?:\.\d+)*)\.?\s+\S")
+HEADING_MAX_WORDS = 12
+
+
+def _ends_sentence(text: str, start: int, match: re.Match) -> bool:
+    if match.group().rstrip("\"'”’)]") != ".":
+        return True
+    words = text[max(start, match.start() - 16):match.start()].split()
+    word = words[-1].lstrip("([\"'“‘").lower() if words else ""
+    # Numbering ("1. Introduction") is not a sentence of its own
+    if word.replace(".", "").isdigit() and text[start:match.start()].strip() == words[-1]:
+        return False
+    # Initials ("J. Smith") and abbreviations
+    return not (len(word) == 1 and word.isalpha()) and word not in _ABBREVIATIONS
+
+
+def _heading_level(paragraph: str) -> Optional[int]:
+    """Level of a paragraph that looks like a heading (short single line, no final punctuation), else None."""
+    paragraph = paragraph.strip()
+    if "\n" in paragraph or paragraph[-1] in ".!?,;:" or len(paragraph.split()) > HEADING_MAX_WORDS:
+        return None
+    numbered = _NUMBERED_HEADING.match(paragraph)
+    if numbered:
+        return numbered.group(1).count(".") + 1
+    first = next((c for c in paragraph if c.isalpha()), "")
+    return 1 if first.isupper() else None
+
+
+def build_structure(
+    text: str,
+    page_starts: Optional[List[int]] = None,
+    headings: Optional[Dict[str, int]] = None,
+) -> Dict[str, Any]:
+    """
+    Structural map of cleaned text (see DocumentParser._clean_text), stored
+    with it so consumers look spans up by offset instead of re-scanning:
+
+    - "paragraphs" / "sentences": {"starts": [...], "ends": [...]}, parallel
+      offset arrays in text order. Paragraphs are the blocks between blank
+      lines, as the analyzers split them; sentences never cross them.
+    - "headings": [{"paragraph": index, "level": n}]. `headings` maps known
+      heading texts to levels (e.g. from DOCX styles); without it, short
+      single-line paragraphs without final punctuation count as headings.
+    - "pages": start offset of each page, when page_starts is given (PDFs).
+    """
+    para_starts, para_ends = [], []
+    sent_starts, sent_ends = [], []
+    heading_list = []
+
+    length = len(text)
+    start = 0
+    while start < length:
+        end = text.find("\n\n", start)
+        if end == -1:
+            end = length
+        paragraph = text[start:end]
+        if paragraph.strip():
+            index = len(para_starts)
+            para_starts.append(start)
+            para_ends.append(end)
+
+            if headings is not None:
+                level = headings.get(paragraph)
+            else:
+                level = _heading_level(paragraph) if index or end < length else None
+            if level is not None:
+                heading_list.append({"paragraph": index, "level": level})
+
+            sentence = start
+            for match in _SENTENCE_END.finditer(text, start, end):
+                if not _ends_sentence(text, sentence, match):
+                    continue
+                sent_starts.append(sentence)
+                sent_ends.append(match.end())
+                sentence = match.end()
+                while sentence < end and text[sentence].isspace():
+                    sentence += 1
+            if sentence < end:
+                sent_starts.append(sentence)
+                sent_ends.append(end)
+        start = end + 2
+
+    structure = {
+        "version": STRUCTURE_VERSION,
+        "paragraphs": {"starts": para_starts, "ends": para_ends},
+        "sentences": {"starts": sent_starts, "ends": sent_ends},
+        "headings": heading_list,
+    }
+    if page_starts is not None:
+        structure["pages"] = list(page_starts)
+    return structure
+
+
+def _span_at(spans: Dict[str, List[int]], offset: int) -> Optional[int]:
+    index = bisect_right(spans["starts"], offset) - 1
+    if index < 0 or offset >= spans["ends"][index]:
+        return None
+    return index
+
+
+def paragraph_at(structure: Dict[str, Any], offset: int) -> Optional[int]:
+    """Index of the paragraph containing text offset, or None (e.g. between paragraphs)."""
+    return _span_at(structure["paragraphs"], offset)
+
+
+def sentence_at(structure: Dict[str, Any], offset: int) -> Optional[int]:
+    """Index of the sentence containing text offset, or None."""
+    return _span_at(structure["sentences"], offset)
+
+
+def page_at(structure: Dict[str, Any], offset: int) -> Optional[int]:
+    """0-based page of text offset, or None without page information."""
+    pages = structure.get("pages")
+    if not pages:
+        return None
+    return max(0, bisect_right(pages, offset) - 1)
+
+
+def locate(structure: Dict[str, Any], offset: int) -> Dict[str, Optional[int]]:
+    """Paragraph, sentence and (PDFs) page of text offset, for highlights."""
+    location = {
+        "paragraph": paragraph_at(structure, offset),
+        "sentence": sentence_at(structure, offset),
+    }
+    if structure.get("pages"):
+        location["page"] = page_at(structure, offset)
+    return location
+
+
+def paragraph_texts(text: str, structure: Dict[str, Any]) -> List[str]:
+    """Paragraph texts, stripped like the analyzers' own blank-line split."""
+    spans = structure["paragraphs"]
+    return [text[start:end].strip() for start, end in zip(spans["starts"], spans["ends"])]
@@ -1,5 +1,42 @@
+import os
+import time
+import logging
+
 from celery import Celery
+from kombu import Queue
+from celery.signals import (
+    before_task_publish,
+    task_prerun,
+    worker_init,
+    worker_process_init,
+    worker_process_shutdown,
+    worker_shutdown,
+)
 from app.core.config import settings
+from app.core.metrics import QUEUE_WAIT, get_registry
+from app.workers.utils import worker_resources
+
+logger = logging.getLogger(__name__)
+
+# CPU-bound work (parsing, bulk rescoring) runs on prefork processes; LLM-bound
+# evaluation waits on Gemini and runs on a high-concurrency thread pool, so a
+# slow model call never holds a CPU slot. See docker-compose.yml for the pools.
+CPU_QUEUE = "cpu"
+LLM_QUEUE = "llm"
+
+# Broker priorities (Redis: lower is served first). Interactive work, e.g. a
+# teacher re-evaluating one essay, overtakes queued class uploads and backfills.
+PRIORITIES = {
+    "interactive": 0,
+    "normal": 3,
+    "bulk": 9,
+}
+
+
+def task_priority(level: str) -> int:
+    """Broker priority for a priority level name; unknown names get "normal"."""
+    return PRIORITIES.get(level, PRIORITIES["normal"])
+
 
 celery_app = Celery(
     "worker",
@@ -13,10 +50,115 @@ celery_app.conf.update(
     result_serializer="json",
     timezone="UTC",
     enable_utc=True,
+    # A worker started without -Q consumes both queues (local development)
+    task_queues=(Queue(CPU_QUEUE), Queue(LLM_QUEUE)),
+    task_default_queue=CPU_QUEUE,
     task_routes={
-        "app.workers.tasks.*": {"queue": "main-queue"},
+        "process_uploaded_document": {"queue": CPU_QUEUE},
+        "rescore_rubric_evaluations": {"queue": CPU_QUEUE},
+        "release_deferred_documents": {"queue": CPU_QUEUE},
+        "evaluate_document_task": {"queue": LLM_QUEUE},
+    },
+    # Priorities: the Redis transport keeps one list per priority step and
+    # always drains the highest one first
+    broker_transport_options={
+        "priority_steps": sorted(PRIORITIES.values()),
+        "sep": ":",
+        "queue_order_strategy": "priority",
+    },
+    task_default_priority=PRIORITIES["normal"],
+    # Reserve one message per slot and ack after completion, so a newly queued
+    # interactive task is not stuck behind bulk tasks already prefetched by a worker
+    worker_prefetch_multiplier=1,
+    task_acks_late=True,
+    beat_schedule={
+        # Admission control: enqueue uploads deferred while the pipeline was full
+        "release-deferred-documents": {
+            "task": "release_deferred_documents",
+            "schedule": 30.0,
+            "options": {"priority": PRIORITIES["interactive"]},
+        },
     },
 )
 
+
+@before_task_publish.connect
+def _stamp_enqueued_at(headers=None, **kwargs):
+    """Records publish time so workers can measure queue wait."""
+    if headers is not None:
+        headers.setdefault("enqueued_at", time.time())
+
+
+@task_prerun.connect
+def _observe_queue_wait(task=None, **kwargs):
+    request = task.request
+    enqueued_at = getattr(request, "enqueued_at", None)
+    if enqueued_at is None:
+        enqueued_at = (getattr(request, "headers", None) or {}).get("enqueued_at")
+    # Retries are re-published, so this measures the wait of the current attempt
+    if enqueued_at:
+        QUEUE_WAIT.labels(task.name).observe(max(0.0, time.time() - float(enqueued_at)))
+
+
+@worker_init.connect
+def _start_metrics_server(**kwargs):
+    if settings.WORKER_METRICS_PORT <= 0:
+        return
+    from prometheus_client import start_http_server
+
+    start_http_server(settings.WORKER_METRICS_PORT, registry=get_registry())
+    logger.info(f"Worker metrics exposed on port {settings.WORKER_METRICS_PORT}")
+
+
+def _uses_prefork(worker) -> bool:
+    # --pool arrives as a name ("threads") or, once resolved, as the pool class
+    pool_cls = getattr(worker, "pool_cls", None) or celery_app.conf.worker_pool
+    name = pool_cls if isinstance(pool_cls, str) else pool_cls.__module__
+    return "prefork" in name
+
+
+@worker_process_init.connect
+def _init_worker_resources(**kwargs):
+    """One event loop and pooled Mongo clients per pool process, reused by every task."""
+    worker_resources.start()
+
+
+@worker_init.connect
+def _init_thread_pool_resources(sender=None, **kwargs):
+    """
+    The threads and solo pools run tasks in the main process, where the
+    worker_process_* signals never fire: set up (and later close) there.
+    Prefork parents do not run tasks and must not fork with open clients.
+    """
+    if sender is not None and not _uses_prefork(sender):
+        worker_resources.start()
+
+
+def _close_process_resources():
+    worker_resources.shutdown()
+    from app.services.document_parser import close_extraction_pool
+
+    close_extraction_pool()
+
+
+@worker_process_shutdown.connect
+def _close_worker_resources(**kwargs):
+    _close_process_resources()
+
+
+@worker_shutdown.connect
+def _close_thread_pool_resources(**kwargs):
+    # No-op in a prefork parent: resources are only closed by the process that created them
+    _close_process_resources()
+
+
+@worker_process_shutdown.connect
+def _mark_metrics_process_dead(pid=None, **kwargs):
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+
+        multiprocess.mark_process_dead(pid or os.getpid())
+
+
 # Auto-discover tasks
-celery_app.autodiscover_tasks(["app.workers.tasks"])
\ No newline at end of file
+celery_app.autodiscover_tasks(["app.workers.tasks"])
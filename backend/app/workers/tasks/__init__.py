@@ -1,2 +1,4 @@
 from . import document_tasks
 from . import evaluation_tasks
+from . import batch_tasks
+from . import admission_tasks
@@ -0,0 +1,80 @@
+from celery import shared_task
+from datetime import datetime
+import logging
+
+from app.services.admission import DEFERRED_STATUS, evaluate_admission, in_flight_filter, queue_backlog
+from app.services.progress import publish_progress
+from app.workers.tasks.document_tasks import submit_document_pipeline
+from app.workers.utils import get_sync_db
+
+logger = logging.getLogger(__name__)
+
+# Deferred documents considered per run (oldest first)
+RELEASE_SCAN_LIMIT = 500
+
+
+def _in_flight_counts(collection, field: str, values) -> dict:
+    values = [v for v in values if v]
+    if not values:
+        return {}
+    pipeline = [
+        {"$match": in_flight_filter(**{field: {"$in": values}})},
+        {"$group": {"_id": f"${field}", "count": {"$sum": 1}}},
+    ]
+    return {row["_id"]: row["count"] for row in collection.aggregate(pipeline)}
+
+
+@shared_task(name="release_deferred_documents")
+def release_deferred_documents():
+    """
+    Beat task: enqueues deferred uploads, oldest first, while admission
+    control has room for them (see app.services.admission).
+    """
+    collection = get_sync_db()["documents"]
+    deferred = list(
+        collection.find(
+            {"status": DEFERRED_STATUS},
+            {"uploaded_by": 1, "institution_id": 1, "priority": 1},
+        ).sort("created_at", 1).limit(RELEASE_SCAN_LIMIT)
+    )
+    if not deferred:
+        return {"released": 0}
+
+    backlog = queue_backlog()
+    users = _in_flight_counts(collection, "uploaded_by", {d.get("uploaded_by") for d in deferred})
+    institutions = _in_flight_counts(collection, "institution_id", {d.get("institution_id") for d in deferred})
+
+    released = 0
+    for doc in deferred:
+        user_id, institution_id = doc.get("uploaded_by"), doc.get("institution_id")
+        admission = evaluate_admission(
+            backlog,
+            users.get(user_id, 0),
+            institutions.get(institution_id, 0) if institution_id else None,
+        )
+        if not admission.admits():
+            if admission.limit == "queue":
+                break  # Nothing else fits either
+            continue  # This uploader or institution is full; others may not be
+
+        # Conditional update: a document is only ever released once
+        result = collection.update_one(
+            {"_id": doc["_id"], "status": DEFERRED_STATUS},
+            {"$set": {"status": "pending", "updated_at": datetime.utcnow()}},
+        )
+        if not result.modified_count:
+            continue
+        document_id = str(doc["_id"])
+        publish_progress(document_id, "pending")
+        submit_document_pipeline(document_id, priority=doc.get("priority", "normal"))
+
+        # Each release adds two messages over its life but only one waits at a time
+        backlog += 1
+        users[user_id] = users.get(user_id, 0) + 1
+        if institution_id:
+            institutions[institution_id] = institutions.get(institution_id, 0) + 1
+        released += 1
+
+    if released:
+        logger.info(f"Released {released} deferred document(s) into the pipeline.")
+    return {"released": released}
@@ -0,0 +1,107 @@
+from celery import shared_task
+from pymongo import UpdateOne
+from bson.objectid import ObjectId
+from datetime import datetime
+import logging
+
+from app.services.evaluation_orchestrator import evaluation_orchestrator
+from app.services.rubric_plans import RubricPlan, compile_rubric, rubric_plan_cache
+from app.models.rubric import Rubric
+from app.workers.utils import get_sync_db
+
+logger = logging.getLogger(__name__)
+
+# Documents per find/bulk_write round trip
+RESCORE_BATCH_SIZE = 500
+
+
+def _rubric_document_filter(rubric_id: str, is_default: bool) -> dict:
+    """Documents graded with this rubric (the default also covers documents without one)."""
+    if is_default:
+        return {"rubric_id": {"$in": [rubric_id, None, ""]}}
+    return {"rubric_id": rubric_id}
+
+
+def _rescore_batch(eval_collection, doc_collection, document_ids, plan: RubricPlan) -> dict:
+    now = datetime.utcnow()
+    eval_ops, doc_ops = [], []
+    skipped = 0
+
+    cursor = eval_collection.find(
+        {"document_id": {"$in": document_ids}},
+        {"document_id": 1, "components": 1, "status": 1, "finalized_by": 1},
+    )
+    for evaluation in cursor:
+        # Grades a teacher finalized by hand are never overwritten
+        if evaluation.get("status") == "finalized" and evaluation.get("finalized_by") != "system":
+            skipped += 1
+            continue
+
+        try:
+            score_breakdown, final_score, grade = evaluation_orchestrator.rescore(
+                evaluation.get("components") or {}, plan
+            )
+        except (KeyError, TypeError) as e:
+            logger.warning(f"Cannot rescore evaluation for document {evaluation['document_id']}: {e}")
+            skipped += 1
+            continue
+
+        eval_ops.append(UpdateOne(
+            {"_id": evaluation["_id"]},
+            {"$set": {
+                "score_breakdown": score_breakdown,
+                "final_score": final_score,
+                "grade": grade,
+                "rubric_used": plan.name,
+                "rescored_at": now,
+            }},
+        ))
+        doc_ops.append(UpdateOne(
+            {"_id": ObjectId(evaluation["document_id"])},
+            {"$set": {"final_score": final_score, "updated_at": now}},
+        ))
+
+    if eval_ops:
+        eval_collection.bulk_write(eval_ops, ordered=False)
+        doc_collection.bulk_write(doc_ops, ordered=False)
+    return {"rescored": len(eval_ops), "skipped": skipped}
+
+
+@shared_task(name="rescore_rubric_evaluations")
+def rescore_rubric_evaluations(rubric_id: str):
+    """
+    Recomputes score breakdown, penalties, final score and grade for every
+    evaluation graded with a rubric, from the stored component scores.
+    Runs after rubric edits; makes no LLM calls.
+    """
+    logger.info(f"Rescoring evaluations for rubric: {rubric_id}")
+
+    db = get_sync_db()
+    doc_collection = db["documents"]
+    eval_collection = db["evaluations"]
+
+    rubric_doc = db["rubrics"].find_one({"_id": ObjectId(rubric_id)})
+    if not rubric_doc:
+        logger.error(f"Rubric {rubric_id} not found.")
+        return {"rescored": 0, "skipped": 0}
+    rubric_plan_cache.invalidate(rubric_id)
+    plan = compile_rubric(Rubric(**rubric_doc))
+
+    totals = {"rescored": 0, "skipped": 0}
+    batch = []
+    doc_filter = _rubric_document_filter(rubric_id, bool(rubric_doc.get("is_default")))
+    for doc in doc_collection.find(doc_filter, {"_id": 1}):
+        batch.append(str(doc["_id"]))
+        if len(batch) >= RESCORE_BATCH_SIZE:
+            counts = _rescore_batch(eval_collection, doc_collection, batch, plan)
+            totals = {k: totals[k] + counts[k] for k in totals}
+            batch = []
+    if batch:
+        counts = _rescore_batch(eval_collection, doc_collection, batch, plan)
+        totals = {k: totals[k] + counts[k] for k in totals}
+
+    logger.info(
+        f"Rescored {totals['rescored']} evaluations for rubric {rubric_id} "
+        f"({totals['skipped']} skipped)."
+    )
+    return totals
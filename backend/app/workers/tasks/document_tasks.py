@@ -1,29 +1,40 @@
-from celery import shared_task
-from pymongo import MongoClient
+from celery import shared_task, chain, group
+from celery.exceptions import Ignore
 from bson.objectid import ObjectId
 from datetime import datetime
 import logging
 import os
+from typing import List
+from uuid import uuid4
 
 from app.core.config import settings
+from app.core.metrics import stage_timer
 from app.services.document_parser import document_parser
 from app.ai.plagiarism_detector import plagiarism_detector
 # Avoid circular imports by importing inside function or if we are sure no cycle exists
 # Importing here for now
 from app.workers.tasks.evaluation_tasks import evaluate_document_task
+from app.workers.utils import get_sync_db
+from app.workers.celery_app import task_priority
+from app.services.progress import publish_progress
+from app.services.queue_monitor import record_completion
+from app.services.evaluation_dedup import claim_enqueue, clear_enqueue
+from app.services.parse_cache import get_parsed, store_parsed
 
 logger = logging.getLogger(__name__)
 
-@shared_task(name="process_uploaded_document")
+
+@shared_task(name="process_uploaded_document", soft_time_limit=settings.PARSE_SOFT_TIME_LIMIT_SECONDS)
 def process_uploaded_document(document_id: str):
     """
     Background task to parse the uploaded document and extract text/metadata.
+    Content parsed before (same SHA-256) is taken from the parse cache.
     """
     logger.info(f"Starting processing for document: {document_id}")
+    timings = {}
     
-    # Connect to MongoDB (Synchronous)
-    client = MongoClient(settings.MONGODB_URL)
-    db = client[settings.MONGODB_DATABASE]
+    # MongoDB (Synchronous, pooled per worker process)
+    db = get_sync_db()
     collection = db["documents"]
     
     try:
@@ -31,21 +42,27 @@ def process_uploaded_document(document_id: str):
         doc = collection.find_one({"_id": ObjectId(document_id)})
         if not doc:
             logger.error(f"Document {document_id} not found.")
-            return
+            # Stops the chain: nothing to evaluate
+            clear_enqueue(document_id)
+            raise Ignore()
 
-        # 2. Update status to processing
-        collection.update_one(
-            {"_id": ObjectId(document_id)},
-            {"$set": {"status": "processing", "updated_at": datetime.utcnow()}}
-        )
+        # 2. Report processing (Redis only; the document is written once parsing ends)
+        publish_progress(document_id, "processing")
         
         # 3. Parse Document
         file_path = doc.get("storage_path")
         if not file_path or not os.path.exists(file_path):
              raise ValueError(f"File not found at path: {file_path}")
              
-        # Actual parsing logic
-        parsed_data = document_parser.parse_file(file_path)
+        # Actual parsing logic, unless these exact bytes were parsed before
+        content_hash = doc.get("content_hash")
+        with stage_timer("parse", timings):
+            parsed_data = get_parsed(db, content_hash) if content_hash else None
+            cached = parsed_data is not None
+            if not cached:
+                parsed_data = document_parser.parse_file(file_path)
+        if content_hash and not cached:
+            store_parsed(db, content_hash, parsed_data)
         
         # 4. Add to Plagiarism Corpus
         # REMOVED: Redundant and incorrect call. 
@@ -58,6 +75,8 @@ def process_uploaded_document(document_id: str):
             "extracted_text": parsed_data["extracted_text"],
             "word_count": parsed_data["word_count"],
             "page_count": parsed_data["page_count"],
+            "structure": parsed_data.get("structure"),
+            "processing_timings_ms": timings,
             "status": "completed",
             "updated_at": datetime.utcnow()
         }
@@ -66,11 +85,13 @@ def process_uploaded_document(document_id: str):
             {"_id": ObjectId(document_id)},
             {"$set": update_data}
         )
-        logger.info(f"Document {document_id} processed successfully.")
-        
-        # 6. Trigger Evaluation Task
-        evaluate_document_task.delay(document_id)
+        publish_progress(document_id, "completed")
+        record_completion("parse", timings["parse"] / 1000)
+        logger.info(f"Document {document_id} processed successfully{' (cached parse)' if cached else ''}.")
+        # 6. Evaluation runs next in the chain (see submit_document_pipeline)
 
+    except Ignore:
+        raise
     except Exception as e:
         logger.error(f"Error processing document {document_id}: {str(e)}")
         collection.update_one(
@@ -81,5 +102,37 @@ def process_uploaded_document(document_id: str):
                 "updated_at": datetime.utcnow()
             }}
         )
-    finally:
-        client.close()
+        publish_progress(document_id, "failed", error_message=str(e))
+        # Failed parse: skip the evaluation step of the chain
+        clear_enqueue(document_id)
+        raise Ignore()
+
+
+def _document_pipeline(document_id: str, priority: str):
+    """Parse-then-evaluate chain for one document, with its evaluation marked as queued."""
+    options = {"priority": task_priority(priority)}
+    evaluation_task_id = str(uuid4())
+    claim_enqueue(document_id, evaluation_task_id)
+    return chain(
+        process_uploaded_document.si(document_id).set(**options),
+        evaluate_document_task.si(document_id).set(task_id=evaluation_task_id, **options),
+    )
+
+
+def submit_document_pipeline(document_id: str, priority: str = "normal"):
+    """
+    Parses the document on the cpu queue, then evaluates it on the llm queue.
+    The evaluation step only runs if parsing succeeded. `priority` is a level
+    name from PRIORITIES ("interactive", "normal", "bulk").
+    The evaluation is marked as queued so manual triggers coalesce into it.
+    """
+    return _document_pipeline(document_id, priority).apply_async()
+
+
+def submit_batch_pipeline(document_ids: List[str], priority: str = "bulk"):
+    """
+    Fans out the pipelines of a batch as one Celery group (published together,
+    bulk priority by default so interactive work stays ahead). Returns the
+    GroupResult; aggregate progress is read from the documents' statuses.
+    """
+    return group(_document_pipeline(document_id, priority) for document_id in document_ids).apply_async()
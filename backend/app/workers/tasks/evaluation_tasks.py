@@ -1,93 +1,235 @@
 from celery import shared_task
-from pymongo import MongoClient
-from motor.motor_asyncio import AsyncIOMotorClient
+from celery.exceptions import Ignore
+from motor.motor_asyncio import AsyncIOMotorDatabase
 from bson.objectid import ObjectId
 from datetime import datetime
 import logging
 import asyncio
+import random
+import time
 
 from app.core.config import settings
+from app.core.metrics import stage_timer, TASK_RETRIES
+from app.ai.llm_errors import LLMError, LLMRateLimitError, LLMResponseError
 from app.services.evaluation_orchestrator import evaluation_orchestrator
 from app.ai.plagiarism_detector import plagiarism_detector
+from app.ai.topic_relevance import topic_relevance_analyzer
+from app.services.rubric_plans import RubricPlan, rubric_plan_cache
+from app.services import evaluation_dedup
+from app.services.checkpoints import StageCheckpoints
 from app.models.evaluation import Evaluation
-from app.models.rubric import Rubric
+from app.services.progress import publish_progress, publish_progress_async
+from app.services.queue_monitor import record_completion
+from app.services.tenant_slots import tenant_key, tenant_slots
+from app.workers.utils import get_async_db, get_sync_db, run_async
 
 logger = logging.getLogger(__name__)
 
+# Bounds evaluations in flight on the worker event loop, whatever the pool
+# concurrency; Gemini requests are additionally paced by app.ai.rate_limiter.
+_evaluation_slots = asyncio.Semaphore(settings.MAX_INFLIGHT_EVALUATIONS)
+
+# Delay before a task deferred by its tenant's cap is redelivered: doubles with
+# each deferral of the same task, up to the cap (plus jitter)
+TENANT_DEFER_SECONDS = 10
+TENANT_DEFER_MAX_SECONDS = 300
+
+# Retries of a Gemini rate limit or outage before the evaluation fails for good
+LLM_MAX_RETRIES = 10
+# Retries when every model answered unusably (invalid or truncated JSON, missing
+# keys, rejected request): a resample sometimes succeeds, a bad request never does
+LLM_RESPONSE_MAX_RETRIES = 2
+
+
+def _retry_countdown(retries: int, retry_after: float = None) -> float:
+    """
+    Delay before retrying an LLM failure: the provider's predicted quota reset
+    (if any) plus exponential backoff with full jitter, so tasks that failed
+    together do not all wake up together when the quota resets.
+    """
+    backoff = min(settings.LLM_RETRY_MAX_SECONDS, settings.LLM_RETRY_BASE_SECONDS * 2 ** retries)
+    return max(1.0, (retry_after or 0.0) + random.uniform(0, backoff))
+
+
+def _tenant_defer_countdown(deferrals: int, until_slot_free: float = None) -> float:
+    """
+    Delay before a task over its tenant's cap runs again: exponential backoff
+    with jitter, but never past the tenant's earliest lease expiry, when a
+    slot is free at the latest.
+    """
+    backoff = min(TENANT_DEFER_MAX_SECONDS, TENANT_DEFER_SECONDS * 2 ** deferrals)
+    countdown = random.uniform(backoff / 2, backoff)
+    if until_slot_free is not None:
+        countdown = min(countdown, until_slot_free + 1.0)
+    return max(1.0, countdown)
 
-def _update_status(doc_collection, document_id: str, status: str):
-    """Helper to update document processing status in MongoDB."""
-    doc_collection.update_one(
-        {"_id": ObjectId(document_id)},
-        {"$set": {"status": status, "updated_at": datetime.utcnow()}},
-    )
+
+def _tenant_deferrals(request) -> int:
+    # Custom headers surface as request attributes (or under request.headers)
+    deferrals = getattr(request, "tenant_deferrals", None)
+    if deferrals is None:
+        deferrals = (getattr(request, "headers", None) or {}).get("tenant_deferrals")
+    return int(deferrals or 0)
 
 
 async def run_async_evaluation(
+    db: AsyncIOMotorDatabase,
     document_id: str,
     extracted_text: str,
     prompt: str = None,
     rubric_id: str = None,
     status_callback=None,
+    timings: dict = None,
+    rubric_plan: RubricPlan = None,
+    checkpoint_key: str = None,
+    structure: dict = None,
 ):
     """
     Async function to run the evaluation and persistence logic.
     status_callback is called with each stage name for progress tracking.
+    Stage durations are added to `timings` (milliseconds). The rubric plan
+    is looked up from rubric_id unless the caller already has it. With a
+    checkpoint_key, stage outputs are checkpointed and reused on retry.
+    `structure` is the parser's structural map of extracted_text, if stored.
     """
-    client = AsyncIOMotorClient(settings.MONGODB_URL)
-    db = client[settings.MONGODB_DATABASE]
+    if timings is None:
+        timings = {}
 
+    with stage_timer("slot_wait", timings):
+        await _evaluation_slots.acquire()
     try:
-        # Initialize Plagiarism Corpus
+        return await _evaluate(
+            db, document_id, extracted_text, prompt, rubric_id, status_callback, timings, rubric_plan,
+            checkpoint_key, structure,
+        )
+    finally:
+        _evaluation_slots.release()
+
+
+async def _evaluate(
+    db, document_id, extracted_text, prompt, rubric_id, status_callback, timings, rubric_plan, checkpoint_key,
+    structure,
+):
+    """Evaluation proper; runs while holding an evaluation slot."""
+    # Initialize Plagiarism Corpus
+    with stage_timer("corpus_load", timings):
         await plagiarism_detector.initialize(db)
+        await topic_relevance_analyzer.initialize(db)
 
-        # Fetch Rubric
-        rubric_doc = None
-        if rubric_id:
-            try:
-                rubric_doc = await db["rubrics"].find_one(
-                    {"_id": ObjectId(rubric_id)}
-                )
-            except Exception:
-                logger.warning(f"Invalid rubric_id provided: {rubric_id}")
-
-        if not rubric_doc:
-            rubric_doc = await db["rubrics"].find_one({"is_default": True})
-
-        rubric = None
-        if rubric_doc:
-            try:
-                rubric = Rubric(**rubric_doc)
-            except Exception as e:
-                logger.error(f"Failed to parse rubric: {e}")
-
-        # Run Analysis with progress callback
-        results = await evaluation_orchestrator.evaluate_document(
-            text=extracted_text,
-            document_id=document_id,
-            prompt=prompt,
-            rubric=rubric,
-            status_callback=status_callback,
-        )
+    # Compiled rubric plan (cached per worker, revalidated by updated_at)
+    if rubric_plan is None:
+        with stage_timer("rubric_fetch", timings):
+            rubric_plan = await rubric_plan_cache.get(db, rubric_id)
+
+    # Run Analysis with progress callback
+    results = await evaluation_orchestrator.evaluate_document(
+        text=extracted_text,
+        document_id=document_id,
+        prompt=prompt,
+        status_callback=status_callback,
+        rubric_plan=rubric_plan,
+        checkpoints=StageCheckpoints(db, checkpoint_key, document_id) if checkpoint_key else None,
+        structure=structure,
+    )
 
-        # Add to Plagiarism Corpus
+    # Add to Plagiarism Corpus and topic relevance IDF statistics
+    with stage_timer("corpus_update", timings):
         await plagiarism_detector.add_document(db, document_id, extracted_text)
+        await topic_relevance_analyzer.add_document(db, document_id, extracted_text)
 
-        return results
-    finally:
-        client.close()
+    return results
+
+
+def _restore_evaluated_status(doc_collection, document_id: str, evaluation: dict) -> None:
+    """Puts a document back to the terminal status of its existing evaluation."""
+    doc_status = "graded" if evaluation.get("status") == "finalized" else "evaluated"
+    doc_collection.update_one(
+        {"_id": ObjectId(document_id)},
+        {
+            "$set": {
+                "status": doc_status,
+                "final_score": evaluation.get("final_score"),
+                "updated_at": datetime.utcnow(),
+            }
+        },
+    )
+    publish_progress(
+        document_id, doc_status, final_score=evaluation.get("final_score"), grade=evaluation.get("grade"), reused=True
+    )
+
+
+def _duplicate_evaluation(db, doc: dict, rubric_plan: RubricPlan):
+    """
+    Evaluation of an earlier upload of the same file by the same user, with the
+    same prompt and rubric version, or None. Uploads by other users are never
+    matched: identical submissions from different students are for the
+    plagiarism check to flag, not to share a grade.
+    """
+    if not (settings.REUSE_DUPLICATE_EVALUATIONS and doc.get("content_hash")):
+        return None
+    earlier = db["documents"].find(
+        {
+            "content_hash": doc["content_hash"],
+            "uploaded_by": doc.get("uploaded_by"),
+            "rubric_id": doc.get("rubric_id"),
+            "prompt": doc.get("prompt"),
+            "status": {"$in": ["evaluated", "graded"]},
+            "_id": {"$ne": doc["_id"]},
+        },
+        {"_id": 1},
+    ).sort("updated_at", -1).limit(5)
+    for prior in earlier:
+        prior_id = str(prior["_id"])
+        # Its idempotency key matches only if the text and rubric version are the same
+        key = evaluation_dedup.idempotency_key(prior_id, doc["extracted_text"], rubric_plan)
+        evaluation = db["evaluations"].find_one({"document_id": prior_id, "idempotency_key": key})
+        if evaluation:
+            return evaluation
+    return None
+
+
+def _store_evaluation(eval_collection, doc_collection, document_id: str, eval_in: Evaluation, **progress) -> str:
+    """Saves the evaluation and moves the document to its terminal status, which it returns."""
+    with stage_timer("persist"):
+        eval_collection.replace_one(
+            {"document_id": document_id},
+            eval_in.model_dump(by_alias=True, exclude={"id"}),
+            upsert=True,
+        )
+
+    # If auto, it's 'graded' (done). If suggested, it's 'evaluated' (needs review).
+    doc_status = "graded" if eval_in.status == "finalized" else "evaluated"
+
+    # Always persist final_score on the document so analytics can aggregate it.
+    # The distinction between auto/suggested is tracked via status, not score presence.
+    doc_collection.update_one(
+        {"_id": ObjectId(document_id)},
+        {
+            "$set": {
+                "status": doc_status,
+                "final_score": eval_in.final_score,
+                "updated_at": datetime.utcnow(),
+            }
+        },
+    )
+    publish_progress(document_id, doc_status, final_score=eval_in.final_score, grade=eval_in.grade, **progress)
+    return doc_status
 
 
 @shared_task(name="evaluate_document_task", bind=True)
-def evaluate_document_task(self, document_id: str):
+def evaluate_document_task(self, document_id: str, force: bool = False):
     """
     Background task to evaluate a document's text.
-    Retries automatically if Gemini is rate-limited.
+    Retries automatically if Gemini is rate-limited. Reuses the stored
+    evaluation when the text and rubric version are unchanged, unless `force`,
+    and with REUSE_DUPLICATE_EVALUATIONS copies that of an identical earlier upload.
     """
     logger.info(f"Starting evaluation for document: {document_id}")
+    started = time.perf_counter()
+    timings = {}
 
-    client = MongoClient(settings.MONGODB_URL)
-    db = client[settings.MONGODB_DATABASE]
+    # Pooled per worker process (see app.workers.utils)
+    db = get_sync_db()
     doc_collection = db["documents"]
     eval_collection = db["evaluations"]
 
@@ -96,6 +238,7 @@ def evaluate_document_task(self, document_id: str):
         doc = doc_collection.find_one({"_id": ObjectId(document_id)})
         if not doc:
             logger.error(f"Document {document_id} not found.")
+            evaluation_dedup.clear_enqueue(document_id)
             return
 
         if not doc.get("extracted_text"):
@@ -104,96 +247,186 @@ def evaluate_document_task(self, document_id: str):
                 {"_id": ObjectId(document_id)},
                 {"$set": {"status": "failed", "error_message": "No text extracted"}},
             )
+            publish_progress(document_id, "failed", error_message="No text extracted")
+            evaluation_dedup.clear_enqueue(document_id)
             return
 
         rubric_id = doc.get("rubric_id")
         prompt = doc.get("prompt")  # Pass the actual prompt instead of None
 
-        # Create a status callback that writes to MongoDB
-        def status_callback(stage: str):
-            _update_status(doc_collection, document_id, stage)
+        # A duplicate of an evaluation already running elsewhere: that one's result stands
+        lease_id = self.request.id or document_id
+        if not evaluation_dedup.acquire_lock(document_id, lease_id):
+            logger.info(f"Document {document_id} is already being evaluated; dropping duplicate task.")
+            return
 
-        # 2. Run Evaluation (Async)
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
+        # Per-tenant concurrency cap: a tenant at its cap waits in the queue
+        # instead of taking a worker slot another tenant could use
+        tenant = tenant_key(doc)
+        if not tenant_slots.acquire(tenant, lease_id):
+            evaluation_dedup.release_lock(document_id, lease_id)
+            deferrals = _tenant_deferrals(self.request)
+            countdown = _tenant_defer_countdown(deferrals, tenant_slots.seconds_until_free(tenant))
+            logger.info(f"Tenant {tenant} at its evaluation cap; deferring {document_id} by {countdown:.0f}s")
+            TASK_RETRIES.labels("evaluate_document_task", "tenant_cap").inc()
+            # Same task id, so the id returned by trigger_evaluation (and the enqueue
+            # marker) keep tracking this evaluation; Ignore leaves its state untouched
+            self.apply_async(
+                args=[document_id],
+                kwargs={"force": force},
+                countdown=countdown,
+                priority=(self.request.delivery_info or {}).get("priority"),
+                task_id=self.request.id,
+                headers={"tenant_deferrals": deferrals + 1},
+            )
+            raise Ignore()
 
         try:
-            results = loop.run_until_complete(
+            with stage_timer("rubric_fetch", timings):
+                rubric_plan = run_async(rubric_plan_cache.get(get_async_db(), rubric_id))
+            idempotency_key = evaluation_dedup.idempotency_key(document_id, doc["extracted_text"], rubric_plan)
+
+            # Same text under the same rubric version was already evaluated: reuse it
+            if not force:
+                existing = eval_collection.find_one(
+                    {"document_id": document_id, "idempotency_key": idempotency_key},
+                    {"status": 1, "final_score": 1, "grade": 1},
+                )
+                if existing:
+                    logger.info(f"Reusing existing evaluation for document {document_id}")
+                    _restore_evaluated_status(doc_collection, document_id, existing)
+                    evaluation_dedup.clear_enqueue(document_id)
+                    return
+
+                duplicate = _duplicate_evaluation(db, doc, rubric_plan)
+                if duplicate:
+                    logger.info(f"Document {document_id} duplicates {duplicate['document_id']}; copying its evaluation")
+                    is_auto = doc.get("grading_mode", "suggested") == "auto"
+                    copied = Evaluation(
+                        **{
+                            field: duplicate.get(field)
+                            for field in (
+                                "final_score", "grade", "components", "overall_feedback", "score_breakdown",
+                                "scoring_engine", "rubric_used", "model_used",
+                            )
+                        },
+                        document_id=document_id,
+                        user_id=doc.get("uploaded_by"),
+                        status="finalized" if is_auto else "pending_review",
+                        finalized_at=datetime.utcnow() if is_auto else None,
+                        finalized_by="system" if is_auto else None,
+                        processing_time_ms=round((time.perf_counter() - started) * 1000, 2),
+                        stage_timings_ms=timings,
+                        idempotency_key=idempotency_key,
+                        reused_from=duplicate["document_id"],
+                    )
+                    _store_evaluation(eval_collection, doc_collection, document_id, copied, reused=True)
+                    evaluation_dedup.clear_enqueue(document_id)
+                    return
+
+            # A forced re-evaluation recomputes every stage; its own retries then
+            # resume from the checkpoints it saves
+            if force and not self.request.retries:
+                run_async(StageCheckpoints(get_async_db(), idempotency_key, document_id).clear())
+
+            # Stage progress goes to Redis pub/sub only; MongoDB is written on terminal states
+            # Awaited on the worker's event loop, which the sync publish would block
+            async def status_callback(stage: str):
+                await publish_progress_async(document_id, stage)
+
+            # 2. Run Evaluation (Async, on the worker's persistent event loop)
+            results = run_async(
                 run_async_evaluation(
+                    get_async_db(),
                     document_id,
                     doc["extracted_text"],
                     prompt=prompt,
                     rubric_id=rubric_id,
                     status_callback=status_callback,
+                    timings=timings,
+                    rubric_plan=rubric_plan,
+                    checkpoint_key=idempotency_key,
+                    structure=doc.get("structure"),
                 )
             )
-        finally:
-            loop.close()
 
-        # 3. Save Evaluation
-        grading_mode = doc.get("grading_mode", "suggested")
-        is_auto = grading_mode == "auto"
+            # Parse timings recorded by process_document_task come first in the breakdown
+            stage_timings = dict(doc.get("processing_timings_ms") or {})
+            stage_timings.update(timings)
+            stage_timings.update(results.get("stage_timings_ms") or {})
+
+            # 3. Save Evaluation
+            grading_mode = doc.get("grading_mode", "suggested")
+            is_auto = grading_mode == "auto"
         
-        eval_status = "finalized" if is_auto else "pending_review"
-        final_score = results["final_score"]
+            eval_status = "finalized" if is_auto else "pending_review"
+            final_score = results["final_score"]
         
-        eval_in = Evaluation(
-            document_id=document_id,
-            user_id=doc.get("uploaded_by"),
-            final_score=final_score,
-            grade=results["grade"],
-            components=results["components"],
-            overall_feedback=results["overall_feedback"],
-            score_breakdown=results.get("score_breakdown"),
-            scoring_engine=results.get("scoring_engine", "unknown"),
-            rubric_used=results.get("rubric_used", "Default"),
-            status=eval_status,
-            finalized_at=datetime.utcnow() if is_auto else None,
-            finalized_by="system" if is_auto else None
-        )
-
-        eval_collection.replace_one(
-            {"document_id": document_id},
-            eval_in.model_dump(by_alias=True, exclude={"id"}),
-            upsert=True,
-        )
+            eval_in = Evaluation(
+                document_id=document_id,
+                user_id=doc.get("uploaded_by"),
+                final_score=final_score,
+                grade=results["grade"],
+                components=results["components"],
+                overall_feedback=results["overall_feedback"],
+                score_breakdown=results.get("score_breakdown"),
+                scoring_engine=results.get("scoring_engine", "unknown"),
+                rubric_used=results.get("rubric_used", "Default"),
+                status=eval_status,
+                finalized_at=datetime.utcnow() if is_auto else None,
+                finalized_by="system" if is_auto else None,
+                processing_time_ms=round((time.perf_counter() - started) * 1000, 2),
+                stage_timings_ms=stage_timings,
+                model_used=results.get("model_used"),
+                retry_count=self.request.retries,
+                idempotency_key=idempotency_key,
+            )
 
-        # 4. Update Document Status
-        # If auto, it's 'graded' (done). If suggested, it's 'evaluated' (needs review).
-        doc_status = "graded" if is_auto else "evaluated"
-        
-        # Always persist final_score on the document so analytics can aggregate it.
-        # The distinction between auto/suggested is tracked via status, not score presence.
-        doc_collection.update_one(
-            {"_id": ObjectId(document_id)},
-            {
-                "$set": {
-                    "status": doc_status,
-                    "final_score": final_score,
-                    "updated_at": datetime.utcnow(),
-                }
-            },
-        )
+            # 4. Save it and update the document status
+            _store_evaluation(eval_collection, doc_collection, document_id, eval_in)
+            # Stored for good: the stage checkpoints of this input are no longer needed
+            run_async(StageCheckpoints(get_async_db(), idempotency_key, document_id).clear())
+            evaluation_dedup.clear_enqueue(document_id)
+            record_completion("evaluation", time.perf_counter() - started)
 
-        logger.info(f"Evaluation completed for document {document_id}")
+            logger.info(f"Evaluation completed for document {document_id}")
+        finally:
+            tenant_slots.release(tenant, lease_id)
+            evaluation_dedup.release_lock(document_id, lease_id)
 
+    except Ignore:
+        raise
     except Exception as e:
         error_msg = str(e)
-        # Check if it's a Gemini availability/rate-limit error
-        if "Gemini" in error_msg or "429" in error_msg or "quota" in error_msg.lower():
-            logger.warning(f"Gemini rate limited/unavailable for doc {document_id}. Retrying in 30s. Error: {error_msg}")
+        # Gemini rate-limited or unavailable: retry when capacity is expected back;
+        # an unusable answer is retried a few times. Out of retries, fall through to
+        # the failure below: self.retry() would re-raise `e` itself, leaving the
+        # document "retrying" and its enqueue marker set
+        if isinstance(e, LLMError):
+            max_retries, reason = LLM_MAX_RETRIES, "rate_limit" if isinstance(e, LLMRateLimitError) else "unavailable"
+        elif isinstance(e, LLMResponseError):
+            max_retries, reason = LLM_RESPONSE_MAX_RETRIES, "invalid_response"
+        else:
+            max_retries, reason = 0, None
+
+        if reason and self.request.retries >= max_retries:
+            error_msg = f"Evaluation failed after {max_retries} retries ({reason}): {error_msg}"
+        elif reason:
+            countdown = _retry_countdown(self.request.retries, getattr(e, "retry_after", None))
+            logger.warning(
+                f"Gemini {reason.replace('_', ' ')} for doc {document_id}. "
+                f"Retrying in {countdown:.0f}s. Error: {error_msg}"
+            )
             # Ensure status reflects the retry delay so user doesn't think it's stuck
             doc_collection.update_one(
                 {"_id": ObjectId(document_id)},
                 {"$set": {"status": "retrying", "updated_at": datetime.utcnow()}}
             )
+            publish_progress(document_id, "retrying", retry_in_seconds=round(countdown))
             # Retry the task
-            try:
-                raise self.retry(exc=e, countdown=30, max_retries=10)
-            except self.MaxRetriesExceededError:
-                error_msg = f"Evaluation failed after max retries due to AI rate limits: {error_msg}"
-                # Fall through to update status to failed_evaluation
-        
+            TASK_RETRIES.labels("evaluate_document_task", reason).inc()
+            raise self.retry(exc=e, countdown=countdown, max_retries=max_retries)
+
         # Genuine failure
         logger.error(f"Error evaluating document {document_id}: {error_msg}")
         doc_collection.update_one(
@@ -206,5 +439,5 @@ def evaluate_document_task(self, document_id: str):
                 }
             },
         )
-    finally:
-        client.close()
\ No newline at end of file
+        publish_progress(document_id, "failed_evaluation", error_message=error_msg)
+        evaluation_dedup.clear_enqueue(document_id)
\ No newline at end of file
@@ -0,0 +1,120 @@
+"""
+Per-process resources shared by Celery tasks.
+
+Each worker process keeps one pooled sync MongoClient, one AsyncIOMotorClient
+and one event loop running in a background thread, created when the process
+starts and closed when it exits: worker_process_init / worker_process_shutdown
+in prefork children, worker_init / worker_shutdown for the threads pool, whose
+tasks all share the main process. Tasks reuse them instead of opening
+connections and event loops of their own.
+
+Everything is also created lazily on first use, so tasks run eagerly (.apply,
+solo pool) work without the signals. Resources inherited through fork are
+never reused: the owning pid is checked on access.
+"""
+
+import os
+import asyncio
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Coroutine, Optional
+
+from pymongo import MongoClient
+from pymongo.database import Database
+from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorDatabase
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class WorkerResources:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pid: Optional[int] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._sync_client: Optional[MongoClient] = None
+        self._async_client: Optional[AsyncIOMotorClient] = None
+
+    def start(self) -> None:
+        with self._lock:
+            self._start_locked()
+
+    def _start_locked(self) -> None:
+        if self._pid == os.getpid():
+            return
+
+        # After fork the parent's clients and loop thread are unusable; drop them
+        self._pid = os.getpid()
+        self._loop = asyncio.new_event_loop()
+        # Sized for the evaluations in flight: each one blocks an executor thread
+        # on the Gemini call and briefly on the CPU-bound analyzers
+        self._loop.set_default_executor(ThreadPoolExecutor(
+            max_workers=settings.MAX_INFLIGHT_EVALUATIONS * 2 + (os.cpu_count() or 1),
+            thread_name_prefix="worker-executor",
+        ))
+        self._thread = threading.Thread(
+            target=self._loop.run_forever, name="worker-event-loop", daemon=True
+        )
+        self._thread.start()
+        self._sync_client = MongoClient(settings.MONGODB_URL)
+        self._async_client = AsyncIOMotorClient(settings.MONGODB_URL, io_loop=self._loop)
+        logger.info(f"Worker resources initialized (pid {self._pid}).")
+
+    def _ensure_started(self) -> None:
+        if self._pid != os.getpid():
+            self.start()
+
+    def sync_db(self) -> Database:
+        self._ensure_started()
+        return self._sync_client[settings.MONGODB_DATABASE]
+
+    def async_db(self) -> AsyncIOMotorDatabase:
+        """Motor database bound to the worker loop; only use it from coroutines passed to run_async."""
+        self._ensure_started()
+        return self._async_client[settings.MONGODB_DATABASE]
+
+    def run_async(self, coro: Coroutine, timeout: Optional[float] = None) -> Any:
+        """Runs a coroutine on the worker loop and blocks until it finishes."""
+        self._ensure_started()
+        return asyncio.run_coroutine_threadsafe(coro, self._loop).result(timeout)
+
+    def shutdown(self) -> None:
+        with self._lock:
+            if self._pid != os.getpid():
+                return
+            if self._async_client is not None:
+                self._async_client.close()
+            if self._sync_client is not None:
+                self._sync_client.close()
+            if self._loop is not None:
+                try:
+                    asyncio.run_coroutine_threadsafe(
+                        self._loop.shutdown_default_executor(), self._loop
+                    ).result(timeout=10)
+                except Exception as e:
+                    logger.warning(f"Executor shutdown failed: {e}")
+                self._loop.call_soon_threadsafe(self._loop.stop)
+                self._thread.join(timeout=5)
+                self._loop.close()
+            self._pid = None
+            self._loop = self._thread = None
+            self._sync_client = self._async_client = None
+            logger.info("Worker resources closed.")
+
+
+worker_resources = WorkerResources()
+
+
+def get_sync_db() -> Database:
+    return worker_resources.sync_db()
+
+
+def get_async_db() -> AsyncIOMotorDatabase:
+    return worker_resources.async_db()
+
+
+def run_async(coro: Coroutine, timeout: Optional[float] = None) -> Any:
+    return worker_resources.run_async(coro, timeout)
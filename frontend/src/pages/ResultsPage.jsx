@@ -1,7 +1,7 @@
 import React, { useEffect, useState, useCallback } from 'react';
 import { useParams, useNavigate } from 'react-router-dom';
 import { Loader2, AlertTriangle, SpellCheck, FileCheck, BrainCircuit, Target, Sparkles, CheckCircle } from 'lucide-react';
-import api from '../services/api';
+import api, { getAuthToken } from '../services/api';
 import AnalysisView from '../components/studio/AnalysisView';
 
 // ─── Processing Stages ────
@@ -192,25 +192,60 @@ const ResultsPage = () => {
 
   useEffect(() => { fetchData(); }, [fetchData]);
 
-  // Poll while processing
+  // Follow progress over Server-Sent Events while processing; poll if the stream is unavailable
   useEffect(() => {
     if (!isProcessing) return;
-    const interval = setInterval(async () => {
-      try {
-        const t = Date.now();
-        const [docRes, resRes] = await Promise.all([
-          api.get(`/documents/${id}?t=${t}`),
-          api.get(`/evaluation/results/${id}?t=${t}`)
-        ]);
-        setDoc(docRes.data);
-        if (resRes.data?.status !== 'processing') {
-          setIsProcessing(false);
-          setResults(resRes.data);
+    let source = null;
+    let interval = null;
+    let cancelled = false;
+
+    const startPolling = () => {
+      interval = setInterval(async () => {
+        try {
+          const t = Date.now();
+          const [docRes, resRes] = await Promise.all([
+            api.get(`/documents/${id}?t=${t}`),
+            api.get(`/evaluation/results/${id}?t=${t}`)
+          ]);
+          setDoc(docRes.data);
+          if (resRes.data?.status !== 'processing') {
+            setIsProcessing(false);
+            setResults(resRes.data);
+          }
+        } catch (e) { /* retry */ }
+      }, 2000);
+    };
+
+    (async () => {
+      const token = await getAuthToken().catch(() => null);
+      if (cancelled) return;
+      if (!token || typeof EventSource === 'undefined') {
+        startPolling();
+        return;
+      }
+      source = new EventSource(
+        `${api.defaults.baseURL}/evaluation/progress/${id}/stream?token=${encodeURIComponent(token)}`
+      );
+      source.onmessage = (e) => {
+        const event = JSON.parse(e.data);
+        setDoc(prev => (prev ? { ...prev, status: event.status } : prev));
+        if (event.terminal) {
+          source.close();
+          fetchData();
         }
-      } catch (e) { /* retry */ }
-    }, 2000);
-    return () => clearInterval(interval);
-  }, [isProcessing, id]);
+      };
+      source.onerror = () => {
+        source.close();
+        if (!cancelled && !interval) startPolling();
+      };
+    })();
+
+    return () => {
+      cancelled = true;
+      if (source) source.close();
+      if (interval) clearInterval(interval);
+    };
+  }, [isProcessing, id, fetchData]);
 
   if (loading) {
     return (
@@ -10,6 +10,13 @@ const api = axios.create({
   },
 });
 
+// Current ID token, for requests that cannot go through axios (e.g. EventSource)
+export const getAuthToken = async () => {
+  if (USE_MOCK_AUTH) return 'mock-token';
+  const user = auth.currentUser;
+  return user ? user.getIdToken() : null;
+};
+
 // Request interceptor to add Firebase token
 api.interceptors.request.use(
   async (config) => {
@@ -0,0 +1,128 @@
+"""
+EduScore AI — Text Cleaning Micro-Benchmark
+Times DocumentParser._clean_text against the previous multi-pass
+implementation on large synthetic documents, after checking that both
+produce identical output (on the benchmark documents and on random
+whitespace-heavy fuzz input). No services needed.
+
+Usage:
+  python tests/benchmark_text_cleaning.py
+  python tests/benchmark_text_cleaning.py --words 500000 --repeat 5
+  python tests/benchmark_text_cleaning.py --fuzz 20000     # equivalence check only
+"""
+
+import argparse
+import random
+import re
+import sys
+import time
+import unicodedata
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent / "backend"
+sys.path.insert(0, str(BACKEND_DIR))
+
+from app.services.document_parser import document_parser  # noqa: E402
+
+
+def reference_clean_text(text: str) -> str:
+    """_clean_text as it was before the rewrite: four regex passes and a copy per line."""
+    if not text:
+        return ""
+    text = unicodedata.normalize('NFKC', text)
+    text = text.replace('\x00', '')
+    text = re.sub(r'\r\n', '\n', text)
+    lines = [re.sub(r'\s+', ' ', line).strip() for line in text.split('\n')]
+    cleaned_text = "\n".join(lines)
+    cleaned_text = re.sub(r'\n{3,}', '\n\n', cleaned_text)
+    return cleaned_text.strip()
+
+
+# ═══════════════════════════════════════════════════════════════════
+# DOCUMENTS
+# ═══════════════════════════════════════════════════════════════════
+_WORDS = (
+    "the assessment of student writing requires attention to structure argument evidence "
+    "and style while automated systems must remain transparent consistent and fair"
+).split()
+_UNICODE_WORDS = ["naïve", "café", "ﬁnal", "２０２４", "résumé", "Œuvre", "coöperate", "ﬂow"]
+
+
+def pdf_like_document(words: int, unicode_share: float, rng: random.Random) -> str:
+    """Text shaped like PDF extraction output: short hard-wrapped lines, CRLF, ragged spacing, page breaks."""
+    vocabulary = _WORDS + (_UNICODE_WORDS if unicode_share else [])
+    weights = [1.0] * len(_WORDS) + [unicode_share * len(_WORDS) / len(_UNICODE_WORDS)] * (
+        len(_UNICODE_WORDS) if unicode_share else 0
+    )
+    parts = []
+    for i in range(words):
+        parts.append(rng.choices(vocabulary, weights)[0])
+        if i % 11 == 10:
+            parts.append(rng.choice(["\n", "\r\n", "  \n", " \n\n", "\n\n\n\n"]))
+        elif i % 400 == 399:
+            parts.append("\n\x0c\n")  # Form feed between pages
+        else:
+            parts.append(rng.choice([" ", " ", " ", " ", "  ", "\t"]))
+    return "".join(parts)
+
+
+def fuzz_document(rng: random.Random) -> str:
+    alphabet = ["a", "b", "é", "ﬁ", " ", "  ", "\t", "\n", "\r", "\r\n", "\x00", "\x0b", "\x0c",
+                "\x1c", "\x85", "\xa0", " ", "　"]
+    return "".join(rng.choice(alphabet) for _ in range(rng.randint(0, 60)))
+
+
+# ═══════════════════════════════════════════════════════════════════
+# CHECKS & TIMING
+# ═══════════════════════════════════════════════════════════════════
+def check_equivalence(documents, fuzz_cases: int, rng: random.Random) -> bool:
+    for name, text in documents.items():
+        if document_parser._clean_text(text) != reference_clean_text(text):
+            print(f"❌ Output differs on the {name} document")
+            return False
+    for _ in range(fuzz_cases):
+        text = fuzz_document(rng)
+        if document_parser._clean_text(text) != reference_clean_text(text):
+            print(f"❌ Output differs on fuzz input {text!r}")
+            return False
+    print(f"✅ Identical output on {len(documents)} documents and {fuzz_cases} fuzz inputs")
+    return True
+
+
+def best_of(func, text: str, repeat: int) -> float:
+    runs = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func(text)
+        runs.append(time.perf_counter() - started)
+    return min(runs)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--words", type=int, default=200_000, help="Words per benchmark document")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--fuzz", type=int, default=5000, help="Random inputs for the equivalence check")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    documents = {
+        "ascii": pdf_like_document(args.words, 0.0, rng),
+        "unicode": pdf_like_document(args.words, 0.02, rng),
+    }
+    if not check_equivalence(documents, args.fuzz, rng):
+        sys.exit(1)
+
+    print(f"\n{'document':<10} {'chars':>12} {'previous (ms)':>15} {'current (ms)':>14} {'speedup':>9}")
+    for name, text in documents.items():
+        previous = best_of(reference_clean_text, text, args.repeat)
+        current = best_of(document_parser._clean_text, text, args.repeat)
+        print(
+            f"{name:<10} {len(text):>12,} {previous * 1000:>15.1f} {current * 1000:>14.1f} "
+            f"{previous / current:>8.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
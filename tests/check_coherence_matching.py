@@ -0,0 +1,143 @@
+"""
+EduScore AI — Transition Matching Regression Check
+Checks that CoherenceScorer output is unchanged by the hyphen handling that
+PhraseMatcher gained for the AI-marker lexicon: the transition lexicon is
+matched against the whitespace-only matcher it shipped with, on sample essays
+and on random connective-heavy fuzz input. Also checks the deliberate change:
+hyphenated AI markers ("fast-paced") now match. No services needed.
+
+Usage:
+  python tests/check_coherence_matching.py
+  python tests/check_coherence_matching.py --fuzz 20000 --seed 3
+"""
+
+import argparse
+import random
+import sys
+from pathlib import Path
+from unittest import mock
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent / "backend"
+sys.path.insert(0, str(BACKEND_DIR))
+
+from app.ai import coherence_scorer  # noqa: E402
+from app.ai.ai_text_detector import get_marker_matcher  # noqa: E402
+from app.utils.text_processing import WORD_RE, PhraseMatcher  # noqa: E402
+
+
+class ReferencePhraseMatcher(PhraseMatcher):
+    """find_all as CoherenceScorer first used it: phrase words separated by whitespace only."""
+
+    def find_all(self, text):
+        if not text or not self._trie:
+            return []
+        tokens = [(m.start(), m.end(), m.group().lower()) for m in WORD_RE.finditer(text)]
+        matches = []
+        i, n = 0, len(tokens)
+        while i < n:
+            node, best, j = self._trie, None, i
+            while j < n:
+                start, end, word = tokens[j]
+                if j > i and not text[tokens[j - 1][1]:start].isspace():
+                    break
+                node = node.get(word)
+                if node is None:
+                    break
+                if None in node:
+                    best = (j, node[None])
+                j += 1
+            if best is None:
+                i += 1
+                continue
+            last, phrase = best
+            offset = tokens[i][0]
+            matches.append({"phrase": phrase, "offset": offset, "length": tokens[last][1] - offset})
+            i = last + 1
+        return matches
+
+
+# ═══════════════════════════════════════════════════════════════════
+# INPUTS
+# ═══════════════════════════════════════════════════════════════════
+ESSAYS = {
+    "plain": (
+        "Schools adopted tablets quickly. In addition, teachers received training.\n\n"
+        "On the other hand, costs rose. As a result, some districts paused the rollout.\n\n"
+        "In conclusion, the results were mixed but promising."
+    ),
+    "hyphenated": (
+        "All-in-all the plan worked. It was, on-the-whole, a success.\n\n"
+        "First-of-all, budgets matter. In-short supply, paper ran out; in short, it was chaotic.\n\n"
+        "A well-known in-depth study, as-a-result-oriented as it was, helped. To sum-up: fine."
+    ),
+}
+
+
+def fuzz_document(words, rng: random.Random) -> str:
+    separators = [" ", " ", "-", "--", ", ", "\n", "\n\n", " - ", ". "]
+    parts = []
+    for _ in range(rng.randint(0, 40)):
+        parts.append(rng.choice(words))
+        parts.append(rng.choice(separators))
+    return "".join(parts)
+
+
+# ═══════════════════════════════════════════════════════════════════
+# CHECKS
+# ═══════════════════════════════════════════════════════════════════
+def analyze_with(matcher, text):
+    with mock.patch.object(coherence_scorer, "get_transition_matcher", lambda language=None: matcher):
+        return coherence_scorer.CoherenceScorer().analyze(text)
+
+
+def check_coherence(fuzz_cases: int, rng: random.Random) -> bool:
+    current = coherence_scorer.get_transition_matcher()
+    reference = ReferencePhraseMatcher([])
+    reference._trie, reference.size = current._trie, current.size
+
+    words = sorted({word for phrase in _phrases(current) for word in phrase.split()}) + ["term", "well", "known"]
+    inputs = list(ESSAYS.items()) + [(f"fuzz #{k}", fuzz_document(words, rng)) for k in range(fuzz_cases)]
+    for name, text in inputs:
+        if analyze_with(current, text) != analyze_with(reference, text):
+            print(f"❌ Coherence output differs on the {name} input: {text!r}")
+            return False
+    print(f"✅ Identical coherence output on {len(ESSAYS)} essays and {fuzz_cases} fuzz inputs")
+    return True
+
+
+def check_markers() -> bool:
+    text = "In today's fast-paced world, the ever-evolving landscape of education changes."
+    found = {m["phrase"] for m in get_marker_matcher().find_all(text)}
+    expected = {"in today's fast paced world", "ever evolving"}
+    if not expected <= found:
+        print(f"❌ Hyphenated AI markers not matched: expected {sorted(expected)}, got {sorted(found)}")
+        return False
+    print("✅ Hyphenated AI markers match (deliberate change)")
+    return True
+
+
+def _phrases(matcher):
+    stack = [matcher._trie]
+    while stack:
+        node = stack.pop()
+        for key, child in node.items():
+            if key is None:
+                yield child
+            else:
+                stack.append(child)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--fuzz", type=int, default=5000, help="Random inputs for the coherence check")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    ok = check_coherence(args.fuzz, random.Random(args.seed))
+    ok = check_markers() and ok
+    if not ok:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
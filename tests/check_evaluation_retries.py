@@ -0,0 +1,88 @@
+"""
+EduScore AI — Evaluation Retry Check
+Runs evaluate_document_task eagerly with MongoDB, Redis and the pipeline
+patched out, and checks the terminal paths of its LLM retries: a rate limit
+is retried LLM_MAX_RETRIES times and an unusable Gemini answer
+LLM_RESPONSE_MAX_RETRIES times, after which the document is marked
+failed_evaluation, the event is published and the enqueue marker is cleared.
+Other errors fail at once. No services needed.
+
+Usage:
+  python tests/check_evaluation_retries.py
+"""
+
+import sys
+from pathlib import Path
+from unittest import mock
+
+from bson import ObjectId
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent / "backend"
+sys.path.insert(0, str(BACKEND_DIR))
+
+from app.ai.llm_errors import LLMRateLimitError, LLMResponseError  # noqa: E402
+from app.workers.celery_app import celery_app  # noqa: E402
+from app.workers.tasks import evaluation_tasks  # noqa: E402
+
+DOCUMENT_ID = str(ObjectId())
+
+
+def run_task(error: Exception):
+    """Runs the task until it stops retrying; every attempt fails with `error`."""
+    documents = mock.MagicMock()
+    documents.find_one.return_value = {
+        "_id": ObjectId(DOCUMENT_ID), "extracted_text": "An essay.", "uploaded_by": "teacher",
+    }
+    db = mock.MagicMock()
+    db.__getitem__.side_effect = lambda name: documents if name == "documents" else mock.MagicMock()
+
+    def failing_run_async(coro, timeout=None):
+        coro.close()
+        raise error
+
+    with mock.patch.object(evaluation_tasks, "get_sync_db", return_value=db), \
+            mock.patch.object(evaluation_tasks, "get_async_db"), \
+            mock.patch.object(evaluation_tasks, "run_async", side_effect=failing_run_async), \
+            mock.patch.object(evaluation_tasks, "tenant_slots") as slots, \
+            mock.patch.object(evaluation_tasks, "evaluation_dedup") as dedup, \
+            mock.patch.object(evaluation_tasks, "publish_progress") as publish:
+        slots.acquire.return_value = True
+        dedup.acquire_lock.return_value = True
+        # Eager retries re-run the task in place until it gives up
+        evaluation_tasks.evaluate_document_task.apply(args=[DOCUMENT_ID])
+
+    statuses = [call.args[1] for call in publish.call_args_list]
+    failed = [
+        call.args[1]["$set"] for call in documents.update_one.call_args_list
+        if call.args[1]["$set"].get("status") == "failed_evaluation"
+    ]
+    return statuses, failed, dedup.clear_enqueue.call_count
+
+
+def check(name: str, error: Exception, retries: int) -> bool:
+    statuses, failed, cleared = run_task(error)
+    expected = ["retrying"] * retries + ["failed_evaluation"]
+    if statuses != expected:
+        print(f"❌ {name}: published {statuses}, expected {expected}")
+        return False
+    if len(failed) != 1 or cleared != 1:
+        print(f"❌ {name}: failed_evaluation written {len(failed)}x, enqueue marker cleared {cleared}x")
+        return False
+    print(f"✅ {name}: {retries} retries, then failed_evaluation ({failed[0]['error_message'][:60]}...)")
+    return True
+
+
+def main():
+    celery_app.conf.task_always_eager = True
+    with mock.patch.object(evaluation_tasks, "_retry_countdown", return_value=1.0):
+        results = [
+            check("rate limit", LLMRateLimitError("429 quota exhausted"), evaluation_tasks.LLM_MAX_RETRIES),
+            check("invalid response", LLMResponseError("invalid JSON"), evaluation_tasks.LLM_RESPONSE_MAX_RETRIES),
+            check("other error", ValueError("bad rubric"), 0),
+        ]
+    if not all(results):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()